@@ -0,0 +1,154 @@
+"""
+Admission control of the expensive callbacks, so that a burst of refreshes cannot take every thread of a worker.
+
+Every expensive computation goes through the gate of its callback: at most ADMISSION_CONCURRENCY of them run at
+once, at most ADMISSION_QUEUE more wait for a slot, each up to ADMISSION_WAIT_SECONDS. While a priority callback
+(the map) is running, the gates admit a single computation each, so that the cheap callbacks keep their threads.
+
+A computation not admitted is answered right away, degraded: with the last result of the same inputs when there is
+one, else the last result of near-identical inputs, else a lightweight "busy" placeholder. The degraded answers
+are counted per gate.
+
+ADMISSION_CONCURRENCY=0 disables the limits.
+"""
+import functools
+import os
+import threading
+import time
+from cache import LRUCache
+
+ADMISSION_CONCURRENCY = int(os.environ.get('ADMISSION_CONCURRENCY', 2))
+ADMISSION_QUEUE = int(os.environ.get('ADMISSION_QUEUE', 4))
+ADMISSION_WAIT_SECONDS = float(os.environ.get('ADMISSION_WAIT_SECONDS', 5))
+# results kept for the degraded answers, over all the gates
+ADMISSION_STALE_SIZE = int(os.environ.get('ADMISSION_STALE_SIZE', 16))
+
+
+class Gate:
+    def __init__(self, name, limit, queue, wait):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.wait = wait
+        self.running = 0
+        self.waiting = 0
+        # admitted right away or after waiting, not admitted (queue full or wait over), and the degraded answers
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.stale = 0
+        self.near = 0
+        self.busy = 0
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in ['limit', 'queue', 'running', 'waiting', 'admitted', 'queued',
+                                                        'rejected', 'timeouts', 'stale', 'near', 'busy']}
+
+
+class AdmissionControl:
+    def __init__(self, limit=ADMISSION_CONCURRENCY, queue=ADMISSION_QUEUE, wait=ADMISSION_WAIT_SECONDS,
+                 stale_size=ADMISSION_STALE_SIZE):
+        self.limit = limit
+        self.queue = queue
+        self.wait = wait
+        self.gates = {}
+        # priority calls running, and in total
+        self.priority_running = 0
+        self.priority_calls = 0
+        self._stale = LRUCache(maxsize=stale_size)
+        self._cond = threading.Condition()
+
+    @property
+    def enabled(self):
+        return self.limit > 0
+
+    def gate(self, name, limit=None, queue=None, wait=None):
+        """ gate of the callback name, created with the default limits on first use """
+        with self._cond:
+            if name not in self.gates:
+                self.gates[name] = Gate(name, self.limit if limit is None else limit,
+                                        self.queue if queue is None else queue, self.wait if wait is None else wait)
+            return self.gates[name]
+
+    def priority(self, func):
+        """ decorator of the cheap callbacks the gates give way to """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self._cond:
+                self.priority_running += 1
+                self.priority_calls += 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._cond:
+                    self.priority_running -= 1
+                    self._cond.notify_all()
+        return wrapper
+
+    def _can_run(self, gate):
+        limit = min(gate.limit, 1) if self.priority_running else gate.limit
+        return gate.running < limit
+
+    def _acquire(self, gate):
+        with self._cond:
+            if self._can_run(gate):
+                gate.running += 1
+                gate.admitted += 1
+                return True
+            if gate.waiting >= gate.queue:
+                gate.rejected += 1
+                return False
+            gate.waiting += 1
+            deadline = time.monotonic() + gate.wait
+            try:
+                while not self._can_run(gate):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        gate.timeouts += 1
+                        return False
+                    self._cond.wait(remaining)
+                gate.running += 1
+                gate.queued += 1
+                return True
+            finally:
+                gate.waiting -= 1
+
+    def _release(self, gate):
+        with self._cond:
+            gate.running -= 1
+            self._cond.notify_all()
+
+    def run(self, name, compute, key=None, near_key=None, busy=None):
+        """
+        (result, mode) of compute() through the gate name, mode being 'computed' when admitted. Otherwise the
+        last result of key ('stale') or of near_key ('near'), else busy() ('busy')
+        """
+        if not self.enabled:
+            return compute(), 'computed'
+        gate = self.gate(name)
+        if self._acquire(gate):
+            try:
+                result = compute()
+            finally:
+                self._release(gate)
+            for k in (key, near_key):
+                if k is not None:
+                    self._stale.put((name, k), result)
+            return result, 'computed'
+
+        for mode, k in (('stale', key), ('near', near_key)):
+            result = self._stale.get((name, k)) if k is not None else None
+            if result is not None:
+                with self._cond:
+                    setattr(gate, mode, getattr(gate, mode) + 1)
+                return result, mode
+        with self._cond:
+            gate.busy += 1
+        return busy() if busy is not None else None, 'busy'
+
+    def stats(self):
+        with self._cond:
+            return {'enabled': self.enabled, 'priority_running': self.priority_running,
+                    'priority_calls': self.priority_calls,
+                    'gates': {name: gate.to_dict() for name, gate in self.gates.items()}}
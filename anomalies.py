@@ -0,0 +1,229 @@
+"""
+Anomalies of the cumulative series, hand-corrected from daily reports: drops, back-revisions and outlier increments.
+
+All the areas are scanned at once, like the rolling metrics (see metrics.py): the rows are sorted by area and date,
+the per-area running minimum is a single accumulate over offset values, and the window statistics are differences
+of cumulative sums. For each cumulative column, detect() returns
+
+    <col>_anomaly    bitmask of the row: DROP, REVISED, SPIKE, GLITCH
+    <col>_corrected  the series made non-decreasing (the values revised down later are lowered to the later value,
+                     the glitches raised to the next valid value, or the previous one at the end of the area) and
+                     the excess of each outlier increment spread evenly over the days of its baseline window, so
+                     that the last value of each area is unchanged unless it is a glitch
+
+correct() replaces the cumulative columns of a frame by their corrected series, for the corrected datasets.
+update() finds the anomalies of the latest days of the areas from their last TAIL rows, the areas where the new
+days are anomalies themselves or change the previous days being left to detect() again.
+"""
+import os
+import numpy as np
+import pandas as pd
+import metrics
+
+# lower than the day before
+DROP = 1
+# higher than a later value of the area: revised down afterwards
+REVISED = 2
+# daily increment above SPIKE_RATIO times the mean of the previous WINDOW days and SPIKE_Z standard deviations,
+# and above SPIKE_RATIO times the mean of the next WINDOW days: a one-off, not the start of a surge
+SPIKE = 4
+# fall to zero, or for at most GLITCH_DAYS days below GLITCH_RATIO times the highest previous value: a reporting
+# glitch to correct up, not a revision lowering the previous values (e.g. 5, 5, 6, 0 is corrected to 5, 5, 6, 6)
+GLITCH = 8
+
+SPIKE_RATIO = float(os.environ.get('ANOMALY_SPIKE_RATIO', 4))
+SPIKE_Z = float(os.environ.get('ANOMALY_SPIKE_Z', 4))
+# smallest increment and number of previous days to call a spike
+SPIKE_MIN = int(os.environ.get('ANOMALY_SPIKE_MIN', 20))
+SPIKE_HISTORY = 3
+GLITCH_RATIO = float(os.environ.get('ANOMALY_GLITCH_RATIO', 0.5))
+GLITCH_DAYS = int(os.environ.get('ANOMALY_GLITCH_DAYS', 2))
+# rows of history needed before the new days of an area by update(): the baselines of their spikes, and of the
+# spikes of the previous days that they may change
+TAIL = 2 * metrics.WINDOW + GLITCH_DAYS + 2
+
+
+def running_min_after(values, codes):
+    """ minimum of values from each row to the last row of its group, codes being sorted """
+    # groups further in the array are offset higher, so that the minimum never carries over to a previous group
+    span = np.nanmax(values) - np.nanmin(values) + 1 if len(values) else 1
+    offset = codes * span
+    return np.fmin.accumulate((values + offset)[::-1])[::-1] - offset
+
+
+def running_max_before(values, codes, starts):
+    """ maximum of the previous values of the group of each row, nan on the first row of a group """
+    span = np.nanmax(values) - np.nanmin(values) + 1 if len(values) else 1
+    offset = codes * span
+    out = np.full(len(values), np.nan)
+    out[1:] = np.fmax.accumulate(values + offset)[:-1] - offset[1:]
+    out[starts == np.arange(len(values))] = np.nan
+    return out
+
+
+def glitches(values, codes, starts):
+    """ rows falling to zero, or for at most GLITCH_DAYS rows below GLITCH_RATIO times the previous maximum """
+    n = len(values)
+    before = running_max_before(values, codes, starts)
+    with np.errstate(invalid='ignore'):
+        low = (before > 0) & ((values == 0) | (values < GLITCH_RATIO * before))
+    # length of each run of consecutive low rows within a group
+    first = low.copy()
+    first[1:] &= ~low[:-1] | (starts[1:] == np.arange(1, n))
+    run = np.cumsum(first)
+    length = np.bincount(run[low], minlength=run[-1] + 1 if n else 1)
+    return low & ((values == 0) | (length[run] <= GLITCH_DAYS))
+
+
+def monotone(values, codes, starts):
+    """ non-decreasing series of each group, and its glitches """
+    n = len(values)
+    glitch = glitches(values, codes, starts)
+    # the glitches are no lower bound of the previous values, they take the next valid value
+    out = running_min_after(np.where(glitch, np.nan, values), codes)
+    # or the previous one after the last valid value of the group, the first row of a group is never a glitch
+    valid = np.concatenate([[0], np.cumsum(~glitch)])
+    missing = valid[group_ends(codes) + 1] == valid[np.arange(n)]
+    if missing.any():
+        out[missing] = np.nan
+        out = out[np.maximum.accumulate(np.where(missing, 0, np.arange(len(out))))]
+    return out, glitch
+
+
+def group_ends(codes):
+    """ position of the last row of the group of each row, codes being sorted """
+    n = len(codes)
+    return n - 1 - metrics.group_starts(codes[::-1])[::-1]
+
+
+def spikes(inc, codes, starts, window=metrics.WINDOW):
+    """ outlier increments, with the mean increment and the number of days of their baseline (the previous days) """
+    i = np.arange(len(inc))
+    days = np.minimum(i - starts, window)
+    total = metrics.window_sum(inc, starts, window + 1) - inc
+    squares = metrics.window_sum(inc * inc, starts, window + 1) - inc * inc
+    # the next days of the same area
+    next_days = np.minimum(group_ends(codes) - i, window)
+    cs = np.concatenate([[0.0], np.cumsum(inc)])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(days > 0, total / days, 0.0)
+        std = np.sqrt(np.maximum(np.where(days > 0, squares / days, 0.0) - mean * mean, 0))
+        next_mean = np.where(next_days > 0, (cs[i + next_days + 1] - cs[i + 1]) / next_days, np.inf)
+    spike = (days >= SPIKE_HISTORY) & (mean > 0) & (inc >= SPIKE_MIN) & (inc > SPIKE_RATIO * mean) \
+        & (inc > mean + SPIKE_Z * std) & (inc > SPIKE_RATIO * next_mean)
+    return spike, mean, days
+
+
+def spread(inc, spike, mean, days):
+    """ increments with the excess of the spikes over their mean spread evenly over their baseline days """
+    n = len(inc)
+    rows = np.flatnonzero(spike)
+    excess = inc[rows] - mean[rows]
+    share = excess / days[rows]
+    # difference array: + share from the first day of the baseline, - share from the spike on
+    delta = np.zeros(n + 1)
+    np.add.at(delta, rows - days[rows], share)
+    np.add.at(delta, rows, -share)
+    out = inc + np.cumsum(delta)[:n]
+    out[rows] -= excess
+    return out
+
+
+def detect(frame, key='country_area', cols=metrics.BASE_COLS):
+    """ anomaly flags and corrected series of every row of frame (same index), for the cumulative cols, per key """
+    order, codes, starts, inverse = metrics.sorted_groups(frame, key)
+    first = starts == np.arange(len(order))
+
+    result = {}
+    for col in cols:
+        values = frame[col].to_numpy(dtype=float)[order]
+        flags = np.zeros(len(values), dtype=np.int8)
+        flags[metrics.increments(values, starts) < 0] |= DROP
+        raised, glitch = monotone(values, codes, starts)
+        flags[glitch] |= GLITCH
+        flags[values > raised] |= REVISED
+
+        inc = metrics.increments(raised, starts)
+        spike, mean, days = spikes(inc, codes, starts)
+        flags[spike] |= SPIKE
+        corrected_inc = spread(inc, spike, mean, days)
+        # cumulative sums within each area, from its first corrected value
+        corrected_inc[first] += raised[first]
+        cs = np.cumsum(corrected_inc)
+        corrected = cs - cs[starts] + corrected_inc[starts]
+
+        result[col + '_anomaly'] = flags
+        result[col + '_corrected'] = np.round(corrected).astype(np.int64)
+
+    out = pd.DataFrame(index=frame.index)
+    for name, values in result.items():
+        out[name] = values[inverse]
+    return out
+
+
+def update(frame, rows, key='country_area', cols=metrics.BASE_COLS):
+    """
+    anomaly flags and corrected series of the rows of frame selected by the boolean mask rows (same index), the
+    latest days of their areas, from the published cols of every row and the <col>_corrected of the other rows.
+    Returns them with the areas to detect() again, where the new days are anomalies or change the previous days
+    """
+    columns = [key, 'date'] + cols
+    new = frame.loc[rows, columns]
+    previous = frame.loc[~rows & frame[key].isin(new[key].unique())].sort_values([key, 'date'])
+    tail = previous.groupby(key).tail(TAIL)
+    # the rows before the tail of an area as one row with their highest values, the base of its glitches
+    head = previous.drop(tail.index).groupby(key, as_index=False).agg({c: 'max' for c in ['date'] + cols})
+    before = pd.concat([head[columns], tail[columns]], ignore_index=True)
+    old = detect(before, key, cols)
+    out = detect(pd.concat([before, new], ignore_index=True), key, cols)
+    n, start = len(before), len(head)
+
+    # the previous days detected alike without and with the new ones, which are no anomaly
+    changed = np.zeros(len(tail), dtype=bool)
+    flagged = np.zeros(len(new), dtype=bool)
+    for col in cols:
+        for name in [col + '_anomaly', col + '_corrected']:
+            changed |= old[name].to_numpy()[start:] != out[name].to_numpy()[start:n]
+        flagged |= out[col + '_anomaly'].to_numpy()[n:] != 0
+    redo = set(tail[key].to_numpy()[changed]) | set(new[key].to_numpy()[flagged])
+
+    # the corrected series go on from the last corrected value of the area
+    last = (tail[key] != tail[key].shift(-1)).to_numpy()
+    result = out.iloc[n:].set_axis(new.index)
+    for col in cols:
+        name = col + '_corrected'
+        offset = pd.Series(tail[name].to_numpy()[last] - out[name].to_numpy()[start:n][last],
+                           index=tail[key].to_numpy()[last])
+        result[name] = np.round(result[name] + new[key].map(offset).fillna(0).to_numpy()).astype(np.int64)
+    return result, redo
+
+
+def correct(frame, cols=metrics.BASE_COLS):
+    """ replace the cumulative cols of frame by their corrected series, and the active cases and rates with them """
+    changed = np.zeros(len(frame), dtype=bool)
+    for col in cols:
+        delta = frame[col + '_corrected'] - frame[col]
+        changed |= delta.to_numpy() != 0
+        if 'active' in frame.columns:
+            frame['active'] = frame['active'] + (delta if col == 'confirmed_cases' else -delta)
+        frame[col] = frame[col + '_corrected']
+
+    # the rates of the corrected rows only, the others are kept as published
+    rows = frame.loc[changed]
+    confirmed = rows['confirmed_cases'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frame.loc[changed, 'confirmed_cases_rate'] = confirmed / rows['population'].to_numpy(dtype=float)
+        for col in ['deaths', 'recovered', 'active']:
+            frame.loc[changed, col + '_rate'] = np.where(confirmed > 0, rows[col].to_numpy() / confirmed, 0.0)
+    return frame
+
+
+def summary(frame, key='country_area', cols=metrics.BASE_COLS):
+    """ number of rows of each kind of anomaly per column, and per area (areas with anomalies only) """
+    kinds = {'drop': DROP, 'revised': REVISED, 'spike': SPIKE, 'glitch': GLITCH}
+    counts = pd.DataFrame({'{}_{}'.format(col, kind): (frame[col + '_anomaly'].to_numpy() & bit) > 0
+                           for col in cols for kind, bit in kinds.items()})
+    per_area = counts.groupby(frame[key].to_numpy()).sum()
+    per_area = per_area.loc[per_area.sum(axis=1) > 0]
+    return {'total': {name: int(n) for name, n in counts.sum().items()},
+            'areas': {area: {name: int(n) for name, n in row.items() if n} for area, row in per_area.iterrows()}}
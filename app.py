@@ -1,16 +1,53 @@
+import functools
+import hmac
+import json
+import os
 import pathlib
+import threading
+import time
+import uuid
 import dash
+import flask
 import dash_bootstrap_components as dbc
 import dash_core_components as dcc
 import dash_html_components as html
 from dash.dependencies import Input, Output, State, ClientsideFunction
 import pandas as pd
-import plotly_express as px
 from datetime import timedelta
 from datetime import datetime
 import numpy as np
-import plotly.graph_objects as go
 from dash.exceptions import PreventUpdate
+import anomalies
+import fastjson
+import growth_fit
+import metrics
+from admission import AdmissionControl
+from cache import LRUCache
+from datasets import DatasetRegistry
+from env import env_flag
+from jobs import JOB_INLINE_SECONDS, JobCancelled, JobManager, checkpoint
+from lazy_import import LazyModule
+from memprofile import MemoryProfiler
+from name_index import NameIndex
+from precomputed import PrecomputedRoutes
+from singleflight import SingleFlight
+from spatial import GridIndex, viewport
+
+# startup mode deferring the plotting libraries and the layout build until first use, see bench/boot_profile.py
+LAZY_START = env_flag('LAZY_START')
+if LAZY_START:
+    px = LazyModule('plotly_express')
+    go = LazyModule('plotly.graph_objects')
+else:
+    import plotly_express as px
+    import plotly.graph_objects as go
+
+# callback responses encoded with orjson when available, FAST_JSON=0 keeps the plotly encoder
+if env_flag('FAST_JSON', True):
+    fastjson.install()
+
+# durations (in seconds) of the startup stages
+boot_timings = {}
 
 app = dash.Dash(__name__,
                 external_stylesheets=[dbc.themes.BOOTSTRAP,
@@ -38,37 +75,244 @@ app.title = 'COVID-19'
 server = app.server
 app.config.suppress_callback_exceptions = True
 
+# append every callback request body to this jsonl file, to be replayed by bench/loadtest.py
+RECORD_PAYLOADS = os.environ.get('RECORD_PAYLOADS')
+if RECORD_PAYLOADS:
+    _record_lock = threading.Lock()
+
+    @server.before_request
+    def record_payload():
+        if flask.request.path.endswith('_dash-update-component'):
+            line = json.dumps(flask.request.get_json()) + '\n'
+            with _record_lock, open(RECORD_PAYLOADS, 'a') as f:
+                f.write(line)
+
 # get relative data folder
 PATH = pathlib.Path(__file__).parent
 DATA_PATH = PATH.joinpath("data").resolve()
 
-# load data
+# datasets listed in data/datasets.json, each loaded on first use
+registry = DatasetRegistry(str(DATA_PATH),
+                           on_load=lambda name, seconds: boot_timings.setdefault('data_load', seconds))
 
-df = pd.read_csv(DATA_PATH.joinpath("covid.csv"))
-df["date"] = pd.to_datetime(df["date"], dayfirst=True)
-begin_date = df['date'].min() + timedelta(days=1)
-end_date = df['date'].max()
-no_days = (end_date - begin_date).days
-df['Timeline'] = df['date'].dt.strftime('%b %d')
+# above this number of markers in view, the map shows clusters instead of single areas
+MAP_MARKER_LIMIT = int(os.environ.get('MAP_MARKER_LIMIT', 500))
 
 seq = [0, 9, 23, 38, 52, 69, 83, 99]
 
-slider_marks = {i: (begin_date + timedelta(days=i)).strftime('%b')
-if ((begin_date + timedelta(days=i)).day == 1 or i == 0) else (begin_date + timedelta(days=i)).strftime('%d')
-                for i in seq}
 
-region = np.sort(df['region'].unique())
-region_options = [{'label': x, 'value': x} for x in region]
-subregion = np.sort(df['subregion'].unique())
-subregion_options = [{'label': x, 'value': x} for x in subregion]
-country = np.sort(df['country'].unique())
-country_options = [{'label': x, 'value': x} for x in country]
-area = np.sort(df['country_area'].unique())
-area = np.sort(df.loc[df['country_area'] != df['country'], 'country_area'].unique())
-area_options = [{'label': x, 'value': x} for x in area]
+def slider_marks(ds):
+    return {i: (ds.begin_date + timedelta(days=i)).strftime('%b')
+    if ((ds.begin_date + timedelta(days=i)).day == 1 or i == 0) else (ds.begin_date + timedelta(days=i)).strftime('%d')
+            for i in seq if i <= ds.no_days}
+
+
+def get_map_grid(ds):
+    # spatial index backing the map level-of-detail
+    def build_map_grid(d):
+        rows = d.backend.rows(columns=['lat', 'long'])
+        return GridIndex(rows['lat'], rows['long'])
+
+    return ds.derived('map_grid', build_map_grid)
+
+
+def build_name_indexes(ds):
+    # type-ahead indexes over the geography hierarchy, names are ranked by confirmed cases at the latest date
+    backend = ds.backend
+
+    def build_name_index(col, names):
+        weights = backend.aggregate([col], ['confirmed_cases'], date=ds.end_date).set_index(col)['confirmed_cases']
+        return NameIndex(names, weights.reindex(names, fill_value=0).to_numpy())
+
+    areas = backend.aggregate(['country_area', 'country'], [])
+    areas = areas.loc[areas['country_area'] != areas['country'], 'country_area'].unique()
+    return {'region': build_name_index('region', backend.aggregate(['region'], [])['region'].to_numpy()),
+            'subregion': build_name_index('subregion', backend.aggregate(['subregion'], [])['subregion'].to_numpy()),
+            'country': build_name_index('country', backend.aggregate(['country'], [])['country'].to_numpy()),
+            'area': build_name_index('country_area', areas)}
+
+
+def get_name_indexes(ds):
+    return ds.derived('name_indexes', build_name_indexes)
+
+
+# dropdowns over levels with more names than this are filled on demand by a search callback
+DROPDOWN_LIMIT = int(os.environ.get('DROPDOWN_LIMIT', 30))
+
+
+def dropdown_options(level, values=None):
+    # whole level of the default dataset when small enough, otherwise only the selected values
+    index = get_name_indexes(registry.get())[level]
+    names = sorted(index.names) if len(index) <= DROPDOWN_LIMIT else list(values or [])
+    return [{'label': x, 'value': x} for x in names]
+
+
+# coalescing of concurrent identical callback computations, across the workers when SINGLEFLIGHT_DIR is set.
+# a job superseded while it leads a computation does not cancel the jobs following it
+flight = SingleFlight(os.environ.get('SINGLEFLIGHT_DIR'), retry=(JobCancelled,))
+
+
+def normalize_arg(value):
+    # empty selections are equivalent, and the order of a multi-selection does not matter
+    if not value:
+        return None
+    if isinstance(value, list):
+        return tuple(sorted(value, key=str))
+    if isinstance(value, dict):
+        return json.dumps(value, sort_keys=True)
+    return value
+
+
+def flight_key(name, args):
+    # identifies a computation by the callback, the data, the trigger and the inputs
+    ctx = dash.callback_context
+    triggered = tuple(sorted(t['prop_id'] for t in ctx.triggered)) if ctx.triggered else ()
+    return name, registry.fingerprint, triggered, tuple(normalize_arg(a) for a in args)
+
+
+def single_flight():
+    """ share the result of a callback between the concurrent calls with the same inputs and trigger """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            key = flight_key(func.__name__, args)
+            return flight.do(key, lambda: func(*args))
+        return wrapper
+    return decorator
+
+
+# long-running callbacks run as background jobs, polled by the page when not finished within JOB_INLINE_SECONDS
+job_manager = JobManager(result_dir=os.environ.get('SINGLEFLIGHT_DIR'))
+JOB_POLL_MS = int(os.environ.get('JOB_POLL_MS', 500))
+
+
+def job_status(job):
+    return dbc.Progress(value=max(5, int(job.progress * 100)), striped=True, animated=True,
+                        style={'height': '4px'}, className='mt-2')
+
+
+def job_outputs(job, n_outputs, inline=False):
+    """ outputs of the job followed by the job id, the poll disabled flag and the job status """
+    skip = (dash.no_update,) * n_outputs
+    if job is None:
+        # nothing to poll anymore
+        return skip + (None, True, '')
+    if not job.wait(JOB_INLINE_SECONDS if inline else 0):
+        if inline:
+            job_manager.detach(job)
+        return skip + (job.id, False, job_status(job))
+    if isinstance(job.error, (JobCancelled, PreventUpdate)):
+        if inline:
+            raise PreventUpdate
+        return skip + (None, True, '')
+    if job.error is not None:
+        if inline:
+            raise job.error
+        return skip + (None, True, dbc.Alert('The computation failed: {}'.format(job.error), color='danger',
+                                             className='mt-2 mb-0', dismissable=True))
+    return tuple(job.result) + (None, True, '')
+
+
+def polled_job(ctx, poll, job_id):
+    """ the job polled by this call if any. None when this worker neither runs it nor reads its result: the caller
+    submits the computation again from its inputs """
+    if ctx.triggered and ctx.triggered[0]['prop_id'] == poll + '.n_intervals':
+        return job_manager.get(job_id)
+    return None
+
+
+def run_job(kind, key, session, fn, n_outputs):
+    # submitted as a job coalesced across the workers like single_flight, answered inline when quick enough
+    job = job_manager.submit(key, kind, session, lambda: flight.do(key, fn))
+    return job_outputs(job, n_outputs, inline=True)
+
+
+# expensive computations run a few at a time, the others are answered with a recent result or a busy figure
+admission = AdmissionControl()
+
+
+def busy_figure(title=''):
+    # placeholder answered when the server is too busy for the computation
+    return {'data': [],
+            'layout': {'title': {'text': title, 'x': 0.05, 'font': {'size': 20}}, 'plot_bgcolor': 'white',
+                       'xaxis': {'visible': False}, 'yaxis': {'visible': False},
+                       'annotations': [{'text': 'The server is busy, please refresh in a moment', 'showarrow': False,
+                                        'xref': 'paper', 'yref': 'paper', 'x': 0.5, 'y': 0.5,
+                                        'font': {'size': 14, 'color': '#666'}}]}}
+
+
+def admitted(name, compute, key, near_key, titles):
+    """ figures of compute() through the admission gate name, and whether they answer key """
+    figures, mode = admission.run(name, compute, key=key, near_key=near_key,
+                                  busy=lambda: tuple(busy_figure(title) for title in titles))
+    return figures, mode in ('computed', 'stale')
+
+
+@app.callback(Output('session_id', 'data'),
+              [Input('session_id', 'modified_timestamp')],
+              [State('session_id', 'data')])
+def init_session(ts, session):
+    # identifies the browser tab, a newer job of a session supersedes its previous job of the same kind
+    if session:
+        raise PreventUpdate
+    return uuid.uuid4().hex
+
+
+# memory accounting of the heavy callbacks, enabled with MEMORY_PROFILE=tracemalloc|rss
+profiler = MemoryProfiler()
+
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+
+def admin_route(rule):
+    """ json admin page, requiring ADMIN_TOKEN (X-Admin-Token header or token parameter), denied when it is unset """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper():
+            # the remote address is not checked: behind a proxy on the same host, every request is local
+            token = flask.request.headers.get('X-Admin-Token') or flask.request.args.get('token') or ''
+            if not ADMIN_TOKEN or not hmac.compare_digest(token, ADMIN_TOKEN):
+                flask.abort(403)
+            return flask.jsonify(func())
+        return server.route(rule)(wrapper)
+    return decorator
+
+
+@admin_route('/admin/memory')
+def admin_memory():
+    if flask.request.args.get('snapshot'):
+        profiler.take_snapshot()
+    report = profiler.report()
+    report['datasets'] = {'loaded': registry.loaded(), 'memory_mb': round(registry.memory_usage() / 2 ** 20, 2),
+                          'budget_mb': round(registry.memory_budget / 2 ** 20, 2),
+                          'loads': registry.loads, 'ingests': registry.ingests, 'evictions': registry.evictions}
+    report['precomputed_responses'] = precomputed.stats()
+    return report
+
+
+@admin_route('/admin/admission')
+def admin_admission():
+    report = admission.stats()
+    report['jobs'] = {'shared': job_manager.shared, 'cancelled': job_manager.cancelled, 'loaded': job_manager.loaded}
+    return report
+
+
+@admin_route('/admin/anomalies')
+def admin_anomalies():
+    # anomalies of the cumulative series of a dataset (?dataset=name), to be corrected in the source data
+    ds = registry.get(flask.request.args.get('dataset'))
+    flags = [col + '_anomaly' for col in metrics.BASE_COLS]
+    rows = ds.backend.rows(columns=['country_area', 'date'] + flags)
+    report = anomalies.summary(rows)
+    report['dataset'] = ds.name
+    return report
+
 
 split_options = [{'label': k, 'value': v} for k, v in zip(['Region', 'Sub-Region', 'Country', 'Area'],
                                                           ['region', 'subregion', 'country', 'country_area'])]
+# the drill-down split starts at the regions, a click on a category splits it by the next level
+split_options.append({'label': 'Drill-down', 'value': 'drilldown'})
+DRILL_LEVELS = ['region', 'subregion', 'country', 'country_area']
 
 config = {'modeBarButtonsToRemove': ['pan2d', 'select2d', 'lasso2d', 'zoomOut2d', 'zoomIn2d', 'hoverClosestCartesian',
                                      'zoom2d', 'autoScale2d', 'hoverCompareCartesian', 'zoomInGeo', 'zoomOutGeo',
@@ -98,6 +342,9 @@ Use the `SPLIT` dropdown list to show a split of the selected dataset.
 
 Use the `Limit Split to Top` field to condense the split information. An empty entry corresponds to no limit.  
 
+With `DRILL-DOWN`, the timeline is split by region: click on a bar (or on a bar of the `Current` tab) to split
+that category by its sub-regions, then countries and areas. The `Up` button goes back one level.  
+
 The Data split view is shown when switching "on" the `Show Split Data`.  
 
 Please note, when using the data split, the second `TAB` becomes available to show 
@@ -114,29 +361,34 @@ Recap of the COVID-19 Statistics
 * `Active Cases` : Number of outstanding confirmed cases.
 '''
 
+
 # top navbar
-navbar_layout = dbc.Navbar([
-    html.A(
-        # Use row and col to control vertical alignment of logo / brand
-        dbc.Row([
-            dbc.Col(html.Img(src=app.get_asset_url("logo.png"), height="60px", style={'stroke': '#508caf'})),
-            dbc.Col(dbc.NavbarBrand("COVID-19", className="ml-2",
-                                    style={'fontSize': '2em', 'fontWeight': '900', 'color': '#508caf'})),
-        ], align="center", no_gutters=True),
-        href='#'),
+def navbar_layout():
+    return dbc.Navbar([
+        html.A(
+            # Use row and col to control vertical alignment of logo / brand
+            dbc.Row([
+                dbc.Col(html.Img(src=app.get_asset_url("logo.png"), height="60px", style={'stroke': '#508caf'})),
+                dbc.Col(dbc.NavbarBrand("COVID-19", className="ml-2",
+                                        style={'fontSize': '2em', 'fontWeight': '900', 'color': '#508caf'})),
+            ], align="center", no_gutters=True),
+            href='#'),
 
-    dbc.NavbarToggler(id="navbar-toggler", className="ml-auto"),
+        dbc.NavbarToggler(id="navbar-toggler", className="ml-auto"),
 
-    dbc.Collapse(
-        dbc.Row([
-            dbc.NavLink("MAP", href='#'),
-            dbc.NavLink("TIMELINE", href='#timeline', external_link=True),
-            dbc.NavLink("PROGRESSION", href='#progression', external_link=True),
-            dbc.NavLink("ABOUT", href='#about', external_link=True),
-        ], no_gutters=True, className="ml-auto flex-nowrap mt-3 mt-md-0", align="center"),
-        id="navbar-collapse", navbar=True),
+        dbc.Collapse(
+            dbc.Row([
+                dbc.NavLink("MAP", href='#'),
+                dbc.NavLink("TIMELINE", href='#timeline', external_link=True),
+                dbc.NavLink("PROGRESSION", href='#progression', external_link=True),
+                dbc.NavLink("ABOUT", href='#about', external_link=True),
+                # hidden while a single dataset is served
+                dbc.Select(id='dataset', options=registry.options(), value=registry.default, bs_size='sm',
+                           className='ml-3' if len(registry) > 1 else 'd-none', style={'width': '240px'}),
+            ], no_gutters=True, className="ml-auto flex-nowrap mt-3 mt-md-0", align="center"),
+            id="navbar-collapse", navbar=True),
 
-], sticky="top", className='mb-4 bg-white', style={'WebkitBoxShadow': '0px 5px 5px 0px rgba(100, 100, 100, 0.1)', })
+    ], sticky="top", className='mb-4 bg-white', style={'WebkitBoxShadow': '0px 5px 5px 0px rgba(100, 100, 100, 0.1)', })
 
 
 # add callback for toggling the collapse on small screens
@@ -158,182 +410,213 @@ map_data_options = [{'label': 'Confirmed Cases', 'value': 'confirmed_cases'},
                     {'label': 'Recovered', 'value': 'recovered'},
                     {'label': 'Active Cases', 'value': 'active'}, ]
 
-map_section = dbc.Container([
-    dbc.Row([
-        html.Div(id='output-clientside', style={'height': '5vh'}),
-        dbc.Col(dcc.Graph(id='map_plot', config=config, style={'height': '78vh'}), width=12),
-    ]),
-
-    dbc.Row(
-        dbc.Col(
-            dbc.Select(id='map_data', options=map_data_options, className='position-relative',
-                       style={'left': '3vw', 'top': '-75vh', 'width': '240px'}, value='confirmed_cases')
-            , className='col-12')
-        , id='timeline', style={'height': '0px'}),
-
-    dbc.Row([
-        dbc.Col([
-            dbc.Checklist(options=[{"label": "Per mio Capita", "value": True, 'disabled': False}], value=[],
-                          id="per_capita", switch=True, className='position-relative',
-                          style={'left': '3vw', 'top': '-70vh', 'color': '#508caf', 'width': '240px'}),
-        ], className='col-12'),
-        dbc.Col([
-            dbc.Checklist(options=[{"label": "Exclude Population < 300K", "value": True, 'disabled': False}], value=[],
-                          id="small_pop", switch=True, className='position-relative',
-                          style={'left': '3vw', 'top': '-68vh', 'color': '#508caf', 'width': '240px'}),
-        ], className='col-12'),
-    ], style={'height': '0px'}),
-
-    html.Div(
-        dcc.Slider(min=0, max=no_days, step=1, value=no_days, id='date_slider', updatemode='mouseup',
-                   marks=slider_marks,
-                   className='pl-0')
-        , className='position-relative', style={'left': '3vw', 'bottom': '-2vh', 'width': '94vw', 'height': '0px'}),
-
-    dbc.Card([
-        dbc.CardHeader(
-            html.H2("", id='stat_card_header', className='m-0',
-                    style={'color': '#508caf'})
-            , style={'backgroundColor': 'rgba(255,255,255,0.5)'}),
-        dbc.CardBody([
-            html.H4("", id='lbl_cases', style={'color': '#666666'}),
-            html.Pre('', id='lbl_cases_per_capita', style={'color': '#666666'}),
-            html.H4('', id='lbl_deaths', style={'color': '#666666'}),
-            html.Pre('', id='lbl_deaths_rate', className='m-0', style={'color': '#666666'}),
-        ], style={'backgroundColor': 'rgba(255,255,255,0.5)', 'padding': '10px 5px 10px 20px'})
-    ], style={'backgroundColor': 'rgba(255,255,255,0.5)', 'left': '3vw', 'top': '-25vh', 'width': '242px'}),
-
-], fluid=True, id='map_section', style={'height': '90vh'})
-
-timeline_section = dbc.Container([
-    dbc.Card([
-        dbc.CardHeader([
-            html.H4('TIMELINE', className='d-inline'),
-            dbc.Button(html.I('info', className='material-icons md-24 logoColor'), color='link', id='info1',
-                       className='float-right p-0'),
-            dbc.Modal([
-                dbc.ModalHeader("INFORMATION"),
-                dbc.ModalBody([
-                    html.H5('Data Selection', className='font-weight-bold'),
-                    dcc.Markdown(md1),
-                    html.Br(),
-                    html.H5('Data Split', className='font-weight-bold'),
-                    dcc.Markdown(md2),
-                    html.Br(),
-                    html.H5('Definition', className='font-weight-bold'),
-                    dcc.Markdown(md3),
-                ]),
-                dbc.ModalFooter(dbc.Button("Close", id="close", className="ml-auto")),
-            ], id="modal", size='lg', scrollable=True, style={'Height': '40vh'})
+# rolling metrics selectable in the progression: title, hover label
+metric_options = {'confirmed_cases_ma7': ('Daily Cases (7-day avg)', 'Daily cases'),
+                  'deaths_ma7': ('Daily Deaths (7-day avg)', 'Daily deaths'),
+                  'recovered_ma7': ('Daily Recovered (7-day avg)', "Daily rec'd"),
+                  'confirmed_cases_growth': ('Cases Growth Rate', 'Growth'),
+                  'deaths_growth': ('Deaths Growth Rate', 'Growth'),
+                  'confirmed_cases_doubling': ('Cases Doubling Time', 'Doubling'),
+                  'deaths_doubling': ('Deaths Doubling Time', 'Doubling'), }
+prog_data_options = map_data_options + [{'label': v[0], 'value': k} for k, v in metric_options.items()]
+prog_data_values = {option['value'] for option in prog_data_options}
+
+
+def map_section():
+    ds = registry.get()
+    return dbc.Container([
+        dbc.Row([
+            html.Div(id='output-clientside', style={'height': '5vh'}),
+            dbc.Col(dcc.Graph(id='map_plot', config=config, style={'height': '78vh'}), width=12),
         ]),
 
-        dbc.CardBody([
-            dbc.Row([
-                dbc.Col([
-                    dbc.Label('Region', html_for='timeline_dd_region'),
-                    dcc.Dropdown(options=region_options, id='timeline_dd_region', value=[],
-                                 multi=True, style={'fontSize': '100%'}, placeholder='Optional Region'),
-                ], className='col-12 col-md-6 col-xl-3'),
-                dbc.Col([
-                    dbc.Label('Sub-Region', html_for='timeline_dd_subregion'),
-                    dcc.Dropdown(options=subregion_options, id='timeline_dd_subregion', value=[],
-                                 multi=True, style={'fontSize': '100%'}, placeholder='Optional Sub-Region'),
-                ], className='col-12 col-md-6 col-xl-3'),
-                dbc.Col([
-                    dbc.Label('Country', html_for='timeline_dd_country'),
-                    dcc.Dropdown(options=country_options, id='timeline_dd_country', value=[],
-                                 multi=True, style={'fontSize': '100%'}, placeholder='Optional Country'),
-                ], className='col-12 col-md-6 col-xl-3'),
-                dbc.Col([
-                    dbc.Label('Area', html_for='timeline_dd_area'),
-                    dcc.Dropdown(options=area_options, id='timeline_dd_area', value=[],
-                                 multi=True, style={'fontSize': '100%'}, placeholder='Optional Country Area'),
-                ], className='col-12 col-md-6 col-xl-3'),
-                html.Div(id='first_time', children=True, style={'display': 'none'}),
-            ], className='mb-4'),
+        dbc.Row(
+            dbc.Col(
+                dbc.Select(id='map_data', options=map_data_options, className='position-relative',
+                           style={'left': '3vw', 'top': '-75vh', 'width': '240px'}, value='confirmed_cases')
+                , className='col-12')
+            , id='timeline', style={'height': '0px'}),
 
-            dbc.Row([
-                dbc.Col([
-                    dcc.Dropdown(options=split_options, id='timeline_split',
-                                 multi=False, style={'fontSize': '100%'},
-                                 placeholder='Optional Split by')
-                ], className='col-12 col-md-6 col-xl-3 mb-4'),
-                dbc.Col([
-                    dbc.Row([
-                        dbc.Label('Limit Split to Top:', width=6, className='text-right pr-0'),
-                        dbc.Col(dbc.Input(type="number", min=1, step=1, value='5', id='top_limit'), width=6)
-                    ], id='row_limit', className='d_none'),
-                ], className='col-12 col-md-6 col-xl-3 mb-4'),
-                dbc.Col([
-                    dbc.Button('Refresh', color='primary', id='timeline_refresh', className='float-right',
-                               style={'width': '100px'})
-                ], className='col-12 col-md-12 col-xl-6 mb-4'),
-            ], className='mb-4'),
-            dbc.Row([
-                dbc.Col(
-                    dbc.Toast(
-                        'The tab "Current" will be enabled upon refresh',
-                        id="toast",
-                        header="Tooltip",
-                        is_open=False,
-                        dismissable=False,
-                        duration=3000,
-                        icon="primary",
-                        style={"position": "fixed", "top": 100, "right": 30, "width": 300, 'zIndex': 999},
-                    )
-                    , className='col-12')
+        dbc.Row([
+            dbc.Col([
+                dbc.Checklist(options=[{"label": "Per mio Capita", "value": True, 'disabled': False}], value=[],
+                              id="per_capita", switch=True, className='position-relative',
+                              style={'left': '3vw', 'top': '-70vh', 'color': '#508caf', 'width': '240px'}),
+            ], className='col-12'),
+            dbc.Col([
+                dbc.Checklist(options=[{"label": "Exclude Population < 300K", "value": True, 'disabled': False}], value=[],
+                              id="small_pop", switch=True, className='position-relative',
+                              style={'left': '3vw', 'top': '-68vh', 'color': '#508caf', 'width': '240px'}),
+            ], className='col-12'),
+        ], style={'height': '0px'}),
+
+        html.Div(
+            dcc.Slider(min=0, max=ds.no_days, step=1, value=ds.no_days, id='date_slider', updatemode='mouseup',
+                       marks=slider_marks(ds),
+                       className='pl-0')
+            , className='position-relative', style={'left': '3vw', 'bottom': '-2vh', 'width': '94vw', 'height': '0px'}),
+
+        dbc.Card([
+            dbc.CardHeader(
+                html.H2("", id='stat_card_header', className='m-0',
+                        style={'color': '#508caf'})
+                , style={'backgroundColor': 'rgba(255,255,255,0.5)'}),
+            dbc.CardBody([
+                html.H4("", id='lbl_cases', style={'color': '#666666'}),
+                html.Pre('', id='lbl_cases_per_capita', style={'color': '#666666'}),
+                html.H4('', id='lbl_deaths', style={'color': '#666666'}),
+                html.Pre('', id='lbl_deaths_rate', className='m-0', style={'color': '#666666'}),
+            ], style={'backgroundColor': 'rgba(255,255,255,0.5)', 'padding': '10px 5px 10px 20px'})
+        ], style={'backgroundColor': 'rgba(255,255,255,0.5)', 'left': '3vw', 'top': '-25vh', 'width': '242px'}),
+
+    ], fluid=True, id='map_section', style={'height': '90vh'})
+
+
+def timeline_section():
+    return dbc.Container([
+        dbc.Card([
+            dbc.CardHeader([
+                html.H4('TIMELINE', className='d-inline'),
+                dbc.Button(html.I('info', className='material-icons md-24 logoColor'), color='link', id='info1',
+                           className='float-right p-0'),
+                dbc.Modal([
+                    dbc.ModalHeader("INFORMATION"),
+                    # the body is only built when the modal is first opened
+                    dbc.ModalBody(id='modal_body'),
+                    dbc.ModalFooter(dbc.Button("Close", id="close", className="ml-auto")),
+                ], id="modal", size='lg', scrollable=True, style={'Height': '40vh'})
             ]),
-            dbc.Tabs([
-                dbc.Tab(label="Timeline", tab_id="tab_timeline"),
-                dbc.Tab(label="Current: " + str(end_date.strftime('%d %b')), tab_id="tab_current",
-                        id='extra_tab', disabled=True),
-            ], id="tabs", active_tab="tab_timeline",
-            ),
-            html.Div([
-                dbc.Row([
-                    dbc.Col([dbc.Spinner(dcc.Graph(id='timeline_1', config=config, style={'height': '47vh'}),
-                                         color='secondary', size='lg')], className='col-12 col-xl-6'),
-                    dbc.Col([dbc.Spinner(dcc.Graph(id='timeline_2', config=config, style={'height': '47vh'}),
-                                         color='secondary', size='lg')], className='col-12 col-md-6 col-xl-3'),
-                    dbc.Col([dbc.Spinner(dcc.Graph(id='timeline_3', config=config, style={'height': '47vh'}),
-                                         color='secondary', size='lg')], className='col-12 col-md-6 col-xl-3'),
-                ], style={'minHeight': '47vh'}, id='split_view', className='mt-4 d-none'),
+
+            dbc.CardBody([
                 dbc.Row([
-                    dbc.Col(dbc.Spinner(
-                        dcc.Graph(id='stack_1', config=config, style={'height': '47vh'}), color='secondary', size='lg')
-                        , className='col-12 col-xl-6'),
-                    dbc.Col(dbc.Spinner(
-                        dcc.Graph(id='stack_2', config=config, style={'height': '47vh'}), color='secondary', size='lg')
-                        , className='col-12 col-xl-6'),
-                ], id='stack_view', className='mt-4', style={'minHeight': '47vh'}),
+                    dbc.Col([
+                        dbc.Label('Region', html_for='timeline_dd_region'),
+                        dcc.Dropdown(options=dropdown_options('region'), id='timeline_dd_region', value=[],
+                                     multi=True, style={'fontSize': '100%'}, placeholder='Optional Region'),
+                    ], className='col-12 col-md-6 col-xl-3'),
+                    dbc.Col([
+                        dbc.Label('Sub-Region', html_for='timeline_dd_subregion'),
+                        dcc.Dropdown(options=dropdown_options('subregion'), id='timeline_dd_subregion', value=[],
+                                     multi=True, style={'fontSize': '100%'}, placeholder='Optional Sub-Region'),
+                    ], className='col-12 col-md-6 col-xl-3'),
+                    dbc.Col([
+                        dbc.Label('Country', html_for='timeline_dd_country'),
+                        dcc.Dropdown(options=dropdown_options('country'), id='timeline_dd_country', value=[],
+                                     multi=True, style={'fontSize': '100%'}, placeholder='Optional Country'),
+                    ], className='col-12 col-md-6 col-xl-3'),
+                    dbc.Col([
+                        dbc.Label('Area', html_for='timeline_dd_area'),
+                        dcc.Dropdown(options=dropdown_options('area'), id='timeline_dd_area', value=[],
+                                     multi=True, style={'fontSize': '100%'}, placeholder='Optional Country Area'),
+                    ], className='col-12 col-md-6 col-xl-3'),
+                    # selection of the last refresh, and the selection each view was last computed for
+                    dcc.Store(id='timeline_selection'),
+                    dcc.Store(id='timeline_bars_key'),
+                    dcc.Store(id='stack_key'),
+                    dcc.Store(id='detail_key'),
+                    # background jobs of the timeline views, polled until finished
+                    dcc.Store(id='timeline_job'),
+                    dcc.Interval(id='timeline_job_poll', interval=JOB_POLL_MS, disabled=True),
+                    dcc.Store(id='stack_job'),
+                    dcc.Interval(id='stack_job_poll', interval=JOB_POLL_MS, disabled=True),
+                    dcc.Store(id='detail_job'),
+                    dcc.Interval(id='detail_job_poll', interval=JOB_POLL_MS, disabled=True),
+                ], className='mb-4'),
+
                 dbc.Row([
                     dbc.Col([
-                        dbc.Checklist(options=[{"label": "Show Split Data", "value": True}],
-                                      id="split_data", switch=True, className='mb-4 position-relative',
-                                      style={'left': '3vw'}, value=False),
-                    ], className='col-12 col-md-4 col-lg-3 col-xl-2'),
+                        dcc.Dropdown(options=split_options, id='timeline_split',
+                                     multi=False, style={'fontSize': '100%'},
+                                     placeholder='Optional Split by')
+                    ], className='col-12 col-md-6 col-xl-3 mb-4'),
+                    dbc.Col([
+                        dbc.Row([
+                            dbc.Label('Limit Split to Top:', width=6, className='text-right pr-0'),
+                            dbc.Col(dbc.Input(type="number", min=1, step=1, value='5', id='top_limit'), width=6)
+                        ], id='row_limit', className='d_none'),
+                    ], className='col-12 col-md-6 col-xl-3 mb-4'),
                     dbc.Col([
-                        dbc.Checklist(options=[{"label": "Show Daily Increments", "value": True}],
-                                      id="incremental_data", switch=True, className='mb-4 position-relative',
-                                      value=False),  # style={'left':'3vw'}),
-                    ], className='col-12 col-md-6'),
+                        dbc.Button('Refresh', color='primary', id='timeline_refresh', className='float-right',
+                                   style={'width': '100px'}),
+                        html.Div([
+                            dbc.Button('Up', color='link', id='drill_up', className='p-0 mr-2'),
+                            html.Span(id='drill_path'),
+                        ], id='drill_bar', className='d-none'),
+                        html.Div(id='timeline_job_status', style={'clear': 'both'}),
+                        html.Div(id='stack_job_status', style={'clear': 'both'}),
+                        html.Div(id='detail_job_status', style={'clear': 'both'}),
+                    ], className='col-12 col-md-12 col-xl-6 mb-4'),
+                ], className='mb-4'),
+                dbc.Row([
+                    dbc.Col(
+                        dbc.Toast(
+                            'The tab "Current" will be enabled upon refresh',
+                            id="toast",
+                            header="Tooltip",
+                            is_open=False,
+                            dismissable=False,
+                            duration=3000,
+                            icon="primary",
+                            style={"position": "fixed", "top": 100, "right": 30, "width": 300, 'zIndex': 999},
+                        )
+                        , className='col-12')
                 ]),
-            ], id='timeline_row', className='mt-4'),
+                dbc.Tabs([
+                    dbc.Tab(label="Timeline", tab_id="tab_timeline"),
+                    dbc.Tab(label="Current: " + str(registry.get().end_date.strftime('%d %b')),
+                            tab_id="tab_current", id='extra_tab', disabled=True),
+                ], id="tabs", active_tab="tab_timeline",
+                ),
+                html.Div([
+                    dbc.Row([
+                        dbc.Col([dbc.Spinner(dcc.Graph(id='timeline_1', config=config, style={'height': '47vh'}),
+                                             color='secondary', size='lg')], className='col-12 col-xl-6'),
+                        dbc.Col([dbc.Spinner(dcc.Graph(id='timeline_2', config=config, style={'height': '47vh'}),
+                                             color='secondary', size='lg')], className='col-12 col-md-6 col-xl-3'),
+                        dbc.Col([dbc.Spinner(dcc.Graph(id='timeline_3', config=config, style={'height': '47vh'}),
+                                             color='secondary', size='lg')], className='col-12 col-md-6 col-xl-3'),
+                    ], style={'minHeight': '47vh'}, id='split_view', className='mt-4 d-none'),
+                    dbc.Row([
+                        dbc.Col(dbc.Spinner(
+                            dcc.Graph(id='stack_1', config=config, style={'height': '47vh'}), color='secondary', size='lg')
+                            , className='col-12 col-xl-6'),
+                        dbc.Col(dbc.Spinner(
+                            dcc.Graph(id='stack_2', config=config, style={'height': '47vh'}), color='secondary', size='lg')
+                            , className='col-12 col-xl-6'),
+                    ], id='stack_view', className='mt-4', style={'minHeight': '47vh'}),
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Checklist(options=[{"label": "Show Split Data", "value": True}],
+                                          id="split_data", switch=True, className='mb-4 position-relative',
+                                          style={'left': '3vw'}, value=False),
+                        ], className='col-12 col-md-4 col-lg-3 col-xl-2'),
+                        dbc.Col([
+                            dbc.Checklist(options=[{"label": "Show Daily Increments", "value": True}],
+                                          id="incremental_data", switch=True, className='mb-4 position-relative',
+                                          value=False),  # style={'left':'3vw'}),
+                        ], className='col-12 col-md-4 col-lg-3 col-xl-2'),
+                        dbc.Col([
+                            dbc.Checklist(options=[{"label": "7-day Average", "value": True}],
+                                          id="smooth_data", switch=True, className='mb-4 position-relative d-none',
+                                          value=False),
+                        ], className='col-12 col-md-4'),
+                    ]),
+                ], id='timeline_row', className='mt-4'),
 
-            dbc.Row([
-                dbc.Col([dbc.Spinner(dcc.Graph(id='detail_1', config=config, style={'height': '50vh'}),
-                                     color='secondary', size='lg')], className='col-12 col-xl-6'),
-                dbc.Col([dbc.Spinner(dcc.Graph(id='detail_2', config=config, style={'height': '50vh'}),
-                                     color='secondary', size='lg')], className='col-12 col-md-6 col-xl-3'),
-                dbc.Col([dbc.Spinner(dcc.Graph(id='detail_3', config=config, style={'height': '50vh'}),
-                                     color='secondary', size='lg')], className='col-12 col-md-6 col-xl-3'),
-            ], id='current_row', className='mt-4 d-none'),
-        ]),
-    ], style={'minHeight': '80vh'}),
+                dbc.Row([
+                    dbc.Col([dbc.Spinner(dcc.Graph(id='detail_1', config=config, style={'height': '50vh'}),
+                                         color='secondary', size='lg')], className='col-12 col-xl-6'),
+                    dbc.Col([dbc.Spinner(dcc.Graph(id='detail_2', config=config, style={'height': '50vh'}),
+                                         color='secondary', size='lg')], className='col-12 col-md-6 col-xl-3'),
+                    dbc.Col([dbc.Spinner(dcc.Graph(id='detail_3', config=config, style={'height': '50vh'}),
+                                         color='secondary', size='lg')], className='col-12 col-md-6 col-xl-3'),
+                ], id='current_row', className='mt-4 d-none'),
+            ]),
+        ], style={'minHeight': '80vh'}),
 
-    # bottom of screen
-    dbc.Row([], id='progression', style={'minHeight': '10vh'}),
-], fluid=True, id='timeline_section')
+        # bottom of screen
+        dbc.Row([], id='progression', style={'minHeight': '10vh'}),
+    ], fluid=True, id='timeline_section')
 
 
 @app.callback(Output('incremental_data', 'className'),
@@ -345,6 +628,15 @@ def show_increment_switch(value):
         return 'mb-4 position-relative d-none'
 
 
+@app.callback(Output('smooth_data', 'className'),
+              [Input('split_data', 'value'), Input('incremental_data', 'value')])
+def show_smooth_switch(value, show_increments):
+    if value and show_increments:
+        return 'mb-4 position-relative'
+    else:
+        return 'mb-4 position-relative d-none'
+
+
 @app.callback([Output('split_view', 'className'),
                Output('stack_view', 'className')],
               [Input('split_data', 'value')])
@@ -356,14 +648,25 @@ def show_stack_split_view(value):
 
 
 @app.callback(
-    Output("modal", "is_open"),
+    [Output("modal", "is_open"), Output("modal_body", "children")],
     [Input("info1", "n_clicks"), Input("close", "n_clicks")],
-    [State("modal", "is_open")],
+    [State("modal", "is_open"), State("modal_body", "children")],
 )
-def toggle_modal(n1, n2, is_open):
+def toggle_modal(n1, n2, is_open, body):
     if n1 or n2:
-        return not is_open
-    return is_open
+        if body or is_open:
+            return not is_open, dash.no_update
+        return True, [
+            html.H5('Data Selection', className='font-weight-bold'),
+            dcc.Markdown(md1),
+            html.Br(),
+            html.H5('Data Split', className='font-weight-bold'),
+            dcc.Markdown(md2),
+            html.Br(),
+            html.H5('Definition', className='font-weight-bold'),
+            dcc.Markdown(md3),
+        ]
+    return is_open, dash.no_update
 
 
 @app.callback(Output('row_limit', 'className'),
@@ -372,6 +675,25 @@ def update_display_row_limit(value):
     return "" if value else 'd-none'
 
 
+def register_dropdown_search(dd_id, level):
+    @app.callback(Output(dd_id, 'options'),
+                  [Input(dd_id, 'search_value')],
+                  [State(dd_id, 'value'), State('dataset', 'value')])
+    def update_dropdown_options(search_value, value, dataset):
+        index = get_name_indexes(registry.get(dataset))[level]
+        if search_value is None or len(index) <= DROPDOWN_LIMIT:
+            # small levels are listed whole by the layout
+            raise PreventUpdate
+        selected = value or []
+        names = index.search(search_value, DROPDOWN_LIMIT)
+        return [{'label': x, 'value': x} for x in selected + [x for x in names if x not in selected]]
+
+
+for dd_level in ['region', 'subregion', 'country', 'area']:
+    register_dropdown_search('timeline_dd_' + dd_level, dd_level)
+    register_dropdown_search('prog_dd_' + dd_level, dd_level)
+
+
 @app.callback(Output("toast", "is_open"),
               [Input('timeline_split', 'value')],
               [State('extra_tab', 'disabled')])
@@ -401,59 +723,132 @@ def update_timeline_view(sel_tab):
         return 'mt-4 d-none', 'mt-4'
 
 
-@app.callback([Output('timeline_1', 'figure'),
-               Output('timeline_2', 'figure'),
-               Output('timeline_3', 'figure'),
-               Output('detail_1', 'figure'),
-               Output('detail_2', 'figure'),
-               Output('detail_3', 'figure'),
-               Output('stack_1', 'figure'),
-               Output('stack_2', 'figure'),
-               Output('extra_tab', 'disabled'),
-               Output('tabs', 'active_tab'),
-               Output('first_time', 'children')
-               ],
-              [Input('timeline_refresh', 'n_clicks'), Input('incremental_data', 'value')],
+# aggregates of the timeline selections, shared by the views of the timeline
+timeline_cache = LRUCache(maxsize=int(os.environ.get('TIMELINE_CACHE_SIZE', 32)))
+
+# summed per date (and split) by the timeline
+TIMELINE_COLS = ['confirmed_cases', 'deaths', 'recovered', 'active', 'population']
+INC_COLS = ['confirmed_cases_inc', 'deaths_inc', 'recovered_inc']
+SMOOTH_INC_COLS = [c + '_ma7' for c in INC_COLS]
+
+
+@app.callback([Output('timeline_selection', 'data'), Output('extra_tab', 'disabled'), Output('tabs', 'active_tab')],
+              [Input('timeline_refresh', 'n_clicks'), Input('dataset', 'value'), Input('timeline_1', 'clickData'),
+               Input('detail_1', 'clickData'), Input('drill_up', 'n_clicks')],
               [State('timeline_dd_region', 'value'), State('timeline_dd_subregion', 'value'),
                State('timeline_dd_country', 'value'), State('timeline_dd_area', 'value'),
-               State('timeline_split', 'value'), State('top_limit', 'value'),
-               State('first_time', 'children')])
-def update_timeline_plots(n, show_increments, region, subregion, country, area, split, top_limit, first_time):
+               State('timeline_split', 'value'), State('top_limit', 'value'), State('timeline_selection', 'data')])
+def update_timeline_selection(n, dataset, bars_click, detail_click, n_up, region, subregion, country, area, split,
+                              top_limit, current):
     ctx = dash.callback_context
-    if not ctx.triggered:
-        comp_id = 'no.one'
-    else:
-        comp_id = ctx.triggered[0]['prop_id'].split('.')[0]
-
-    # apply filter on df
-    region_idx = []
-    if region:
-        region_idx = df[df['region'].isin(region)].index.to_list()
-    subregion_idx = []
-    if subregion:
-        subregion_idx = df[df['subregion'].isin(subregion)].index.to_list()
-    country_idx = []
-    if country:
-        country_idx = df[df['country'].isin(country)].index.to_list()
-    area_idx = []
-    if area:
-        area_idx = df[df['country_area'].isin(area)].index.to_list()
-
-    idx = list(set().union(region_idx, subregion_idx, country_idx, area_idx))
-
-    if idx:
-        dff = df.loc[idx, :]
-    else:
-        dff = df
-    # need to aggregate the dff
+    trigger = ctx.triggered[0]['prop_id'] if ctx.triggered else 'timeline_refresh.n_clicks'
+    if trigger in ('timeline_1.clickData', 'detail_1.clickData', 'drill_up.n_clicks'):
+        # the drill-down moves within the refreshed selection
+        if not current or current.get('drill') is None:
+            raise PreventUpdate
+        path = current['drill']
+        if trigger == 'drill_up.n_clicks':
+            if not path:
+                raise PreventUpdate
+            path = path[:-1]
+        else:
+            name = clicked_category(bars_click if trigger == 'timeline_1.clickData' else detail_click)
+            if current['split'] == DRILL_LEVELS[-1] or name in (None, 'Rest'):
+                raise PreventUpdate
+            path = path + [[current['split'], name]]
+        return dict(current, split=DRILL_LEVELS[len(path)], drill=path), False, dash.no_update
+
+    selection = timeline_selection(dataset, region, subregion, country, area, split, top_limit)
+    if split:
+        return selection, False, dash.no_update
+    return selection, True, 'tab_timeline'
+
+
+def timeline_selection(dataset, region, subregion, country, area, split, top_limit):
+    """ the views of the timeline are computed from this selection, each one when visible """
+    drill = [] if split == 'drilldown' else None
+    return {'dataset': dataset, 'region': normalize_arg(region), 'subregion': normalize_arg(subregion),
+            'country': normalize_arg(country), 'area': normalize_arg(area),
+            'split': DRILL_LEVELS[0] if drill is not None else split or None, 'drill': drill,
+            'top_limit': max(1, int(top_limit)) if split and top_limit else None}
+
+
+def clicked_category(click_data):
+    """ split category of a clicked point: in the customdata of the bars over time, on the y axis of the details """
+    if not click_data or not click_data.get('points'):
+        return None
+    point = click_data['points'][0]
+    customdata = point.get('customdata')
+    if isinstance(customdata, list) and len(customdata) > 1:
+        return customdata[1]
+    return point.get('y')
+
+
+@app.callback([Output('drill_bar', 'className'), Output('drill_path', 'children')],
+              [Input('timeline_selection', 'data')])
+def update_drill_bar(selection):
+    if not selection or selection.get('drill') is None:
+        return 'd-none', ''
+    path = ' > '.join(['World'] + [name for _, name in selection['drill']])
+    return 'mt-2', '{} (click a bar to split it)'.format(path) if selection['split'] != DRILL_LEVELS[-1] else path
+
+
+def level_filters(region, subregion, country, area):
+    """ backend filters of the selected names, the rows of any of them """
+    return {'region': region, 'subregion': subregion, 'country': country, 'country_area': area}
+
+
+def build_rollups(ds):
+    """
+    sums per date of the children of every node of the hierarchy, by (level, name) of the node, (None, None)
+    being the root, so that a drill-down step only reads the rows of the node's children
+    """
+    rollups = {}
+    for parent, level in zip([None] + DRILL_LEVELS[:-1], DRILL_LEVELS):
+        if parent is None:
+            rollups[(None, None)] = ds.backend.aggregate([level, 'date'], TIMELINE_COLS)
+            continue
+        frame = ds.backend.aggregate([parent, level, 'date'], TIMELINE_COLS)
+        for name, children in frame.groupby(parent, sort=False):
+            rollups[(parent, name)] = children.drop(columns=parent).reset_index(drop=True)
+    return rollups
+
+
+def get_rollups(ds):
+    return ds.derived('rollups', build_rollups)
+
+
+def split_aggregate(ds, filters, split, drill):
+    """ sums per split and date of the rows of the filters, within the last node of the drill-down path if any """
+    if drill is not None and not any(filters.values()):
+        rollup = get_rollups(ds).get(tuple(drill[-1]) if drill else (None, None))
+        if rollup is not None:
+            # a copy, the views add their columns to the aggregate
+            return rollup.copy()
+    conditions = [(drill[-1][0], '=', drill[-1][1])] if drill else []
+    return ds.backend.aggregate([split, 'date'], TIMELINE_COLS, filters, conditions=conditions)
+
+
+def timeline_aggregate(selection):
+    """ sums per date (and split) of the selection, shared by the views and by the concurrent calls """
+    ds = registry.get(selection['dataset'])
+    key = ('timeline_aggregate', ds.version, json.dumps(selection, sort_keys=True))
+    return timeline_cache.get_or_compute(key, lambda: flight.do(key, lambda: compute_timeline_aggregate(ds, selection)))
+
+
+def compute_timeline_aggregate(ds, selection):
+    backend, end_date = ds.backend, ds.end_date
+    filters = level_filters(*[selection[k] for k in ['region', 'subregion', 'country', 'area']])
+    split, top_limit = selection['split'], selection['top_limit']
 
+    # daily increments and their 7-day average are summed into the Rest of the split as is, so the top-N is taken
+    # over the sums per split rather than by the backend
     cat_orders = {}
     if split:
-        dff_agg = dff.loc[:, [split, 'date', 'confirmed_cases', 'deaths', 'recovered', 'active', 'population']].groupby(
-            [split, 'date']).sum().reset_index().sort_values([split, 'date'])
-        if show_increments:
-            dff_agg[['confirmed_cases_inc', 'deaths_inc', 'recovered_inc']] = dff_agg.groupby([split])[
-                ['confirmed_cases', 'deaths', 'recovered']].diff().fillna(0)
+        dff_agg = split_aggregate(ds, filters, split, selection.get('drill'))
+        dff_agg[INC_COLS] = dff_agg.groupby([split])[['confirmed_cases', 'deaths', 'recovered']].diff().fillna(0)
+        dff_agg[SMOOTH_INC_COLS] = dff_agg[INC_COLS]
+        metrics.smooth_increments(dff_agg, SMOOTH_INC_COLS, split)
         # compute the category orders
         dff_cat_order = dff_agg.loc[dff_agg['date'] == end_date, [split, 'confirmed_cases', 'population']].groupby(
             [split]).sum() \
@@ -461,8 +856,7 @@ def update_timeline_plots(n, show_increments, region, subregion, country, area,
         cat_orders = {split: dff_cat_order[split].tolist()}
 
         if top_limit:
-            limit = max(1, int(top_limit))
-            top_split = dff_cat_order.nlargest(limit, ['confirmed_cases'])[split].tolist()
+            top_split = dff_cat_order.nlargest(top_limit, ['confirmed_cases'])[split].tolist()
             dff_agg_split = dff_agg[dff_agg[split].isin(top_split)]
             dff_agg_rest = dff_agg[~dff_agg[split].isin(top_split)].groupby(['date']).sum().reset_index()
             dff_agg_rest[split] = 'Rest'
@@ -472,25 +866,71 @@ def update_timeline_plots(n, show_increments, region, subregion, country, area,
             cat_orders = {split: dff_cat_order[split].tolist()}
 
     else:
-        dff_agg = dff.loc[:, ['date', 'confirmed_cases', 'deaths', 'recovered', 'active', 'population']].groupby(
-            ['date']).sum().reset_index().sort_values(['date'])
-        if show_increments:
-            dff_agg[['confirmed_cases_inc', 'deaths_inc', 'recovered_inc']] = dff_agg[
-                ['confirmed_cases', 'deaths', 'recovered']].diff().fillna(0)
+        drill = selection.get('drill')
+        conditions = [(drill[-1][0], '=', drill[-1][1])] if drill else []
+        dff_agg = backend.aggregate(['date'], TIMELINE_COLS, filters, conditions=conditions)
+        dff_agg[INC_COLS] = dff_agg[['confirmed_cases', 'deaths', 'recovered']].diff().fillna(0)
+        dff_agg[SMOOTH_INC_COLS] = dff_agg[INC_COLS]
+        metrics.smooth_increments(dff_agg, SMOOTH_INC_COLS)
 
+    dff_agg['case_capita'] = dff_agg['confirmed_cases'] / dff_agg['population']
+    dff_agg['deaths_rate'] = dff_agg['deaths'] / dff_agg['confirmed_cases']
+    dff_agg['rec_rate'] = dff_agg['recovered'] / dff_agg['confirmed_cases']
+    return dff_agg, cat_orders
+
+
+@app.callback([Output('timeline_1', 'figure'),
+               Output('timeline_2', 'figure'),
+               Output('timeline_3', 'figure'),
+               Output('timeline_bars_key', 'data'),
+               Output('timeline_job', 'data'),
+               Output('timeline_job_poll', 'disabled'),
+               Output('timeline_job_status', 'children')
+               ],
+              [Input('timeline_selection', 'data'), Input('incremental_data', 'value'), Input('smooth_data', 'value'),
+               Input('split_data', 'value'), Input('tabs', 'active_tab'), Input('timeline_job_poll', 'n_intervals')],
+              [State('timeline_bars_key', 'data'), State('session_id', 'data'), State('timeline_job', 'data')])
+def update_timeline_bars(selection, show_increments, smooth, split_view, tab, n_poll, rendered, session, job_id):
+    ctx = dash.callback_context
+    polled = ctx.triggered and ctx.triggered[0]['prop_id'] == 'timeline_job_poll.n_intervals'
+    job = polled_job(ctx, 'timeline_job_poll', job_id)
+    if job is not None:
+        return job_outputs(job, 4)
+    show_increments, smooth = bool(show_increments), bool(show_increments and smooth)
+    view_key = json.dumps([selection, show_increments, smooth], sort_keys=True)
+    if selection is None or not split_view or tab != 'tab_timeline' or view_key == rendered:
+        # hidden (computed once shown) or up to date
+        if polled:
+            return job_outputs(None, 4)
+        raise PreventUpdate
+    key = ('timeline_bars', registry.fingerprint, view_key)
+    # the other top limits of the selection are near-identical
+    near_key = json.dumps([dict(selection, top_limit=None), show_increments, smooth], sort_keys=True)
+
+    def compute():
+        figures, current = admitted('timeline_bars', lambda: timeline_bars(selection, show_increments, smooth),
+                                    view_key, near_key, ['Confirmed Cases', 'Deaths', 'Recovered'])
+        return figures + (view_key if current else None,)
+
+    return run_job('timeline', key, session, compute, 4)
+
+
+@profiler.profile('timeline_bars')
+def timeline_bars(selection, show_increments, smooth):
+    profiler.stage('aggregate')
+    dff_agg, cat_orders = timeline_aggregate(selection)
+    split = selection['split']
+    checkpoint(0.3, 'Plotting')
+    profiler.stage('plot')
+
+    inc_cols = SMOOTH_INC_COLS if smooth else INC_COLS
     if show_increments:
-        if split:
-            dff_agg[['case_capita', 'deaths_rate', 'rec_rate']] = dff_agg.groupby([split])[
-                ['confirmed_cases_inc', 'deaths_inc', 'recovered_inc']].pct_change()
-        else:
-            dff_agg[['case_capita', 'deaths_rate', 'rec_rate']] = dff_agg[
-                ['confirmed_cases_inc', 'deaths_inc', 'recovered_inc']].pct_change()
-    else:
-        dff_agg['case_capita'] = dff_agg['confirmed_cases'] / dff_agg['population']
-        dff_agg['deaths_rate'] = dff_agg['deaths'] / dff_agg['confirmed_cases']
-        dff_agg['rec_rate'] = dff_agg['recovered'] / dff_agg['confirmed_cases']
+        # the rates become the daily changes of the increments, on a copy of the shared aggregate
+        changes = (dff_agg.groupby([split])[inc_cols] if split else dff_agg[inc_cols]).pct_change()
+        dff_agg = dff_agg.assign(case_capita=changes[inc_cols[0]], deaths_rate=changes[inc_cols[1]],
+                                 rec_rate=changes[inc_cols[2]])
 
-    fig = px.bar(dff_agg, x='date', y='confirmed_cases_inc' if show_increments else 'confirmed_cases', color=split,
+    fig = px.bar(dff_agg, x='date', y=inc_cols[0] if show_increments else 'confirmed_cases', color=split,
                  color_discrete_sequence=px.colors.qualitative.Dark24,
                  custom_data=['case_capita', split] if split else ['case_capita'],
                  category_orders=cat_orders)
@@ -510,7 +950,7 @@ def update_timeline_plots(n, show_increments, region, subregion, country, area,
         ht = ht + 'Per capita : %{customdata[0]:,.0f}<extra></extra>'
     fig.for_each_trace(lambda trace: trace.update(hovertemplate=ht))
 
-    fig2 = px.bar(dff_agg, x='date', y='deaths_inc' if show_increments else 'deaths', color=split,
+    fig2 = px.bar(dff_agg, x='date', y=inc_cols[1] if show_increments else 'deaths', color=split,
                   color_discrete_sequence=px.colors.qualitative.Dark24,
                   custom_data=['deaths_rate', split] if split else ['deaths_rate'],
                   category_orders=cat_orders)
@@ -528,7 +968,7 @@ def update_timeline_plots(n, show_increments, region, subregion, country, area,
         ht = ht + 'Rate : %{customdata[0]:.1%}<extra></extra>'
     fig2.for_each_trace(lambda trace: trace.update(hovertemplate=ht))
 
-    fig3 = px.bar(dff_agg, x='date', y='recovered_inc' if show_increments else 'recovered', color=split,
+    fig3 = px.bar(dff_agg, x='date', y=inc_cols[2] if show_increments else 'recovered', color=split,
                   color_discrete_sequence=px.colors.qualitative.Dark24,
                   custom_data=['rec_rate', split] if split else ['rec_rate'],
                   category_orders=cat_orders)
@@ -546,13 +986,51 @@ def update_timeline_plots(n, show_increments, region, subregion, country, area,
         ht = ht + 'Rate : %{customdata[0]:.0%}<extra></extra>'
     fig3.for_each_trace(lambda trace: trace.update(hovertemplate=ht))
 
-    if comp_id == 'incremental_data' and not first_time:
-        return fig, fig2, fig3, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
+    return fig, fig2, fig3
+
+
+@app.callback([Output('stack_1', 'figure'), Output('stack_2', 'figure'), Output('stack_key', 'data'),
+               Output('stack_job', 'data'), Output('stack_job_poll', 'disabled'),
+               Output('stack_job_status', 'children')],
+              [Input('timeline_selection', 'data'), Input('split_data', 'value'), Input('tabs', 'active_tab'),
+               Input('stack_job_poll', 'n_intervals')],
+              [State('stack_key', 'data'), State('session_id', 'data'), State('stack_job', 'data')])
+def update_stack_plots(selection, split_view, tab, n_poll, rendered, session, job_id):
+    ctx = dash.callback_context
+    polled = ctx.triggered and ctx.triggered[0]['prop_id'] == 'stack_job_poll.n_intervals'
+    job = polled_job(ctx, 'stack_job_poll', job_id)
+    if job is not None:
+        return job_outputs(job, 3)
+    # the stack view sums the whole selection, whatever the split
+    view_key = json.dumps(stack_selection(selection), sort_keys=True) if selection else None
+    if selection is None or split_view or tab != 'tab_timeline' or view_key == rendered:
+        # hidden (computed once shown) or up to date
+        if polled:
+            return job_outputs(None, 3)
+        raise PreventUpdate
+    key = ('timeline_stack', registry.fingerprint, view_key)
+
+    def compute():
+        figures, current = admitted('timeline_stack', lambda: timeline_stack(selection), view_key, view_key,
+                                    ['Cumulative View', 'Daily Increments'])
+        return figures + (view_key if current else None,)
+
+    return run_job('timeline_stack', key, session, compute, 3)
+
+
+def stack_selection(selection):
+    # the whole selection, within the drill-down node if any
+    return dict(selection, split=None, top_limit=None)
+
+
+@profiler.profile('timeline_stack')
+def timeline_stack(selection):
+    profiler.stage('aggregate')
+    dff_agg, _ = timeline_aggregate(stack_selection(selection))
+    profiler.stage('plot')
 
     # add the stack view plots
-    dff_stack = dff_agg.loc[:, ['date', 'confirmed_cases', 'deaths', 'recovered', 'active', 'population']].groupby(
-        ['date']).sum().reset_index()
-    dff_stack = pd.melt(dff_stack, value_vars=['deaths', 'recovered', 'active'], id_vars=['date'], var_name='var',
+    dff_stack = pd.melt(dff_agg, value_vars=['deaths', 'recovered', 'active'], id_vars=['date'], var_name='var',
                         value_name='val')
     dff_stack['var'] = dff_stack['var'].str.title()
     dff_stack['inc_val'] = dff_stack.sort_values(['var', 'date']).groupby('var')['val'].diff().fillna(0)
@@ -589,10 +1067,46 @@ def update_timeline_plots(n, show_increments, region, subregion, country, area,
     fig_stack_2.update_traces(hovertemplate=ht)
     fig_stack_2.for_each_trace(lambda trace: trace.update(name=trace.name.replace("var=", "").capitalize()))
 
-    if split is None:
-        return fig, fig2, fig3, dash.no_update, dash.no_update, dash.no_update, fig_stack_1, fig_stack_2, True, 'tab_timeline', False
+    return fig_stack_1, fig_stack_2
+
 
+@app.callback([Output('detail_1', 'figure'), Output('detail_2', 'figure'), Output('detail_3', 'figure'),
+               Output('detail_key', 'data'),
+               Output('detail_job', 'data'), Output('detail_job_poll', 'disabled'),
+               Output('detail_job_status', 'children')],
+              [Input('timeline_selection', 'data'), Input('tabs', 'active_tab'),
+               Input('detail_job_poll', 'n_intervals')],
+              [State('detail_key', 'data'), State('session_id', 'data'), State('detail_job', 'data')])
+def update_detail_plots(selection, tab, n_poll, rendered, session, job_id):
+    ctx = dash.callback_context
+    polled = ctx.triggered and ctx.triggered[0]['prop_id'] == 'detail_job_poll.n_intervals'
+    job = polled_job(ctx, 'detail_job_poll', job_id)
+    if job is not None:
+        return job_outputs(job, 4)
+    view_key = json.dumps(selection, sort_keys=True)
     # figures for details only available if split is given
+    if selection is None or not selection['split'] or tab != 'tab_current' or view_key == rendered:
+        if polled:
+            return job_outputs(None, 4)
+        raise PreventUpdate
+    key = ('timeline_details', registry.fingerprint, view_key)
+
+    def compute():
+        near_key = json.dumps(dict(selection, top_limit=None), sort_keys=True)
+        figures, current = admitted('timeline_details', lambda: timeline_details(selection), view_key, near_key,
+                                    ['Cases', 'Deaths', 'Recovered'])
+        return figures + (view_key if current else None,)
+
+    return run_job('timeline_details', key, session, compute, 4)
+
+
+@profiler.profile('timeline_details')
+def timeline_details(selection):
+    profiler.stage('aggregate')
+    dff_agg, cat_orders = timeline_aggregate(selection)
+    split = selection['split']
+    end_date = registry.get(selection['dataset']).end_date
+    profiler.stage('plot')
 
     dff_agg_current = dff_agg[dff_agg['date'] == end_date].copy(deep=True)
 
@@ -672,7 +1186,7 @@ def update_timeline_plots(n, show_increments, region, subregion, country, area,
                        xaxis2={'side': 'top', 'showline': False, 'showgrid': False, 'overlaying': 'x',
                                'zeroline': False, 'visible': False, 'mirror': True}, autosize=True)
 
-    return fig, fig2, fig3, fig4, fig5, fig6, fig_stack_1, fig_stack_2, False, dash.no_update, False
+    return fig4, fig5, fig6
 
 
 @app.callback(Output('per_capita', 'options'),
@@ -693,21 +1207,104 @@ def human_format(num):
     return '%.1f%s' % (num, ['', 'K', 'M', 'G', 'T', 'P'][magnitude])
 
 
+def cluster_map_data(dff, map_data, zoom, map_grid):
+    """ sum the map data of the rows in dff per grid cell, coarsening the grid until under MAP_MARKER_LIMIT """
+    rows = dff.index.to_numpy()
+    sum_cols = ['population', 'confirmed_cases'] + ([map_data] if map_data != 'confirmed_cases' else [])
+    weights = [dff[c].to_numpy(dtype=float) for c in sum_cols]
+    level = map_grid.level_for_zoom(zoom)
+    cell, count, lat, lon, sums = map_grid.cluster(rows, level, weights)
+    while len(count) > MAP_MARKER_LIMIT and level > 0:
+        level -= 1
+        cell, count, lat, lon, sums = map_grid.cluster(rows, level, weights)
+
+    dff_cluster = pd.DataFrame(dict(zip(sum_cols, sums)))
+    dff_cluster['lat'] = lat
+    dff_cluster['long'] = lon
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dff_cluster['confirmed_cases_rate'] = dff_cluster['confirmed_cases'] / dff_cluster['population']
+        if map_data != 'confirmed_cases':
+            dff_cluster[map_data + '_rate'] = dff_cluster[map_data] / dff_cluster['confirmed_cases']
+    dff_cluster = dff_cluster.replace([np.inf, -np.inf], np.nan).fillna(0)
+
+    # name the cluster after its largest area
+    order = np.argsort(-dff[map_data].to_numpy(), kind='stable')[::-1]
+    largest = np.empty(len(count), dtype=np.int64)
+    largest[cell[order]] = order
+    names = dff['country_area'].to_numpy()[largest]
+    dff_cluster['country_area'] = [name if n == 1 else '{} (+{} areas)'.format(name, n - 1)
+                                   for name, n in zip(names, count)]
+    return dff_cluster
+
+
+@app.callback([Output('date_slider', 'max'), Output('date_slider', 'marks'), Output('date_slider', 'value'),
+               Output('extra_tab', 'label'), Output('data_date', 'children')],
+              [Input('dataset', 'value')])
+def update_dataset_dates(dataset):
+    ctx = dash.callback_context
+    if not ctx.triggered:
+        # the layout is built for the default dataset
+        raise PreventUpdate
+    ds = registry.get(dataset)
+    return (ds.no_days, slider_marks(ds), ds.no_days, "Current: " + str(ds.end_date.strftime('%d %b')),
+            str(ds.end_date.strftime('%d %b %Y')))
+
+
+@functools.lru_cache(maxsize=1)
+def map_figure_template():
+    """ map figure without data, validated by plotly once """
+    fig = go.Figure(go.Scattermapbox(mode='markers', marker_sizemode='area'))
+    fig.update_layout(
+        hovermode='closest',
+        uirevision='map',
+        mapbox=dict(
+            accesstoken='pk.eyJ1IjoiY2hrMjgxNyIsImEiOiJjazg0bzFpOTkxa3JqM2twZzF1bndjZTJiIn0.5ATp6O0t0VwjN0CiTVyqBw',
+            center={'lat': 36, 'lon': -5.4},
+            zoom=1.5,
+        ),
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+        autosize=True,
+    )
+    return fig.to_dict()
+
+
 @app.callback([Output('map_plot', 'figure'), Output('stat_card_header', 'children'),
                Output('lbl_cases', 'children'), Output('lbl_cases_per_capita', 'children'),
                Output('lbl_deaths', 'children'), Output('lbl_deaths_rate', 'children')],
               [Input('map_data', 'value'), Input('per_capita', 'value'), Input('date_slider', 'value'),
-               Input('small_pop', 'value')])
-def update_map(map_data, per_capita, sel_day, small_pop):
+               Input('small_pop', 'value'), Input('map_plot', 'relayoutData'), Input('dataset', 'value')])
+@single_flight()
+@admission.priority
+@profiler.profile('update_map')
+def update_map(map_data, per_capita, sel_day, small_pop, relayout_data, dataset):
+    ctx = dash.callback_context
+    map_moved = bool(ctx.triggered) and ctx.triggered[0]['prop_id'] == 'map_plot.relayoutData'
+    zoom, bounds = viewport(relayout_data)
+    if map_moved and zoom is None:
+        # relayout not related to the map view (e.g. autosize)
+        raise PreventUpdate
+    if map_data not in {option['value'] for option in map_data_options}:
+        raise PreventUpdate
+
     target_col = map_data + '_rate' if per_capita else map_data
 
-    sel_date = begin_date + timedelta(days=sel_day)
-    if small_pop:
-        dff = df[(df['date'] == sel_date) & df['pop_flag'] == 1]
-    else:
-        dff = df[(df['date'] == sel_date)]
+    ds = registry.get(dataset)
+    backend, map_grid = ds.backend, get_map_grid(ds)
+    # the slider may still be set for the previously selected dataset
+    sel_date = ds.begin_date + timedelta(days=min(sel_day, ds.no_days))
+    dff = backend.rows(date=sel_date, conditions=[('pop_flag', '=', 1)] if small_pop else [])
+
+    # viewport culling
+    if bounds:
+        dff = dff[map_grid.in_view(dff.index.to_numpy(), bounds)]
+
+    max_col = ds.derived(('map_max', target_col), lambda d: d.backend.maximum(target_col, [('pop_flag', '=', 1)]))
+
+    # level of detail: aggregate the markers onto a zoom-dependent grid when there are too many in view
+    if len(dff) > MAP_MARKER_LIMIT:
+        dff = cluster_map_data(dff, map_data, zoom if zoom is not None else 1.5, map_grid)
+        max_col = max(max_col, dff[target_col].max())
 
-    max_col = df[df['pop_flag'] == 1][target_col].max()
     sizeref = 2 * max_col / (60 ** 2)
     points_opacity = 0.9 - 0.7 * (np.sqrt(np.maximum(0, np.minimum(dff[target_col], max_col))) / np.sqrt(max_col))
 
@@ -734,27 +1331,20 @@ def update_map(map_data, per_capita, sel_day, small_pop):
     else:
         m_color = 'orange'
 
-    fig = go.Figure()
-    fig.add_trace(go.Scattermapbox(mode='markers', lat=dff['lat'], lon=dff['long'], hovertemplate=ht,
-                                   marker_size=np.maximum(0, np.minimum(dff[target_col], max_col)),
-                                   marker_sizeref=sizeref, marker_sizemode='area',
-                                   customdata=customdata,
-                                   marker_color=m_color, marker_opacity=points_opacity.to_numpy()))
+    # plain figure filled in from the validated template
+    template = map_figure_template()
+    trace = dict(template['data'][0], lat=dff['lat'].to_numpy(), lon=dff['long'].to_numpy(), hovertemplate=ht,
+                 customdata=customdata)
+    trace['marker'] = dict(trace['marker'], size=np.maximum(0, np.minimum(dff[target_col], max_col)).to_numpy(),
+                           sizeref=sizeref, color=m_color, opacity=points_opacity.to_numpy())
+    fig = {'data': [trace], 'layout': template['layout']}
 
-    fig.update_layout(
-        hovermode='closest',
-        mapbox=dict(
-            accesstoken='pk.eyJ1IjoiY2hrMjgxNyIsImEiOiJjazg0bzFpOTkxa3JqM2twZzF1bndjZTJiIn0.5ATp6O0t0VwjN0CiTVyqBw',
-            center={'lat': 36, 'lon': -5.4},
-            zoom=1.5,
-        ),
-        margin={"r": 0, "t": 0, "l": 0, "b": 0},
-        autosize=True,
-    )
+    if map_moved:
+        return fig, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
 
     # compute aggregate stats on Dff
-    agg_dff = df.loc[(df['date'] >= sel_date - timedelta(days=1)) & (df['date'] <= sel_date),
-                     ['date', 'confirmed_cases', 'deaths', 'recovered', 'active', 'population']].groupby(['date']).sum()
+    agg_dff = backend.aggregate(['date'], TIMELINE_COLS, date=(sel_date - timedelta(days=1), sel_date))
+    agg_dff = agg_dff.set_index('date')
     total_cases_sel_date = agg_dff.loc[sel_date, 'confirmed_cases']
     total_population_sel_date = agg_dff.loc[sel_date, 'population']
     total_cases_prev_date = agg_dff.loc[sel_date - timedelta(days=1), 'confirmed_cases']
@@ -829,6 +1419,9 @@ Curves are shown are shown at `Country-Area` level.
 
 By default, the number of `curves is limited to 12`. It can be changed to any number. An empty field corresponds to no-limit.  
 
+Besides the cumulative data, the list offers the `7-day average` of the daily increments, 
+the `growth rate` (slope of the log-curve over the last 7 days) and the resulting `doubling time`.  
+
 Use the `Refresh` button to update the plot.
 '''
 md5 = '''
@@ -849,85 +1442,113 @@ The minimum 5+ per million threshold was ''somewhat'' arbitrarily chosen.
 
 The `Development Time` enables us to overlay and better compare the progression of the curves.
 '''
-progression_section = dbc.Container([
-    dbc.Card([
-        dbc.CardHeader([
-            html.H4('PROGRESSION', className='d-inline'),
-            dbc.Button(html.I('info', className='material-icons md-24 logoColor'), color='link', id='info2',
-                       className='float-right p-0'),
-            dbc.Modal([
-                dbc.ModalHeader("INFORMATION"),
-                dbc.ModalBody([
-                    html.H5('Data Selection', className='font-weight-bold'),
-                    dcc.Markdown(md4),
-                    html.Br(),
-                    html.H5('Log-Scale', className='font-weight-bold'),
-                    dcc.Markdown(md5),
-                    html.Br(),
-                    html.H5('Development Time', className='font-weight-bold'),
-                    dcc.Markdown(md6),
-                ]),
-                dbc.ModalFooter(dbc.Button("Close", id="close2", className="ml-auto")),
-            ], id="modal2", size='lg', scrollable=True, style={'Height': '40vh'})
-        ]),
+md7 = '''
 
-        dbc.CardBody([
-            dbc.Row([
-                dbc.Col([
-                    dcc.Dropdown(options=map_data_options, id='prog_dd_data', value='confirmed_cases', clearable=False,
-                                 multi=False, style={'fontSize': '100%'}, placeholder='Select Data', className='mb-4'),
-                    dbc.Checklist(options=[{"label": "Per Capita", "value": True}], value=[True],
-                                  id="prog_dd_scale", switch=True, className='mb-4'),
-                    dbc.Checklist(options=[{"label": "Show Daily % Variance", "value": True}], value=[],
-                                  id="prog_percent",
-                                  switch=True, className='mb-4'),
-                    dcc.Dropdown(options=region_options, id='prog_dd_region', value=[],
-                                 multi=True, style={'fontSize': '100%'}, placeholder='Select Region(s)',
-                                 className='mb-4'),
-                    dcc.Dropdown(options=subregion_options, id='prog_dd_subregion', value=[],
-                                 multi=True, style={'fontSize': '100%'}, placeholder='Select Sub-Region(s)',
-                                 className='mb-4'),
-                    dcc.Dropdown(options=country_options, id='prog_dd_country',
-                                 value=['Italy', 'Spain', 'France', 'Switzerland'],
-                                 multi=True, style={'fontSize': '100%'}, placeholder='Select Country(ies)',
-                                 className='mb-4'),
-                    dcc.Dropdown(options=area_options, id='prog_dd_area', value=['China - Hubei', 'US - New York'],
-                                 multi=True, style={'fontSize': '100%'}, placeholder='Select Area(s)',
-                                 className='mb-4'),
-                    dbc.Row([
-                        dbc.Label('Limit Number of Curves:', width=6, className='text-right pr-0'),
-                        dbc.Col(dbc.Input(type="number", min=1, step=1, value='12', id='prog_toplimit'), width=6)
-                    ], className='mb-4'),
-                    dbc.Checklist(options=[{"label": "Log-Scale", "value": True}], value=[True], id="prog_logscale",
-                                  switch=True, className='mb-4'),
-                    dbc.Checklist(options=[{"label": "Show Development Time", "value": True, 'disabled': False}],
-                                  value=[True],
-                                  id="prog_dd_devtime", switch=True, className='mb-4'),
-                    dbc.Button('Refresh', color='primary', id='prog_refresh', className='float-right',
-                               style={'width': '100px'})
-                ], className='col-12 col-md-6 col-xl-3'),
-
-                dbc.Col([
-                    dbc.Tabs([
-                        dbc.Tab(label="Curve", tab_id='tab_curve'),
-                        dbc.Tab(label="Extra", tab_id='tab_extra'),
-                    ], id="prog_tabs", active_tab="tab_curve", className='mb-4'),
-                    html.Div(
-                        dbc.Spinner(
-                            dcc.Graph(id='prog_1', config=config, style={'height': '70vh'}), color='secondary',
-                            size='lg'),
-                        id='div_1'),
-                    html.Div(
-                        dcc.Graph(id='extra_1', config=config, style={'height': '70vh'}),
-                        id='div_2'),
-                ], className='col-12 col-md-6 col-xl-9')
+Use the `Growth Fit` options to fit a `logistic` and / or an `exponential` model to each curve. 
+The fitted curves are shown dashed, projected 14 days ahead, with the fitted parameters in the hover.  
+
+> 
+> Fits are not available with the daily % variance.  
+> 
+'''
+md8 = '''
+
+Use `Show Median & IQR of all Areas` to compare the selected curves against every area of the dataset: 
+the dashed grey line is the median of the selected data across the areas at each day, and the shaded band 
+covers the middle half of the areas (25th to 75th percentile).  
+
+> 
+> Days with fewer than 5 areas reporting are not shown.  
+> 
+'''
+
+
+prog_default_country = ['Italy', 'Spain', 'France', 'Switzerland']
+prog_default_area = ['China - Hubei', 'US - New York']
+
+
+def progression_section():
+    return dbc.Container([
+        dbc.Card([
+            dbc.CardHeader([
+                html.H4('PROGRESSION', className='d-inline'),
+                dbc.Button(html.I('info', className='material-icons md-24 logoColor'), color='link', id='info2',
+                           className='float-right p-0'),
+                dbc.Modal([
+                    dbc.ModalHeader("INFORMATION"),
+                    dbc.ModalBody(id='modal2_body'),
+                    dbc.ModalFooter(dbc.Button("Close", id="close2", className="ml-auto")),
+                ], id="modal2", size='lg', scrollable=True, style={'Height': '40vh'})
             ]),
-        ]),
-    ], style={'minHeight': '80vh'}),
 
-    # bottom of screen
-    dbc.Row([], style={'minHeight': '15vh'}),
-], fluid=True, id='prog_section')
+            dbc.CardBody([
+                dbc.Row([
+                    dbc.Col([
+                        dcc.Dropdown(options=prog_data_options, id='prog_dd_data', value='confirmed_cases', clearable=False,
+                                     multi=False, style={'fontSize': '100%'}, placeholder='Select Data', className='mb-4'),
+                        dbc.Checklist(options=[{"label": "Per Capita", "value": True}], value=[True],
+                                      id="prog_dd_scale", switch=True, className='mb-4'),
+                        dbc.Checklist(options=[{"label": "Show Daily % Variance", "value": True}], value=[],
+                                      id="prog_percent",
+                                      switch=True, className='mb-4'),
+                        dcc.Dropdown(options=dropdown_options('region'), id='prog_dd_region', value=[],
+                                     multi=True, style={'fontSize': '100%'}, placeholder='Select Region(s)',
+                                     className='mb-4'),
+                        dcc.Dropdown(options=dropdown_options('subregion'), id='prog_dd_subregion', value=[],
+                                     multi=True, style={'fontSize': '100%'}, placeholder='Select Sub-Region(s)',
+                                     className='mb-4'),
+                        dcc.Dropdown(options=dropdown_options('country', prog_default_country), id='prog_dd_country',
+                                     value=prog_default_country,
+                                     multi=True, style={'fontSize': '100%'}, placeholder='Select Country(ies)',
+                                     className='mb-4'),
+                        dcc.Dropdown(options=dropdown_options('area', prog_default_area), id='prog_dd_area',
+                                     value=prog_default_area,
+                                     multi=True, style={'fontSize': '100%'}, placeholder='Select Area(s)',
+                                     className='mb-4'),
+                        dbc.Row([
+                            dbc.Label('Limit Number of Curves:', width=6, className='text-right pr-0'),
+                            dbc.Col(dbc.Input(type="number", min=1, step=1, value='12', id='prog_toplimit'), width=6)
+                        ], className='mb-4'),
+                        dbc.Checklist(options=[{"label": "Log-Scale", "value": True}], value=[True], id="prog_logscale",
+                                      switch=True, className='mb-4'),
+                        dbc.Checklist(options=[{"label": "Show Development Time", "value": True, 'disabled': False}],
+                                      value=[True],
+                                      id="prog_dd_devtime", switch=True, className='mb-4'),
+                        dbc.Label('Growth Fit'),
+                        dbc.Checklist(options=[{"label": "Logistic", "value": 'logistic'},
+                                               {"label": "Exponential", "value": 'exponential'}],
+                                      value=[], id="prog_fit", inline=True, switch=True, className='mb-4'),
+                        dbc.Checklist(options=[{"label": "Show Median & IQR of all Areas", "value": True}], value=[],
+                                      id="prog_band", switch=True, className='mb-4'),
+                        dbc.Button('Refresh', color='primary', id='prog_refresh', className='float-right',
+                                   style={'width': '100px'}),
+                        html.Div(id='prog_job_status', style={'clear': 'both'}),
+                        # background job of the progression plots, polled until finished
+                        dcc.Store(id='prog_job'),
+                        dcc.Interval(id='prog_job_poll', interval=JOB_POLL_MS, disabled=True),
+                    ], className='col-12 col-md-6 col-xl-3'),
+
+                    dbc.Col([
+                        dbc.Tabs([
+                            dbc.Tab(label="Curve", tab_id='tab_curve'),
+                            dbc.Tab(label="Extra", tab_id='tab_extra'),
+                        ], id="prog_tabs", active_tab="tab_curve", className='mb-4'),
+                        html.Div(
+                            dbc.Spinner(
+                                dcc.Graph(id='prog_1', config=config, style={'height': '70vh'}), color='secondary',
+                                size='lg'),
+                            id='div_1'),
+                        html.Div(
+                            dcc.Graph(id='extra_1', config=config, style={'height': '70vh'}),
+                            id='div_2'),
+                    ], className='col-12 col-md-6 col-xl-9')
+                ]),
+            ]),
+        ], style={'minHeight': '80vh'}),
+
+        # bottom of screen
+        dbc.Row([], style={'minHeight': '15vh'}),
+    ], fluid=True, id='prog_section')
 
 
 @app.callback([Output('div_1', 'className'),
@@ -941,64 +1562,166 @@ def update_timeline_view(sel_tab):
 
 
 @app.callback(Output('prog_dd_scale', 'options'),
-              [Input('prog_dd_data', 'value')])
-def update_label(value):
-    if value != 'confirmed_cases':
-        return [{"label": "As Rate", "value": True}]
+              [Input('prog_dd_data', 'value')],
+              [State('dataset', 'value')])
+def update_label(value, dataset):
+    disabled = value + '_rate' not in registry.get(dataset).columns
+    if value not in ('confirmed_cases', 'confirmed_cases_ma7'):
+        return [{"label": "As Rate", "value": True, 'disabled': disabled}]
     else:
-        return [{"label": "Per Capita", "value": True}]
+        return [{"label": "Per Capita", "value": True, 'disabled': disabled}]
 
 
 @app.callback(
-    Output("modal2", "is_open"),
+    [Output("modal2", "is_open"), Output("modal2_body", "children")],
     [Input("info2", "n_clicks"), Input("close2", "n_clicks")],
-    [State("modal2", "is_open")],
+    [State("modal2", "is_open"), State("modal2_body", "children")],
 )
-def toggle_modal(n1, n2, is_open):
+def toggle_modal(n1, n2, is_open, body):
     if n1 or n2:
-        return not is_open
-    return is_open
-
-
-@app.callback([Output('prog_1', 'figure'), Output('extra_1', 'figure')],
-              [Input('prog_refresh', 'n_clicks')],
+        if body or is_open:
+            return not is_open, dash.no_update
+        return True, [
+            html.H5('Data Selection', className='font-weight-bold'),
+            dcc.Markdown(md4),
+            html.Br(),
+            html.H5('Log-Scale', className='font-weight-bold'),
+            dcc.Markdown(md5),
+            html.Br(),
+            html.H5('Development Time', className='font-weight-bold'),
+            dcc.Markdown(md6),
+            html.Br(),
+            html.H5('Growth Fit', className='font-weight-bold'),
+            dcc.Markdown(md7),
+            html.Br(),
+            html.H5('Distribution', className='font-weight-bold'),
+            dcc.Markdown(md8),
+        ]
+    return is_open, dash.no_update
+
+
+def add_growth_fits(fig, ds, dff1, x_col, target_col, models):
+    """ overlay the fitted growth models, projected PROJECTION_DAYS ahead, on the curves of fig """
+    # the curves are grouped by area, named "country_area=<area>" by the older plotly express versions
+    prefix = 'country_area='
+    lines = {trace.legendgroup[len(prefix):] if trace.legendgroup.startswith(prefix) else trace.legendgroup:
+             trace for trace in fig.data}
+    # the areas of the data, in the order of their curves
+    order = {area: i for i, area in enumerate(lines)}
+    areas = sorted(dff1['country_area'].unique(), key=lambda area: order.get(area, len(order)))
+    groups = dff1.groupby('country_area')
+    curves = []
+    for area in areas:
+        dff_area = groups.get_group(area)
+        if x_col == 'date':
+            t = (dff_area['date'] - ds.date_origin).dt.days.to_numpy(dtype=float)
+        else:
+            t = dff_area[x_col].to_numpy(dtype=float)
+        curves.append((t, dff_area[target_col].to_numpy(dtype=float)))
+
+    traces = []
+    for i, model in enumerate(models):
+        checkpoint(0.5 + 0.4 * i / len(models), 'Fitting')
+        keys = [(ds.version, area, target_col, x_col, model) for area in areas]
+        params = growth_fit.fit_curves(model, curves, keys)
+        for area, (t, _), p in zip(areas, curves, params):
+            if p is None:
+                continue
+            t_fit = np.arange(t.min(), t.max() + growth_fit.PROJECTION_DAYS + 1)
+            y_fit = growth_fit.MODELS[model](t_fit, *p)
+            x_fit = ds.date_origin + pd.to_timedelta(t_fit, unit='D') if x_col == 'date' else t_fit
+            ht = '<b>' + area + '</b><br>' + model.capitalize() + ' fit<br>'
+            ht = ht + ('Date : %{x|%d %b}<br>' if x_col == 'date' else 'Devt Time: %{x} days<br>')
+            ht = ht + 'Fitted : %{y:.3s}<br>' + growth_fit.describe(model, p) + '<extra></extra>'
+            line = lines.get(area)
+            traces.append(go.Scatter(x=x_fit, y=y_fit, mode='lines', name=area + ' ' + model,
+                                     legendgroup=line.legendgroup if line else area, showlegend=False, hovertemplate=ht,
+                                     line={'color': line.line.color if line else None, 'width': 1.5,
+                                           'dash': 'dash' if model == 'logistic' else 'dot'}))
+    fig.add_traces(traces)
+
+
+def build_distribution_band(ds, x_col, target_col):
+    conditions = [('devt_time', '>=', 0)] if x_col == 'devt_time' else []
+    dff = ds.backend.rows(columns=list(dict.fromkeys(['country_area', x_col, target_col])), conditions=conditions)
+    return metrics.quantile_band(dff, target_col, x_col)
+
+
+def add_distribution_band(fig, ds, x_col, target_col, hover_lbl, data):
+    """ overlay the median and interquartile range of target_col across all the areas of the dataset """
+    band = ds.derived(('band', x_col, target_col), lambda d: build_distribution_band(d, x_col, target_col))
+    if data.endswith('_growth'):
+        fmt = ':.1%'
+    elif data.endswith('_doubling'):
+        fmt = ':.1f'
+    else:
+        fmt = ':.3s'
+    ht = '<b>All areas</b><br>'
+    ht = ht + ('Devt Time: %{x} days<br>' if x_col == 'devt_time' else 'Date : %{x|%d %b}<br>')
+    ht = ht + 'Median ' + hover_lbl + ' : %{y' + fmt + '}<br>'
+    ht = ht + 'IQR : %{customdata[0]' + fmt + '} - %{customdata[1]' + fmt + '}<br>'
+    ht = ht + 'Areas : %{customdata[2]}<extra></extra>'
+    x = band[x_col]
+    fig.add_traces([
+        go.Scatter(x=x, y=band['p75'], mode='lines', line={'width': 0}, hoverinfo='skip', showlegend=False,
+                   legendgroup='band'),
+        go.Scatter(x=x, y=band['p25'], mode='lines', line={'width': 0}, hoverinfo='skip', showlegend=False,
+                   legendgroup='band', fill='tonexty', fillcolor='rgba(120, 120, 120, 0.15)'),
+        go.Scatter(x=x, y=band['p50'], mode='lines', name='Median & IQR', legendgroup='band',
+                   line={'color': '#888888', 'width': 2, 'dash': 'dash'},
+                   customdata=band[['p25', 'p75', 'count']].to_numpy(), hovertemplate=ht),
+    ])
+
+
+@app.callback([Output('prog_1', 'figure'), Output('extra_1', 'figure'),
+               Output('prog_job', 'data'), Output('prog_job_poll', 'disabled'), Output('prog_job_status', 'children')],
+              [Input('prog_refresh', 'n_clicks'), Input('dataset', 'value'), Input('prog_job_poll', 'n_intervals')],
               [State('prog_dd_data', 'value'), State('prog_dd_scale', 'value'),
                State('prog_dd_region', 'value'), State('prog_dd_subregion', 'value'),
                State('prog_dd_country', 'value'), State('prog_dd_area', 'value'),
                State('prog_logscale', 'value'), State('prog_dd_devtime', 'value'),
-               State('prog_toplimit', 'value'), State('prog_percent', 'value')])
-def update_progression_plots(n, data, scale, region, subregion, country, area, logscale, devtime, top_limit, percent):
-    # apply filter on df
-    region_idx = []
-    if region:
-        region_idx = df[df['region'].isin(region)].index.to_list()
-    subregion_idx = []
-    if subregion:
-        subregion_idx = df[df['subregion'].isin(subregion)].index.to_list()
-    country_idx = []
-    if country:
-        country_idx = df[df['country'].isin(country)].index.to_list()
-    area_idx = []
-    if area:
-        area_idx = df[df['country_area'].isin(area)].index.to_list()
-
-    idx = list(set().union(region_idx, subregion_idx, country_idx, area_idx))
-
-    if idx:
-        dff = df.loc[idx, :]
-    else:
-        dff = df
+               State('prog_toplimit', 'value'), State('prog_percent', 'value'), State('prog_fit', 'value'),
+               State('prog_band', 'value'), State('session_id', 'data'), State('prog_job', 'data')])
+def update_progression_plots(n, dataset, n_poll, data, scale, region, subregion, country, area, logscale, devtime,
+                             top_limit, percent, fit, band, session, job_id):
+    ctx = dash.callback_context
+    job = polled_job(ctx, 'prog_job_poll', job_id)
+    if job is not None:
+        return job_outputs(job, 2)
+    if data not in prog_data_values:
+        raise PreventUpdate
+    args = (dataset, data, scale, region, subregion, country, area, logscale, devtime, top_limit, percent, fit, band)
+    # the same whatever the trigger, so that a poll reaching another worker submits the same job
+    inputs = tuple(normalize_arg(a) for a in args)
+    key = ('update_progression_plots', registry.fingerprint, inputs)
+    # the same curves without the top limit, fits or band are near-identical
+    near_key = inputs[:9] + inputs[10:11]
+
+    def compute():
+        figures, _ = admitted('progression', lambda: progression_figures(*args), inputs, near_key,
+                              ['', 'Development Time Reference'])
+        return figures
+
+    return run_job('progression', key, session, compute, 2)
+
+
+@profiler.profile('progression_figures')
+def progression_figures(dataset, data, scale, region, subregion, country, area, logscale, devtime, top_limit, percent,
+                        fit=None, band=None):
+    ds = registry.get(dataset)
+    end_date = ds.end_date
+    profiler.stage('filter')
+    filters = level_filters(region, subregion, country, area)
 
     # limit data to top n entries
     if top_limit:
-        dff_groupby = dff.loc[dff['date'] == end_date, ['country_area', data, 'population']].groupby(
-            ['country_area']).sum().reset_index().sort_values(by=[data, 'population'], ascending=False)
-        limit = max(1, int(top_limit))
-        top_split = dff_groupby.nlargest(limit, [data])['country_area'].tolist()
-        dff = dff[dff['country_area'].isin(top_split)]
+        top_split = ds.backend.top('country_area', data, end_date, max(1, int(top_limit)), filters)
+        dff = ds.backend.rows(filters, conditions=[('country_area', 'in', top_split)])
+    else:
+        dff = ds.backend.rows(filters)
 
     target_col = data
-    if scale:
+    if scale and data + '_rate' in ds.columns:
         target_col = data + '_rate'
 
     if devtime:
@@ -1030,6 +1753,11 @@ def update_progression_plots(n, data, scale, region, subregion, country, area, l
         title = 'Recovered'
         hover_lbl = "Rec'd"
         cdata = ['recovered', 'recovered_rate', 'country_area', 'confirmed_cases']
+    elif data in metric_options:
+        title, hover_lbl = metric_options[data]
+        # the rates of the hover, whatever the scale of the curves (growth rates and doubling times have none)
+        rate_col = data + '_rate' if data + '_rate' in ds.columns else data
+        cdata = [data, rate_col, 'country_area', 'population' if data == 'confirmed_cases_ma7' else 'confirmed_cases']
     else:
         title = 'Active Cases'
         hover_lbl = 'Active'
@@ -1038,6 +1766,7 @@ def update_progression_plots(n, data, scale, region, subregion, country, area, l
     if percent:
         cdata.append('percent')
 
+    profiler.stage('plot')
     fig = px.line(dff1, x=x_col, y=target_col, color='country_area', log_y=True if logscale else None,
                   category_orders=cat_orders, custom_data=cdata)
 
@@ -1047,7 +1776,7 @@ def update_progression_plots(n, data, scale, region, subregion, country, area, l
                       xaxis_title_text='Development Time (in days)' if devtime else '', showlegend=True, autosize=True,
                       legend_title="", legend_font_size=14, xaxis_showspikes=True,
                       xaxis_spikethickness=2, yaxis_showspikes=True, yaxis_spikethickness=2,
-                      yaxis_tickformat=".0%" if percent else "",
+                      yaxis_tickformat=".0%" if percent or data.endswith('_growth') else "",
                       )  # , title_pad_b=20
 
     ht = '<b>%{customdata[2]}</b><br>'
@@ -1055,18 +1784,33 @@ def update_progression_plots(n, data, scale, region, subregion, country, area, l
         ht = ht + 'Devt Time: %{x} days<br>'
     else:
         ht = ht + 'Date : %{x|%d %b}<br>'
-    ht = ht + hover_lbl + ' : %{customdata[0]:.3s}<br>'
+    if data.endswith('_growth'):
+        ht = ht + hover_lbl + ' : %{customdata[0]:.1%} / day<br>'
+    elif data.endswith('_doubling'):
+        ht = ht + hover_lbl + ' : %{customdata[0]:.1f} days<br>'
+    else:
+        ht = ht + hover_lbl + ' : %{customdata[0]:.3s}<br>'
     if percent:
         ht = ht + '<b>Daily change: %{customdata[4]:.1%}</b><br>'
-    if data == 'confirmed_cases':
+    if data in ('confirmed_cases', 'confirmed_cases_ma7'):
         ht = ht + 'Population : %{customdata[3]:,.1f} mio<br>'
         ht = ht + 'Per mio capita : %{customdata[1]:,.0f}<extra></extra>'
+    elif data.endswith('_growth') or data.endswith('_doubling'):
+        ht = ht + 'Cases : %{customdata[3]:.3s}<br>'
     else:
         ht = ht + 'Cases : %{customdata[3]:.3s}<br>'
         ht = ht + 'As rate : %{customdata[1]:.1%}<br>'
 
     fig.for_each_trace(lambda trace: trace.update(hovertemplate=ht))
 
+    checkpoint(0.5)
+    profiler.stage('overlays')
+    # the growth models are fitted on the cumulative series only
+    if fit and not percent and data not in metric_options:
+        add_growth_fits(fig, ds, dff1, x_col, target_col, fit)
+    if band and not percent:
+        add_distribution_band(fig, ds, x_col, target_col, hover_lbl, data)
+
     # second chart
     dff2 = dff.loc[dff['confirmed_cases'] > 0, :].groupby(['country_area']).min().reset_index()
     dff2['lbl'] = 'First Notification'
@@ -1094,69 +1838,109 @@ def update_progression_plots(n, data, scale, region, subregion, country, area, l
     return fig, fig2
 
 
-footer_section = dbc.Container([
-    dbc.Row([
-        dbc.Col([
-            html.H4('Data Source', className='mb-4', id='about'),
-            html.Span("The data is primarily sourced from "),
-            html.Span('Johns Hopkins CSSE', style={'fontWeight': '700', 'fontFamily': 'campaign,sans-serif'}),
-            html.Span(' repository: '),
-            html.A('2019 nCoV data', href='https://github.com/CSSEGISandData/COVID-19',
-                   target='_blank'),
-            html.P(" "),
-            html.Span(
-                "Where possible, the data has been cross-checked and manually corrected looking at various Wikipedia pages: "),
-            html.A('Italy Example Page', href='https://en.wikipedia.org/wiki/2020_coronavirus_pandemic_in_Italy',
-                   target='_blank'),
-            html.P(' '),
-            html.Span(
-                'Worth noting is the current number of recovered cases for the US & Canada not being allocated to each state / province.'),
-            html.P(' '),
-            html.Span('The population data is based on the United Nations Population 2020 estimates: '),
-            html.A('UN download page', href='https://population.un.org/wpp/Download/Standard/Population/',
-                   target='_blank'),
-            html.P(' '),
-            html.Span('Latest data extract as of: '),
-            html.Span(str(end_date.strftime('%d %b %Y')),
-                      style={'fontWeight': '700', 'fontFamily': 'campaign,sans-serif'}),
-            html.Div([
-                html.A([
-                    html.Img(src=app.get_asset_url("linkedin logo.png"), className='position-relative',
-                             style={'left': '-15px'}),
-                    html.Span('Alban Tranchard', className='text-uppercase',
-                              style={'fontSize': '1.5rem', 'fontWeight': '700', 'fontFamily': 'campaign,sans-serif'}),
-                ], href='https://linkedin.com/in/alban-tranchard-actuary',
-                    target="_blank"),
-
-            ], className='mt-4'),
-        ], className='col-12 col-md-8 col-xl-9'),
-        dbc.Col([
-            dbc.Row([
-                dbc.Col([
-                    html.A(html.Img(src=app.get_asset_url("plotly-dash3.png"), className='position-relative',
-                                    style={'left': '-13px'}),
-                           href='https://plotly.com', target="_blank"),
-                    html.Div([
-                        html.Span('Powered by '),
-                        html.Span('Plotly', className='text-uppercase',
-                                  style={'fontSize': '1.25rem', 'fontWeight': '700',
-                                         'fontFamily': 'campaign,sans-serif'}),
-                    ]),
-                ])
-            ], align="center", no_gutters=True, style={'height': '80px'})
-        ], className='col-12 col-md-4 col-xl-3'),
-    ], className='m-4', align="center", style={'height': '30vh'}),
-
-], fluid=True, id='footer_section', className='border-top bg-white', style={'borderColor': '#666666'})
-
-app.layout = html.Div([
-    navbar_layout,
-    map_section,
-    timeline_section,
-    progression_section,
-    footer_section
-]
-)
+def footer_section():
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col([
+                html.H4('Data Source', className='mb-4', id='about'),
+                html.Span("The data is primarily sourced from "),
+                html.Span('Johns Hopkins CSSE', style={'fontWeight': '700', 'fontFamily': 'campaign,sans-serif'}),
+                html.Span(' repository: '),
+                html.A('2019 nCoV data', href='https://github.com/CSSEGISandData/COVID-19',
+                       target='_blank'),
+                html.P(" "),
+                html.Span(
+                    "Where possible, the data has been cross-checked and manually corrected looking at various Wikipedia pages: "),
+                html.A('Italy Example Page', href='https://en.wikipedia.org/wiki/2020_coronavirus_pandemic_in_Italy',
+                       target='_blank'),
+                html.P(' '),
+                html.Span(
+                    'Worth noting is the current number of recovered cases for the US & Canada not being allocated to each state / province.'),
+                html.P(' '),
+                html.Span('The population data is based on the United Nations Population 2020 estimates: '),
+                html.A('UN download page', href='https://population.un.org/wpp/Download/Standard/Population/',
+                       target='_blank'),
+                html.P(' '),
+                html.Span('Latest data extract as of: '),
+                html.Span(str(registry.get().end_date.strftime('%d %b %Y')), id='data_date',
+                          style={'fontWeight': '700', 'fontFamily': 'campaign,sans-serif'}),
+                html.Div([
+                    html.A([
+                        html.Img(src=app.get_asset_url("linkedin logo.png"), className='position-relative',
+                                 style={'left': '-15px'}),
+                        html.Span('Alban Tranchard', className='text-uppercase',
+                                  style={'fontSize': '1.5rem', 'fontWeight': '700', 'fontFamily': 'campaign,sans-serif'}),
+                    ], href='https://linkedin.com/in/alban-tranchard-actuary',
+                        target="_blank"),
+
+                ], className='mt-4'),
+            ], className='col-12 col-md-8 col-xl-9'),
+            dbc.Col([
+                dbc.Row([
+                    dbc.Col([
+                        html.A(html.Img(src=app.get_asset_url("plotly-dash3.png"), className='position-relative',
+                                        style={'left': '-13px'}),
+                               href='https://plotly.com', target="_blank"),
+                        html.Div([
+                            html.Span('Powered by '),
+                            html.Span('Plotly', className='text-uppercase',
+                                      style={'fontSize': '1.25rem', 'fontWeight': '700',
+                                             'fontFamily': 'campaign,sans-serif'}),
+                        ]),
+                    ])
+                ], align="center", no_gutters=True, style={'height': '80px'})
+            ], className='col-12 col-md-4 col-xl-3'),
+        ], className='m-4', align="center", style={'height': '30vh'}),
+
+    ], fluid=True, id='footer_section', className='border-top bg-white', style={'borderColor': '#666666'})
+
+
+def build_layout():
+    # the default dataset is loaded first, so that its load is timed apart
+    registry.get()
+    t = time.perf_counter()
+    layout = html.Div([
+        dcc.Store(id='session_id', storage_type='session'),
+        navbar_layout(),
+        map_section(),
+        timeline_section(),
+        progression_section(),
+        footer_section()
+    ]
+    )
+    boot_timings['layout_build'] = time.perf_counter() - t
+    return layout
+
+
+if LAZY_START:
+    # the layout is built on the first page load, then served from memory
+    app.layout = functools.lru_cache(maxsize=1)(build_layout)
+else:
+    app.layout = build_layout()
+
+# layout and callback dependencies serialized and gzipped once per version of the default dataset, served with
+# ETags. PRECOMPUTED_RESPONSES=0 serializes them on every request
+precomputed = PrecomputedRoutes(server, lambda: registry.get().version)
+if env_flag('PRECOMPUTED_RESPONSES', True):
+    for route in ['_dash-layout', '_dash-dependencies']:
+        precomputed.add(app.config.routes_pathname_prefix + route)
+
+
+def preload():
+    """
+    load the default dataset, its indexes, the layout and its responses, then make the data read-only. Called by
+    gunicorn.conf.py in the master process, so that the forked workers share these pages copy-on-write
+    """
+    ds = registry.get()
+    get_map_grid(ds)
+    get_name_indexes(ds)
+    get_rollups(ds)
+    map_figure_template()
+    if LAZY_START:
+        app.layout()
+    precomputed.warm()
+    ds.freeze()
+
 
 if __name__ == '__main__':
     app.run_server(debug=True, threaded=True)
\ No newline at end of file
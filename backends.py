@@ -0,0 +1,226 @@
+"""
+Query backends of the datasets: the filters, group-bys and top-N of the views over the rows of a dataset.
+
+PandasBackend keeps the rows in a DataFrame. SqliteBackend queries a SQLite file indexed on the date and the
+hierarchy columns, reading only the rows or the groups a view asks for: the resident memory is bounded by the
+views instead of the size of the dataset.
+
+The rows are described by:
+    filters     {level: names} over region / subregion / country / country_area, the union of the levels.
+                Without any name, every row
+    date        a date, or a (first, last) range of dates, both included
+    conditions  [(column, op, value)], op one of = != < <= > >= in, all of them required
+
+Rows are returned in the order of the dataset, indexed by their position in it.
+"""
+import contextlib
+import operator
+import os
+import pathlib
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+
+QUERY_BACKEND = os.environ.get('QUERY_BACKEND', 'pandas')
+# page cache of each SQLite connection (one per thread)
+SQLITE_CACHE_MB = int(os.environ.get('SQLITE_CACHE_MB', 16))
+
+LEVELS = ['region', 'subregion', 'country', 'country_area']
+OPERATORS = {'=': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le, '>': operator.gt,
+             '>=': operator.ge, 'in': lambda column, values: column.isin(values)}
+
+
+def _dates(date):
+    return date if isinstance(date, tuple) else (date, date)
+
+
+def check_columns(known, columns):
+    """ columns, a ValueError when one of them is not a column of the dataset: they may come from the browser """
+    unknown = [column for column in columns if column not in known]
+    if unknown:
+        raise ValueError('unknown column(s) {}'.format(', '.join(map(str, unknown))))
+    return columns
+
+
+class PandasBackend:
+    name = 'pandas'
+
+    def __init__(self, df):
+        self.df = df
+        self.columns = list(df.columns)
+
+    def __len__(self):
+        return len(self.df)
+
+    def date_range(self):
+        return self.df['date'].min(), self.df['date'].max()
+
+    def memory_usage(self):
+        return int(np.sum(self.df.memory_usage(deep=True)))
+
+    def _mask(self, filters, date, conditions):
+        df = self.df
+        mask = None
+        for level in LEVELS:
+            names = (filters or {}).get(level)
+            if names:
+                selected = df[level].isin(names)
+                mask = selected if mask is None else mask | selected
+        check_columns(self.columns, [column for column, _, _ in conditions])
+        required = [OPERATORS[op](df[column], value) for column, op, value in conditions]
+        if date is not None:
+            first, last = _dates(date)
+            required.append((df['date'] >= first) & (df['date'] <= last))
+        for selected in required:
+            mask = selected if mask is None else mask & selected
+        return mask
+
+    def rows(self, filters=None, columns=None, date=None, conditions=()):
+        """ the rows described, all the columns by default. Not a copy when every row is selected """
+        if columns is not None:
+            check_columns(self.columns, columns)
+        mask = self._mask(filters, date, conditions)
+        if mask is None:
+            return self.df if columns is None else self.df[columns]
+        return self.df.loc[mask, :] if columns is None else self.df.loc[mask, columns]
+
+    def aggregate(self, by, columns, filters=None, date=None, conditions=()):
+        """ sums of columns per group of by over the rows described, sorted by the groups """
+        dff = self.rows(filters, list(by) + list(columns), date, conditions)
+        return dff.groupby(by).sum().reset_index().sort_values(by)
+
+    def top(self, key, column, date, limit, filters=None):
+        """ the limit values of key with the largest sums of column at date, the population breaking the ties """
+        groups = self.aggregate([key], list(dict.fromkeys([column, 'population'])), filters, date)
+        groups = groups.sort_values(by=[column, 'population'], ascending=False)
+        return groups.nlargest(limit, [column])[key].tolist()
+
+    def maximum(self, column, conditions=()):
+        return self.rows(columns=[column], conditions=conditions)[column].max()
+
+
+class SqliteBackend:
+    name = 'sqlite'
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with contextlib.closing(sqlite3.connect(self._uri(), uri=True)) as connection:
+            info = connection.execute('PRAGMA table_info(rows)').fetchall()
+            self._length = connection.execute('SELECT COUNT(*) FROM rows').fetchone()[0]
+            self._date_range = connection.execute('SELECT MIN(date), MAX(date) FROM rows').fetchone()
+        self._types = {name: decl for _, name, decl, _, _, _ in info if name != 'row'}
+        self.columns = list(self._types)
+
+    @staticmethod
+    def build(path, df):
+        """ write the rows of df to a new SQLite file at path, indexed for the views """
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        rows = df.copy()
+        rows['date'] = rows['date'].dt.strftime('%Y-%m-%d')
+        with contextlib.closing(sqlite3.connect(tmp)) as connection:
+            rows.to_sql('rows', connection, index=True, index_label='row')
+            for columns in [['date'], ['country_area', 'date']] + [[level] for level in LEVELS]:
+                connection.execute('CREATE INDEX "ix_{}" ON rows ({})'.format(
+                    '_'.join(columns), ', '.join('"{}"'.format(c) for c in columns)))
+            connection.execute('ANALYZE')
+            connection.commit()
+        os.replace(tmp, path)
+
+    def _uri(self):
+        return pathlib.Path(self.path).resolve().as_uri() + '?mode=ro'
+
+    def _connection(self):
+        # one read-only connection per thread, opened again in the forked workers
+        if getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self._uri(), uri=True, check_same_thread=False)
+            connection.execute('PRAGMA cache_size = -{}'.format(SQLITE_CACHE_MB * 1024))
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def __len__(self):
+        return self._length
+
+    def date_range(self):
+        return tuple(pd.Timestamp(d) for d in self._date_range)
+
+    def memory_usage(self):
+        # the rows stay on disk, the page cache of the connections is bounded by SQLITE_CACHE_MB
+        return 0
+
+    def _where(self, filters, date, conditions):
+        clauses, params = [], []
+        union = []
+        for level in LEVELS:
+            names = (filters or {}).get(level)
+            if names:
+                union.append('"{}" IN ({})'.format(level, ', '.join('?' * len(names))))
+                params += list(names)
+        if union:
+            clauses.append('({})'.format(' OR '.join(union)))
+        if date is not None:
+            clauses.append('date BETWEEN ? AND ?')
+            params += [pd.Timestamp(d).strftime('%Y-%m-%d') for d in _dates(date)]
+        for column, op, value in conditions:
+            check_columns(self._types, [column])
+            if op not in OPERATORS:
+                raise ValueError('unknown operator {}'.format(op))
+            if op == 'in':
+                values = [v.item() if isinstance(v, np.generic) else v for v in value]
+                clauses.append('"{}" IN ({})'.format(column, ', '.join('?' * len(values))))
+                params += values
+            else:
+                clauses.append('"{}" {} ?'.format(column, op))
+                params.append(value.item() if isinstance(value, np.generic) else value)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def _query(self, sql, params, columns):
+        cursor = self._connection().execute(sql, params)
+        df = pd.DataFrame.from_records(cursor.fetchall(), columns=[d[0] for d in cursor.description])
+        if 'date' in df.columns:
+            df['date'] = pd.to_datetime(df['date'])
+        for column in columns:
+            # typed as in the dataset, also when no row matches or a column is all NULL
+            if self._types.get(column) == 'REAL' or (self._types.get(column) == 'INTEGER' and df[column].isna().any()):
+                df[column] = df[column].astype(float)
+            elif self._types.get(column) == 'INTEGER':
+                df[column] = df[column].astype(np.int64)
+        return df
+
+    def rows(self, filters=None, columns=None, date=None, conditions=()):
+        columns = self.columns if columns is None else check_columns(self._types, list(columns))
+        where, params = self._where(filters, date, conditions)
+        sql = 'SELECT row, {} FROM rows{} ORDER BY row'.format(', '.join('"{}"'.format(c) for c in columns), where)
+        df = self._query(sql, params, columns).set_index('row')
+        df.index.name = None
+        return df
+
+    def _sum(self, column):
+        # like pandas, the sum of integers is an integer and the sum of no float is 0
+        return '{}("{}")'.format('SUM' if self._types.get(column) == 'INTEGER' else 'TOTAL', column)
+
+    def aggregate(self, by, columns, filters=None, date=None, conditions=()):
+        check_columns(self._types, list(by) + list(columns))
+        where, params = self._where(filters, date, conditions)
+        keys = ', '.join('"{}"'.format(c) for c in by)
+        sums = ''.join(', {} AS "{}"'.format(self._sum(c), c) for c in columns)
+        sql = 'SELECT {}{} FROM rows{} GROUP BY {} ORDER BY {}'.format(keys, sums, where, keys, keys)
+        return self._query(sql, params, columns)
+
+    def top(self, key, column, date, limit, filters=None):
+        check_columns(self._types, [key, column])
+        where, params = self._where(filters, date, ())
+        sql = ('SELECT "{0}", {1} AS value, {2} AS population FROM rows{3} GROUP BY "{0}" '
+               'ORDER BY value DESC, population DESC LIMIT ?').format(key, self._sum(column), self._sum('population'),
+                                                                      where)
+        return [row[0] for row in self._connection().execute(sql, params + [int(limit)])]
+
+    def maximum(self, column, conditions=()):
+        check_columns(self._types, [column])
+        where, params = self._where(None, None, conditions)
+        value = self._connection().execute('SELECT MAX("{}") FROM rows{}'.format(column, where), params).fetchone()[0]
+        return np.nan if value is None else value
@@ -0,0 +1,102 @@
+"""
+Startup profile of the app: module imports, data load, layout build and first request.
+
+    python bench/boot_profile.py [--lazy] [--repeat 5] [--budget bench/boot_budget.json]
+
+Every run starts a fresh interpreter so that the numbers match a dyno wake-up or a worker restart.
+The median over the runs is reported per stage, followed by the slowest modules imported by app.py.
+With --budget, the script exits with status 1 when a stage exceeds its budget (in seconds).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import pathlib
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+STAGES = ['module_import', 'data_load', 'layout_build', 'first_request', 'total']
+
+# run in the child interpreter: boot the app and serve the requests of a first page load
+CHILD = """
+import json, time
+t0 = time.perf_counter()
+import app
+t_import = time.perf_counter() - t0
+client = app.server.test_client()
+t = time.perf_counter()
+for url in ['/', '/_dash-layout', '/_dash-dependencies']:
+    assert client.get(url).status_code == 200, url
+t_request = time.perf_counter() - t
+timings = dict(app.boot_timings)
+# in lazy mode the default dataset is loaded and the layout built by the first request
+boot = timings['data_load'] + timings['layout_build']
+timings['module_import'] = t_import - (0 if app.LAZY_START else boot)
+timings['first_request'] = t_request - (boot if app.LAZY_START else 0)
+timings['total'] = t_import + t_request
+print(json.dumps(timings))
+"""
+
+
+def run_child(env):
+    out = subprocess.run([sys.executable, '-c', CHILD], cwd=str(ROOT), env=env, check=True,
+                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def import_times(env, top=15):
+    """ cumulative import time (in seconds) of the modules imported directly by app.py, from -X importtime """
+    err = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=str(ROOT), env=env,
+                         check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                         universal_newlines=True).stderr
+    modules = []
+    for line in err.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1 and int(cumulative) >= 1000:
+            modules.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(modules, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lazy', action='store_true', help='profile the LAZY_START mode')
+    parser.add_argument('--repeat', type=int, default=5, help='number of fresh interpreters to boot')
+    parser.add_argument('--budget', help='json file of {stage: max seconds}')
+    parser.add_argument('--json', action='store_true', help='print the report as json')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env['LAZY_START'] = '1' if args.lazy else ''
+    runs = [run_child(env) for _ in range(args.repeat)]
+    report = {stage: statistics.median(r[stage] for r in runs) for stage in STAGES}
+    modules = import_times(env)
+
+    breaches = {}
+    if args.budget:
+        with open(args.budget) as f:
+            budget = json.load(f)
+        breaches = {stage: (report[stage], limit) for stage, limit in budget.items() if report[stage] > limit}
+
+    if args.json:
+        print(json.dumps({'mode': 'lazy' if args.lazy else 'eager', 'stages': report,
+                          'imports': [{'module': m, 'seconds': s} for s, m in modules],
+                          'breaches': breaches}, indent=2))
+    else:
+        print('mode: {} (median of {} runs)'.format('lazy' if args.lazy else 'eager', args.repeat))
+        for stage in STAGES:
+            flag = '  OVER BUDGET ({:.3f}s)'.format(breaches[stage][1]) if stage in breaches else ''
+            print('  {:<15}{:8.3f}s{}'.format(stage, report[stage], flag))
+        print('slowest imports of app.py:')
+        for seconds, module in modules:
+            print('  {:<40}{:8.3f}s'.format(module, seconds))
+
+    sys.exit(1 if breaches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+"""
+Load test of the app served by gunicorn, replaying recorded callback payloads.
+
+    python bench/loadtest.py [--workers 2] [--threads 4] [--worker-class gthread]
+                             [--users 16] [--duration 60] [--payloads bench/payloads.json]
+
+The app is started locally with the given worker / thread model (or --url targets a running server),
+then --users concurrent clients post a weighted random mix of the payloads to /_dash-update-component
+for --duration seconds. The report gives the throughput, then the count, errors and p50 / p95 / p99
+latency per scenario.
+
+A slow callback answers with the id of its job (see jobs.py) instead of its figures: the client then polls it
+every --poll-ms like the page does, and the latency runs until the figures arrive. The number of requests answered
+through a job is reported per scenario (polled).
+
+Payloads are either a json mix {scenario: {weight, payloads}} such as bench/payloads.json, or a jsonl
+file recorded from real sessions by running the app with RECORD_PAYLOADS=<file>: in that case every
+callback is a scenario weighted by its frequency in the recording.
+"""
+import argparse
+import collections
+import json
+import os
+import pathlib
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+# gunicorn with the interpreter running the harness. gunicorn 20.0 has no __main__ module to run it with -m
+GUNICORN = [sys.executable, '-c', 'from gunicorn.app.wsgiapp import run; run()']
+# the job of a callback is held by a <name>_job store and polled by a <name>_job_poll interval
+JOB_STORE = '_job'
+JOB_POLL = '_job_poll'
+
+
+def load_mix(path):
+    """ {scenario: (weight, [payload])} """
+    with open(path) as f:
+        if path.endswith('.jsonl'):
+            payloads = collections.defaultdict(list)
+            for line in f:
+                if line.strip():
+                    body = json.loads(line)
+                    payloads[scenario_name(body)].append(body)
+            return {name: (len(bodies), bodies) for name, bodies in payloads.items()}
+        mix = json.load(f)
+    return {name: (entry['weight'], entry['payloads']) for name, entry in mix.items() if entry['payloads']}
+
+
+def scenario_name(body):
+    # first output of the callback, plus the input that triggered it
+    output = body['output'].strip('.').split('...')[0]
+    changed = body.get('changedPropIds') or ['initial']
+    return '{} <- {}'.format(output, changed[0])
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(args):
+    port = free_port()
+    # the settings of the deployment (preloading), the command line overriding the workers and threads
+    cmd = GUNICORN + ['app:server', '--config', 'gunicorn.conf.py', '--bind', '127.0.0.1:{}'.format(port),
+                      '--workers', str(args.workers), '--threads', str(args.threads),
+                      '--worker-class', args.worker_class, '--timeout', str(args.timeout)]
+    proc = subprocess.Popen(cmd, cwd=str(ROOT), env=dict(os.environ), stdout=subprocess.DEVNULL,
+                            stderr=None if args.verbose else subprocess.DEVNULL)
+    url = 'http://127.0.0.1:{}'.format(port)
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            sys.exit('gunicorn exited with status {}'.format(proc.returncode))
+        try:
+            urllib.request.urlopen(url + '/_dash-layout', timeout=5).read()
+            return proc, url
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            time.sleep(0.5)
+    proc.terminate()
+    sys.exit('gunicorn did not start within 120s')
+
+
+def post(url, body, timeout):
+    """ status and json content of the response, None when empty """
+    data = json.dumps(body).encode()
+    request = urllib.request.Request(url + '/_dash-update-component', data=data,
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            content = response.read()
+            return response.status, json.loads(content) if content else None
+    except urllib.error.HTTPError as e:
+        return e.code, None
+    except (urllib.error.URLError, ConnectionError, socket.timeout, ValueError):
+        return 0, None
+
+
+def running_job(content):
+    """ (store, job id) of the job that the response asks to poll, or None """
+    outputs = (content or {}).get('response', {})
+    for name, props in outputs.items():
+        if name.endswith(JOB_STORE) and props.get('data') and outputs.get(name + '_poll', {}).get('disabled') is False:
+            return name, props['data']
+    return None
+
+
+def poll_body(body, store, job_id, n):
+    """ body of the callback triggered by the n-th interval of the poll of its job """
+    poll = store[:-len(JOB_STORE)] + JOB_POLL
+    body = dict(body, changedPropIds=[poll + '.n_intervals'])
+    body['inputs'] = [dict(x, value=n) if (x['id'], x['property']) == (poll, 'n_intervals') else x
+                      for x in body['inputs']]
+    body['state'] = [dict(x, value=job_id) if (x['id'], x['property']) == (store, 'data') else x
+                     for x in body.get('state', [])]
+    return body
+
+
+def request(url, body, timeout, poll_ms):
+    """ status of the callback once its job if any is finished, and whether it was polled """
+    deadline = time.time() + timeout
+    status, content = post(url, body, timeout)
+    polls = 0
+    job = running_job(content) if status == 200 else None
+    while job is not None:
+        if time.time() > deadline:
+            return 0, True
+        time.sleep(poll_ms / 1000.0)
+        polls += 1
+        status, content = post(url, poll_body(body, job[0], job[1], polls), timeout)
+        job = running_job(content) if status == 200 else None
+    return status, polls > 0
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100.0 * (len(values) - 1))))]
+
+
+def run(url, mix, users, duration, seed, timeout, poll_ms):
+    names = list(mix)
+    weights = [mix[name][0] for name in names]
+    latencies = collections.defaultdict(list)
+    errors = collections.Counter()
+    polled = collections.Counter()
+    lock = threading.Lock()
+    stop = time.time() + duration
+
+    def user(i):
+        rnd = random.Random(seed + i)
+        while time.time() < stop:
+            name = rnd.choices(names, weights)[0]
+            body = rnd.choice(mix[name][1])
+            t = time.perf_counter()
+            status, was_polled = request(url, body, timeout, poll_ms)
+            elapsed = time.perf_counter() - t
+            with lock:
+                polled[name] += was_polled
+                # 204 is a PreventUpdate, a valid answer
+                if status in (200, 204):
+                    latencies[name].append(elapsed)
+                else:
+                    errors[name] += 1
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(users)]
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, polled, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--payloads', default=str(ROOT / 'bench' / 'payloads.json'))
+    parser.add_argument('--url', help='target a running server instead of starting gunicorn')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--worker-class', default='gthread')
+    parser.add_argument('--timeout', type=int, default=30, help='gunicorn worker and client request timeout')
+    parser.add_argument('--poll-ms', type=int, default=int(os.environ.get('JOB_POLL_MS', 500)),
+                        help='poll interval of the jobs')
+    parser.add_argument('--users', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--duration', type=float, default=60, help='seconds')
+    parser.add_argument('--warmup', type=int, default=1, help='passes over all the payloads before measuring')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='print the report as json')
+    parser.add_argument('--verbose', action='store_true', help='show the gunicorn logs')
+    args = parser.parse_args()
+
+    mix = load_mix(args.payloads)
+    proc = None
+    if args.url:
+        url = args.url.rstrip('/')
+    else:
+        proc, url = start_server(args)
+    try:
+        for _ in range(args.warmup):
+            for _, bodies in mix.values():
+                for body in bodies:
+                    request(url, body, args.timeout, args.poll_ms)
+        latencies, errors, polled, elapsed = run(url, mix, args.users, args.duration, args.seed, args.timeout,
+                                                 args.poll_ms)
+    finally:
+        if proc is not None:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait()
+
+    total = sum(len(v) for v in latencies.values())
+    report = {'setup': {'workers': args.workers, 'threads': args.threads, 'worker_class': args.worker_class,
+                        'users': args.users, 'duration': round(elapsed, 1)} if not args.url else {'url': url},
+              'throughput': total / elapsed,
+              'errors': sum(errors.values()),
+              'scenarios': {name: {'count': len(latencies[name]), 'errors': errors[name], 'polled': polled[name],
+                                   'p50': percentile(latencies[name], 50) if latencies[name] else None,
+                                   'p95': percentile(latencies[name], 95) if latencies[name] else None,
+                                   'p99': percentile(latencies[name], 99) if latencies[name] else None}
+                            for name in mix}}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(' '.join('{}={}'.format(k, v) for k, v in report['setup'].items()))
+    print('throughput: {:.1f} req/s, errors: {}'.format(report['throughput'], report['errors']))
+    print('{:<40}{:>8}{:>8}{:>8}{:>10}{:>10}{:>10}'.format('scenario', 'count', 'errors', 'polled', 'p50 ms', 'p95 ms',
+                                                           'p99 ms'))
+    for name, stats in report['scenarios'].items():
+        cells = ['{:10.0f}'.format(stats[q] * 1000) if stats[q] is not None else '{:>10}'.format('-')
+                 for q in ['p50', 'p95', 'p99']]
+        print('{:<40}{:>8}{:>8}{:>8}{}'.format(name[:40], stats['count'], stats['errors'], stats['polled'],
+                                               ''.join(cells)))
+
+
+if __name__ == '__main__':
+    main()
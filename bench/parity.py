@@ -0,0 +1,265 @@
+"""
+Golden-output parity of the timeline, map and progression callbacks.
+
+    python bench/parity.py record [--golden bench/parity_golden.json.gz]
+    python bench/parity.py compare [--golden ...] [--rtol 1e-6] [--atol 1e-9] [--only map]
+
+record posts a matrix of inputs on the bundled data to the callbacks, through the Dash endpoint like the browser
+(the timeline as the refresh then each view), and stores the canonical outputs: the figures without their
+template (trace data, customdata, hovertemplates, category orders, layout) and the labels.
+
+compare replays the same matrix with the app as configured by the environment (e.g. an alternative engine) and
+diffs every output against the golden file: numbers within the tolerances, everything else exactly. It exits
+with status 1 on any difference.
+
+The golden file was recorded with the pinned dash 1.9.1, dash-bootstrap-components 0.9.1, plotly 4.5.4 and
+plotly-express 0.4.1, on Python 3.11 with pandas 1.5.3, numpy 1.24.4 and scipy 1.15.3 (the pinned pandas, numpy
+and scipy have no build for it). record stores the versions in the file, and compare warns when they differ from
+the running ones: the trace names and legend groups of the figures change with the plotly version.
+"""
+import argparse
+import gzip
+import json
+import math
+import os
+import pathlib
+import platform
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+GOLDEN = ROOT / 'bench' / 'parity_golden.json.gz'
+# key of the versions in the golden file, next to the cases
+VERSIONS = '_versions'
+PACKAGES = ['dash', 'dash_bootstrap_components', 'plotly', 'pandas', 'numpy', 'scipy']
+
+TIMELINE_SELECTIONS = {
+    'world': {},
+    'europe': {'timeline_dd_region.value': ['Europe']},
+    'countries': {'timeline_dd_country.value': ['US', 'Canada', 'Italy']},
+    'areas': {'timeline_dd_area.value': ['US - New York', 'China - Hubei']},
+    'split_region': {'timeline_split.value': 'region'},
+    'split_subregion_top5': {'timeline_split.value': 'subregion', 'top_limit.value': '5'},
+    'split_europe_country_top10': {'timeline_dd_region.value': ['Europe'], 'timeline_split.value': 'country',
+                                   'top_limit.value': '10'},
+    'split_area_top15': {'timeline_split.value': 'country_area', 'top_limit.value': '15'},
+    'drilldown': {'timeline_split.value': 'drilldown'},
+}
+
+# increments, 7-day average
+TIMELINE_BARS = {'cumulative': (False, False), 'increments': ([True], False), 'smoothed': ([True], [True])}
+
+MAP_VIEWS = {'world': None, 'europe': {'mapbox.zoom': 3, 'mapbox.center': {'lat': 50, 'lon': 10},
+                                       'mapbox._derived': {'coordinates': [[-10, 60], [30, 60], [30, 40], [-10, 40]]}}}
+
+PROGRESSION = {
+    'default': {},
+    'deaths_rate': {'prog_dd_data.value': 'deaths'},
+    'absolute_linear': {'prog_dd_scale.value': [], 'prog_logscale.value': []},
+    'calendar_time': {'prog_dd_devtime.value': []},
+    'percent': {'prog_percent.value': [True]},
+    'top3': {'prog_toplimit.value': '3'},
+    'region_filter': {'prog_dd_region.value': ['Europe'], 'prog_dd_country.value': [], 'prog_dd_area.value': []},
+    'cases_ma7': {'prog_dd_data.value': 'confirmed_cases_ma7'},
+    'deaths_growth': {'prog_dd_data.value': 'deaths_growth', 'prog_dd_scale.value': []},
+    'doubling': {'prog_dd_data.value': 'confirmed_cases_doubling', 'prog_dd_scale.value': []},
+    'fits': {'prog_fit.value': ['logistic', 'exponential']},
+    'band': {'prog_band.value': [True]},
+}
+
+
+def cases(no_days):
+    """ {name: [(step, callback output, values, changed prop)]}, the values overriding the layout defaults """
+    matrix = {}
+    for name, selection in TIMELINE_SELECTIONS.items():
+        refresh = ('refresh', 'timeline_selection.data', dict(selection, **{'timeline_refresh.n_clicks': 1}),
+                   'timeline_refresh.n_clicks')
+        steps = [refresh, ('stack', 'stack_1.figure', {'split_data.value': False, 'tabs.active_tab': 'tab_timeline'},
+                           'timeline_selection.data')]
+        for bars, (increments, smooth) in TIMELINE_BARS.items():
+            values = {'split_data.value': [True], 'tabs.active_tab': 'tab_timeline', 'timeline_bars_key.data': None,
+                      'incremental_data.value': increments, 'smooth_data.value': smooth}
+            steps.append((bars, 'timeline_1.figure', values, 'incremental_data.value'))
+        if 'timeline_split.value' in selection:
+            steps.append(('details', 'detail_1.figure', {'tabs.active_tab': 'tab_current'}, 'tabs.active_tab'))
+        matrix['timeline/' + name] = steps
+
+    for map_data in ['confirmed_cases', 'deaths', 'recovered', 'active']:
+        for per_capita in [[], [True]]:
+            for small_pop in [[], [True]]:
+                for day in sorted({0, no_days // 2, no_days}):
+                    for view, relayout in MAP_VIEWS.items():
+                        if (day != no_days or small_pop) and view != 'world':
+                            continue
+                        values = {'map_data.value': map_data, 'per_capita.value': per_capita,
+                                  'small_pop.value': small_pop, 'date_slider.value': day,
+                                  'map_plot.relayoutData': relayout}
+                        name = 'map/{}/{}/{}/day{}/{}'.format(map_data, 'capita' if per_capita else 'total',
+                                                              'small' if small_pop else 'all', day, view)
+                        matrix[name] = [('map', 'map_plot.figure', values, 'date_slider.value')]
+
+    for name, values in PROGRESSION.items():
+        matrix['progression/' + name] = [('progression', 'prog_1.figure',
+                                          dict(values, **{'prog_refresh.n_clicks': 1}), 'prog_refresh.n_clicks')]
+    return matrix
+
+
+def layout_values(app):
+    """ initial value of every input of the layout, by id.prop """
+    layout = app.layout() if callable(app.layout) else app.layout
+    values = {}
+    for component in layout._traverse():
+        cid = getattr(component, 'id', None)
+        if cid:
+            for prop in ['value', 'data', 'n_clicks', 'active_tab', 'relayoutData']:
+                values['{}.{}'.format(cid, prop)] = getattr(component, prop, None)
+    return values
+
+
+def recorded(output_id, prop):
+    # the figures and labels, not the stores and job state of the views
+    return prop in ('figure', 'children') and 'job' not in output_id
+
+
+def canonical(value):
+    """ figure without its template and trace uids, other outputs as is """
+    if isinstance(value, dict) and 'data' in value and 'layout' in value:
+        layout = {k: v for k, v in value['layout'].items() if k != 'template'}
+        data = [{k: v for k, v in trace.items() if k != 'uid'} for trace in value['data']]
+        return {'data': data, 'layout': layout}
+    return value
+
+
+def run_case(app_module, client, defaults, steps):
+    values = dict(defaults)
+    outputs = {}
+    for step, output, overrides, changed in steps:
+        values.update(overrides)
+        keys = [k for k in app_module.app.callback_map if k.strip('.').split('...')[0] == output]
+        key = keys[0]
+        callback = app_module.app.callback_map[key]
+        body = {'output': key, 'changedPropIds': [changed],
+                'inputs': [{'id': c['id'], 'property': c['property'],
+                            'value': values.get('{}.{}'.format(c['id'], c['property']))} for c in callback['inputs']],
+                'state': [{'id': c['id'], 'property': c['property'],
+                           'value': values.get('{}.{}'.format(c['id'], c['property']))} for c in callback['state']]}
+        r = client.post('/_dash-update-component', json=body)
+        if r.status_code == 204:
+            continue
+        if r.status_code != 200:
+            raise RuntimeError('{} answered {}: {}'.format(output, r.status_code, r.data[-500:]))
+        for output_id, props in json.loads(r.data)['response'].items():
+            for prop, value in props.items():
+                values['{}.{}'.format(output_id, prop)] = value
+                if recorded(output_id, prop):
+                    outputs['{}/{}.{}'.format(step, output_id, prop)] = canonical(value)
+    return outputs
+
+
+def run_matrix(only=None):
+    # answered inline and without admission limits, the whole matrix runs in this process
+    os.environ.setdefault('JOB_INLINE_SECONDS', '600')
+    os.environ.setdefault('ADMISSION_CONCURRENCY', '0')
+    import app
+    client = app.server.test_client()
+    defaults = layout_values(app.app)
+    results = {}
+    for name, steps in cases(app.registry.get().no_days).items():
+        if only and not name.startswith(only):
+            continue
+        results[name] = run_case(app, client, defaults, steps)
+    return results
+
+
+def versions():
+    out = {'python': platform.python_version()}
+    for package in PACKAGES:
+        try:
+            out[package] = __import__(package).__version__
+        except ImportError:
+            out[package] = None
+    return out
+
+
+def diff(golden, current, rtol, atol, path=''):
+    """ paths where current differs from golden, numbers compared within the tolerances """
+    if isinstance(golden, bool) or isinstance(current, bool):
+        return [] if golden == current else ['{}: {!r} != {!r}'.format(path, current, golden)]
+    if isinstance(golden, (int, float)) and isinstance(current, (int, float)):
+        if math.isclose(current, golden, rel_tol=rtol, abs_tol=atol):
+            return []
+        return ['{}: {!r} != {!r}'.format(path, current, golden)]
+    if isinstance(golden, dict) and isinstance(current, dict):
+        out = []
+        for key in sorted(set(golden) | set(current)):
+            if key not in current:
+                out.append('{}.{}: missing'.format(path, key))
+            elif key not in golden:
+                out.append('{}.{}: unexpected'.format(path, key))
+            else:
+                out += diff(golden[key], current[key], rtol, atol, '{}.{}'.format(path, key))
+        return out
+    if isinstance(golden, list) and isinstance(current, list):
+        if len(golden) != len(current):
+            return ['{}: length {} != {}'.format(path, len(current), len(golden))]
+        out = []
+        for i, (g, c) in enumerate(zip(golden, current)):
+            out += diff(g, c, rtol, atol, '{}[{}]'.format(path, i))
+        return out
+    return [] if golden == current else ['{}: {!r} != {!r}'.format(path, current, golden)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['record', 'compare'])
+    parser.add_argument('--golden', default=str(GOLDEN))
+    parser.add_argument('--rtol', type=float, default=1e-6, help='relative tolerance of the numbers')
+    parser.add_argument('--atol', type=float, default=1e-9, help='absolute tolerance of the numbers')
+    parser.add_argument('--only', help='cases starting with this prefix, e.g. map or timeline/split')
+    parser.add_argument('--max-diffs', type=int, default=5, help='differences shown per output')
+    args = parser.parse_args()
+
+    results = run_matrix(args.only)
+    if args.command == 'record':
+        if args.only:
+            with gzip.open(args.golden, 'rt') as f:
+                results = dict(json.load(f), **results)
+        results[VERSIONS] = versions()
+        with gzip.open(args.golden, 'wt') as f:
+            json.dump(results, f, sort_keys=True, separators=(',', ':'))
+        del results[VERSIONS]
+        print('recorded {} outputs of {} cases in {}'.format(sum(len(v) for v in results.values()), len(results),
+                                                            args.golden))
+        return
+
+    with gzip.open(args.golden, 'rt') as f:
+        golden = json.load(f)
+    recorded_with, running = golden.pop(VERSIONS, {}), versions()
+    for package in PACKAGES:
+        if recorded_with.get(package) != running[package]:
+            print('warning: recorded with {} {}, running {}'.format(package, recorded_with.get(package),
+                                                                   running[package]))
+    failed = 0
+    for name, outputs in results.items():
+        if name not in golden:
+            print('{}: not recorded'.format(name))
+            continue
+        for output in sorted(set(golden[name]) | set(outputs)):
+            if output not in outputs or output not in golden[name]:
+                differences = ['{}'.format('missing' if output not in outputs else 'not recorded')]
+            else:
+                differences = diff(golden[name][output], outputs[output], args.rtol, args.atol)
+            if differences:
+                failed += 1
+                print('{} {}: {} difference(s)'.format(name, output, len(differences)))
+                for line in differences[:args.max_diffs]:
+                    print('    ' + line)
+    print('{} outputs of {} cases compared, {} differ'.format(sum(len(v) for v in results.values()), len(results),
+                                                              failed))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Encoding time of the eight timeline figures, plotly encoder against the fast path of fastjson.py.
+
+    python bench/serialization.py [--repeat 20] [--json]
+
+The figures are built for a few selections, from the plain timeline to the split by area, then every figure and
+the whole callback response are encoded with both encoders. The report gives the median time of each, the size,
+and whether the decoded outputs are identical.
+"""
+import argparse
+import json
+import pathlib
+import statistics
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+OUTPUTS = ['timeline_1', 'timeline_2', 'timeline_3', 'detail_1', 'detail_2', 'detail_3', 'stack_1', 'stack_2']
+
+# name: (show_increments, smooth, region, split, top_limit)
+SELECTIONS = {
+    'worldwide': ([], [], [], None, None),
+    'split_country_top5': ([], [], [], 'country', '5'),
+    'increments_europe_country': ([True], [True], ['Europe'], 'country', None),
+    'split_area': ([], [], [], 'country_area', None),
+}
+
+
+def timed(encode, obj, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = encode(obj)
+        times.append(time.perf_counter() - t)
+    return statistics.median(times), out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', action='store_true', help='print the report as json')
+    args = parser.parse_args()
+
+    import app
+    import fastjson
+    if fastjson.orjson is None:
+        sys.exit('orjson is not installed')
+
+    def plotly_encode(obj):
+        return json.dumps(obj, cls=fastjson.PlotlyJSONEncoder)
+
+    def fast_encode(obj):
+        return json.dumps(obj, cls=fastjson.FastJSONEncoder)
+
+    report = {}
+    for name, (show_increments, smooth, region, split, top_limit) in SELECTIONS.items():
+        selection = app.timeline_selection(app.registry.default, region, [], [], [], split, top_limit)
+        figures = app.timeline_bars(selection, bool(show_increments), bool(show_increments and smooth))
+        if split:
+            figures += app.timeline_details(selection)
+        figures += app.timeline_stack(selection)
+        items = list(zip([o for o in OUTPUTS if split or not o.startswith('detail')], figures))
+        items.append(('response', {'response': {output: {'figure': figure} for output, figure in items},
+                                   'multi': True}))
+        report[name] = {}
+        for output, obj in items:
+            t_plotly, out_plotly = timed(plotly_encode, obj, args.repeat)
+            t_fast, out_fast = timed(fast_encode, obj, args.repeat)
+            report[name][output] = {'bytes': len(out_fast), 'plotly_ms': t_plotly * 1000, 'fast_ms': t_fast * 1000,
+                                    'speedup': t_plotly / t_fast, 'identical': json.loads(out_plotly) == json.loads(out_fast)}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for name, outputs in report.items():
+        print(name)
+        print('  {:<12}{:>10}{:>12}{:>10}{:>10}{:>11}'.format('output', 'bytes', 'plotly ms', 'fast ms', 'speedup',
+                                                             'identical'))
+        for output, stats in outputs.items():
+            print('  {:<12}{:>10}{:>12.2f}{:>10.2f}{:>9.1f}x{:>11}'.format(
+                output, stats['bytes'], stats['plotly_ms'], stats['fast_ms'], stats['speedup'], str(stats['identical'])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Memory of the gunicorn workers, with and without the preloading of gunicorn.conf.py.
+
+    python bench/worker_memory.py [--workers 4] [--mode both|preload|no-preload] [--max-unique-mb 60]
+
+The app is started with the given number of workers, every payload of bench/payloads.json is replayed --passes
+times so that each worker has served the views, then the memory of the processes is read from /proc (Linux):
+RSS, PSS (the shared pages split between the processes) and unique memory (the private pages, what a worker
+adds). With --max-unique-mb, the script exits with status 1 when a preloaded worker is over that.
+"""
+import argparse
+import json
+import os
+import pathlib
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from loadtest import GUNICORN, free_port, load_mix, post
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+MB = 2 ** 20
+
+
+def memory(pid):
+    """ rss, pss and unique (private) bytes of the process, from smaps_rollup or smaps """
+    fields = {'Rss': 0, 'Pss': 0, 'Private_Clean': 0, 'Private_Dirty': 0}
+    path = '/proc/{}/smaps_rollup'.format(pid)
+    if not os.path.exists(path):
+        path = '/proc/{}/smaps'.format(pid)
+    with open(path) as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if name in fields:
+                fields[name] += int(value.split()[0]) * 1024
+    return {'rss_mb': fields['Rss'] / MB, 'pss_mb': fields['Pss'] / MB,
+            'unique_mb': (fields['Private_Clean'] + fields['Private_Dirty']) / MB}
+
+
+def children(pid):
+    pids = []
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open('/proc/{}/stat'.format(entry)) as f:
+                    # the command may contain spaces, the fields after it do not
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        pids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    return sorted(pids)
+
+
+def measure(preload, args, mix):
+    port = free_port()
+    env = dict(os.environ, PRELOAD='1' if preload else '0')
+    cmd = GUNICORN + ['app:server', '--config', 'gunicorn.conf.py', '--bind', '127.0.0.1:{}'.format(port),
+                      '--workers', str(args.workers), '--timeout', '120']
+    proc = subprocess.Popen(cmd, cwd=str(ROOT), env=env, stdout=subprocess.DEVNULL,
+                            stderr=None if args.verbose else subprocess.DEVNULL)
+    url = 'http://127.0.0.1:{}'.format(port)
+    try:
+        deadline = time.time() + 180
+        while True:
+            if proc.poll() is not None:
+                sys.exit('gunicorn exited with status {}'.format(proc.returncode))
+            if time.time() > deadline:
+                sys.exit('gunicorn did not start within 180s')
+            try:
+                urllib.request.urlopen(url + '/_dash-layout', timeout=5).read()
+                if len(children(proc.pid)) == args.workers:
+                    break
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            time.sleep(0.5)
+
+        # as many clients as workers, so that every worker serves its share of the payloads
+        bodies = [body for _, payloads in mix.values() for body in payloads]
+
+        def client(i):
+            for body in bodies[i::args.workers] * args.passes:
+                post(url, body, 120)
+                urllib.request.urlopen(url + '/_dash-layout', timeout=120).read()
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(args.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        workers = [memory(pid) for pid in children(proc.pid)]
+        return {'master': memory(proc.pid), 'workers': workers,
+                'worker_unique_mb_max': max(w['unique_mb'] for w in workers),
+                'total_pss_mb': memory(proc.pid)['pss_mb'] + sum(w['pss_mb'] for w in workers)}
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--mode', choices=['both', 'preload', 'no-preload'], default='both')
+    parser.add_argument('--passes', type=int, default=1, help='replays of the payloads per worker')
+    parser.add_argument('--payloads', default=str(ROOT / 'bench' / 'payloads.json'))
+    parser.add_argument('--max-unique-mb', type=float, help='fail when a preloaded worker is over this')
+    parser.add_argument('--json', action='store_true', help='print the report as json')
+    parser.add_argument('--verbose', action='store_true', help='show the gunicorn logs')
+    args = parser.parse_args()
+
+    mix = load_mix(args.payloads)
+    modes = {'both': [True, False], 'preload': [True], 'no-preload': [False]}[args.mode]
+    report = {'preload' if preload else 'no-preload': measure(preload, args, mix) for preload in modes}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for mode, stats in report.items():
+            print('{}: total PSS {:.1f} MB, max worker unique {:.1f} MB'.format(
+                mode, stats['total_pss_mb'], stats['worker_unique_mb_max']))
+            print('  {:<10}{:>10}{:>10}{:>12}'.format('process', 'RSS MB', 'PSS MB', 'unique MB'))
+            for name, m in [('master', stats['master'])] + [('worker', w) for w in stats['workers']]:
+                print('  {:<10}{:>10.1f}{:>10.1f}{:>12.1f}'.format(name, m['rss_mb'], m['pss_mb'], m['unique_mb']))
+
+    if args.max_unique_mb is not None and 'preload' in report:
+        if report['preload']['worker_unique_mb_max'] > args.max_unique_mb:
+            print('over budget: a preloaded worker uses {:.1f} MB > {} MB'.format(
+                report['preload']['worker_unique_mb_max'], args.max_unique_mb))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,348 @@
+"""
+Registry of the datasets served by the app, listed in data/datasets.json in the order of the selector:
+
+    {"covid": {"label": "Cases (JHU CSSE)", "file": "covid.csv"}, ...}
+
+A dataset with "corrected": true serves the cumulative series of its file with their anomalies corrected (see
+anomalies.py), so that the selector doubles as the toggle between the published and the corrected series.
+
+The datasets share the region / subregion / country / country_area hierarchy and the views. A dataset is only
+read on first use, so are its derived indexes (map grid, name indexes), and the loaded datasets are kept under
+a global memory budget: the least recently used are dropped when it is exceeded, and read again when requested.
+
+The views query a dataset through its backend (see backends.py): in memory with pandas, or from a SQLite file
+built next to the dataset file, chosen with QUERY_BACKEND or the "backend" of the dataset in the manifest.
+
+The file of a loaded dataset is checked every DATASET_REFRESH_SECONDS: the days appended to it (e.g. the latest
+daily extract) are ingested incrementally, any other change reads it again.
+"""
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+import anomalies
+import metrics
+from backends import QUERY_BACKEND, PandasBackend, SqliteBackend
+
+# memory budget of the loaded datasets and their derived indexes, the most recently used one is always kept
+DATASET_MEMORY_MB = int(os.environ.get('DATASET_MEMORY_MB', 512))
+# a loaded dataset is checked for changes of its file at most this often, 0 checks on every request
+DATASET_REFRESH_SECONDS = float(os.environ.get('DATASET_REFRESH_SECONDS', 60))
+# derived index not built yet
+_MISSING = object()
+
+
+def read_frame(source):
+    """ rows of a dataset file (a path or a file object) with their dates and the timeline label """
+    df = pd.read_csv(source)
+    df['date'] = pd.to_datetime(df['date'], dayfirst=True)
+    df['Timeline'] = df['date'].dt.strftime('%b %d')
+    return df
+
+
+def add_ma7_rates(df):
+    """ rates of the 7-day averages: per capita for the cases, per case for the deaths and recoveries """
+    df['confirmed_cases_ma7_rate'] = df['confirmed_cases_ma7'] / df['population']
+    for col in ['deaths', 'recovered']:
+        df[col + '_ma7_rate'] = (df[col + '_ma7'] / df['confirmed_cases_ma7']).replace([np.inf, -np.inf], np.nan)
+    return df
+
+
+def derive(df, corrected=False):
+    """
+    rows of read_frame() with their anomaly flags and corrections, rolling metrics and their rates.
+    With corrected, the cumulative series are replaced by their corrections before the metrics are computed
+    """
+    df = df.join(anomalies.detect(df))
+    if corrected:
+        anomalies.correct(df)
+
+    # rolling metrics: 7-day averages of the daily increments, growth rates and doubling times
+    df = df.join(metrics.compute(df))
+    return add_ma7_rates(df)
+
+
+def load_frame(path, corrected=False):
+    """ rows of a dataset file with the timeline label, anomaly flags and corrections, rolling metrics and rates """
+    return derive(read_frame(path), corrected)
+
+
+def ingest_frame(frame, new_rows, corrected=False, published=None, key='country_area'):
+    """
+    frame of load_frame() extended with new_rows of read_frame(), the next days of the dataset appended to its file.
+    The derived columns of the new rows are computed from the last rows of their areas (see metrics.update and
+    anomalies.update), the areas whose previous days change with them are derived again.
+    With corrected, published holds the rows of frame as read from the file
+    """
+    if len(frame) and new_rows['date'].min() <= frame['date'].max():
+        raise ValueError('the new rows are not later than the rows of the dataset')
+    new_rows = new_rows.set_axis(pd.RangeIndex(len(frame), len(frame) + len(new_rows)))
+    raw = pd.concat([frame[new_rows.columns] if published is None else published, new_rows])
+    cols = metrics.BASE_COLS
+    new = np.arange(len(raw)) >= len(frame)
+
+    work = raw[[key, 'date'] + cols].copy()
+    for col in cols:
+        work[col + '_corrected'] = frame[col + '_corrected']
+    flags, redo = anomalies.update(work, new, key, cols)
+    rows = new_rows.join(flags)
+    if corrected:
+        anomalies.correct(rows)
+
+    work = pd.concat([frame[[key, 'date'] + cols], rows[[key, 'date'] + cols]])
+    rows = add_ma7_rates(rows.join(metrics.update(work, new, key, cols)))
+    out = pd.concat([frame, rows[frame.columns]])
+
+    if redo:
+        areas = raw[raw[key].isin(redo)]
+        derived = derive(areas, corrected)
+        out.loc[derived.index, derived.columns] = derived
+    return out
+
+
+def sqlite_path(path, corrected=False):
+    return os.path.splitext(path)[0] + ('.corrected' if corrected else '') + '.sqlite'
+
+
+def load_backend(path, kind=QUERY_BACKEND, corrected=False):
+    """ backend of the dataset file, the SQLite file being built again when older than the dataset file """
+    if kind == 'sqlite':
+        db_path = sqlite_path(path, corrected)
+        if not os.path.exists(db_path) or os.path.getmtime(db_path) < os.path.getmtime(path):
+            SqliteBackend.build(db_path, load_frame(path, corrected))
+        return SqliteBackend(db_path)
+    if kind != 'pandas':
+        raise ValueError('unknown query backend {}'.format(kind))
+    return PandasBackend(load_frame(path, corrected))
+
+
+def ingest_backend(path, backend, new_rows, corrected=False):
+    """ backend extended with new_rows, the rows appended to the dataset file path since it was loaded """
+    frame = backend.df if isinstance(backend, PandasBackend) else backend.rows()
+    # the anomalies of the new days are found in the published series
+    published = read_frame(path).iloc[:len(frame)] if corrected else None
+    frame = ingest_frame(frame, new_rows, corrected, published)
+    if isinstance(backend, SqliteBackend):
+        SqliteBackend.build(backend.path, frame)
+        return SqliteBackend(backend.path)
+    return PandasBackend(frame)
+
+
+def sizeof(obj, depth=3):
+    """ approximate memory footprint of obj in bytes, following containers and attributes down to depth """
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(np.sum(obj.memory_usage(deep=True)))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    size = sys.getsizeof(obj)
+    if depth == 0:
+        return size
+    if isinstance(obj, dict):
+        return size + sum(sizeof(k, depth - 1) + sizeof(v, depth - 1) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return size + sum(sizeof(v, depth - 1) for v in obj)
+    if hasattr(obj, '__dict__'):
+        return size + sizeof(vars(obj), depth)
+    return size
+
+
+def freeze_arrays(obj, depth=3):
+    """ mark the NumPy buffers of obj read-only, following containers and attributes down to depth """
+    if isinstance(obj, pd.DataFrame):
+        # one block per dtype, so that the workers share a few large buffers
+        obj._consolidate_inplace()
+        manager = obj._mgr if hasattr(obj, '_mgr') else obj._data
+        for block in manager.blocks:
+            freeze_arrays(getattr(block.values, '_ndarray', block.values), 0)
+    elif isinstance(obj, pd.Series):
+        freeze_arrays(getattr(obj.array, '_ndarray', obj.to_numpy()), 0)
+    elif isinstance(obj, np.ndarray):
+        obj.flags.writeable = False
+    elif depth == 0:
+        return
+    elif isinstance(obj, dict):
+        for v in obj.values():
+            freeze_arrays(v, depth - 1)
+    elif isinstance(obj, (list, tuple, set)):
+        for v in obj:
+            freeze_arrays(v, depth - 1)
+    elif hasattr(obj, '__dict__'):
+        freeze_arrays(vars(obj), depth)
+
+
+class Dataset:
+    def __init__(self, name, label, backend, fingerprint=''):
+        self.name = name
+        self.label = label
+        self.backend = backend
+        self.columns = backend.columns
+        first_date, self.end_date = backend.date_range()
+        self.begin_date = first_date + timedelta(days=1)
+        self.no_days = (self.end_date - self.begin_date).days
+        # day 0 of the date axis of the growth fits
+        self.date_origin = first_date
+        # identifies the loaded data in caches, also when the file is corrected in place (see file_fingerprint)
+        self.version = '{}-{}-{}-{}'.format(name, self.end_date.strftime('%Y%m%d'), len(backend), fingerprint)
+        self.nbytes = backend.memory_usage()
+        self._derived = {}
+        self._lock = threading.Lock()
+        # one lock per derived index, so that building one does not block the lookups of the others
+        self._build_locks = {}
+        self.frozen = False
+
+    def derived(self, name, build):
+        """ index derived from the data, built with build(dataset) on first use """
+        value = self._derived.get(name, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            build_lock = self._build_locks.setdefault(name, threading.Lock())
+        with build_lock:
+            if name not in self._derived:
+                value = build(self)
+                with self._lock:
+                    self._derived[name] = value
+                    self.nbytes += sizeof(value)
+            return self._derived[name]
+
+    def freeze(self):
+        """ make the data and the derived indexes read-only, before forking workers that share them """
+        with self._lock:
+            freeze_arrays(self.backend)
+            freeze_arrays(self._derived)
+            self.frozen = True
+
+
+class DatasetRegistry:
+    def __init__(self, data_path, manifest='datasets.json', memory_budget=DATASET_MEMORY_MB * 2 ** 20,
+                 on_load=None, refresh_seconds=DATASET_REFRESH_SECONDS):
+        self.data_path = data_path
+        with open(os.path.join(data_path, manifest)) as f:
+            self.specs = json.load(f, object_pairs_hook=OrderedDict)
+        self.default = next(iter(self.specs))
+        self.memory_budget = memory_budget
+        # called with the name and the duration (in seconds) of every load
+        self.on_load = on_load
+        self.refresh_seconds = refresh_seconds
+        self.loads = 0
+        self.ingests = 0
+        self.evictions = 0
+        self._loaded = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        # file fingerprint, size and hash of the content of the loaded datasets, and when they were last checked
+        self._sources = {}
+        self._checked = {}
+        self.fingerprint = self.files_fingerprint()
+
+    def __len__(self):
+        return len(self.specs)
+
+    def _path(self, name):
+        return os.path.join(self.data_path, self.specs[name]['file'])
+
+    def file_fingerprint(self, name):
+        """ name, file, mtime and size of the file of the dataset name """
+        path = self._path(name)
+        return name, self.specs[name]['file'], os.path.getmtime(path), os.path.getsize(path)
+
+    def files_fingerprint(self):
+        """ identifies the files of the datasets, without reading them """
+        stats = [self.file_fingerprint(name) for name in self.specs]
+        return hashlib.sha1(repr(stats).encode()).hexdigest()[:12]
+
+    def options(self):
+        return [{'label': spec.get('label', name), 'value': name} for name, spec in self.specs.items()]
+
+    def memory_usage(self):
+        with self._lock:
+            return sum(ds.nbytes for ds in self._loaded.values())
+
+    def loaded(self):
+        """ names of the loaded datasets, least recently used first """
+        with self._lock:
+            return list(self._loaded)
+
+    def get(self, name=None):
+        """ the dataset name, the default one when None or unknown, loaded if needed """
+        if name not in self.specs:
+            name = self.default
+        with self._lock:
+            ds = self._loaded.get(name)
+            if ds is not None:
+                self._loaded.move_to_end(name)
+                if not self._file_changed(name):
+                    return ds
+            load_lock = self._loading.setdefault(name, threading.Lock())
+
+        # concurrent requests of a dataset being loaded wait for that load
+        with load_lock:
+            with self._lock:
+                current = self._loaded.get(name)
+                if current is not None and current is not ds:
+                    self._loaded.move_to_end(name)
+                    return current
+                # None when not loaded or evicted meanwhile: read in full
+                ds = current
+            t = time.perf_counter()
+            spec = self.specs[name]
+            path = self._path(name)
+            # the file as loaded, taken before reading it
+            stats = self.file_fingerprint(name)
+            with open(path, 'rb') as f:
+                content = f.read()
+            backend = self._ingest(name, ds, content) if ds is not None else None
+            ingested = backend is not None
+            if not ingested:
+                backend = load_backend(path, spec.get('backend', QUERY_BACKEND), spec.get('corrected', False))
+            ds = Dataset(name, spec.get('label', name), backend, hashlib.sha1(repr(stats).encode()).hexdigest()[:12])
+            if self.on_load is not None:
+                self.on_load(name, time.perf_counter() - t)
+            with self._lock:
+                self._loaded[name] = ds
+                self._sources[name] = stats, len(content), hashlib.sha1(content).hexdigest()
+                self._checked[name] = time.monotonic()
+                self.fingerprint = self.files_fingerprint()
+                if ingested:
+                    self.ingests += 1
+                else:
+                    self.loads += 1
+                self._evict()
+        return ds
+
+    def _file_changed(self, name):
+        """ whether the file of the loaded dataset name changed since it was read, checked every refresh_seconds """
+        now = time.monotonic()
+        if now - self._checked.get(name, now) < self.refresh_seconds:
+            return False
+        self._checked[name] = now
+        try:
+            return self.file_fingerprint(name) != self._sources[name][0]
+        except OSError:
+            return False
+
+    def _ingest(self, name, ds, content):
+        """ backend of the loaded dataset ds with the rows appended to its file, None when it changed otherwise """
+        _, size, digest = self._sources[name]
+        if len(content) <= size or content[size - 1:size] != b'\n' \
+                or hashlib.sha1(content[:size]).hexdigest() != digest:
+            return None
+        header = content[:content.index(b'\n') + 1]
+        try:
+            new_rows = read_frame(io.BytesIO(header + content[size:]))
+            return ingest_backend(self._path(name), ds.backend, new_rows, self.specs[name].get('corrected', False))
+        except ValueError:
+            # rows of the previous days
+            return None
+
+    def _evict(self):
+        while len(self._loaded) > 1 and sum(ds.nbytes for ds in self._loaded.values()) > self.memory_budget:
+            self._loaded.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,17 @@
+"""
+Boolean settings read from the environment, shared by the app and gunicorn.conf.py.
+"""
+import os
+
+TRUE = ('1', 'true', 'yes', 'on')
+FALSE = ('0', 'false', 'no', 'off')
+
+
+def env_flag(name, default=False):
+    """ True / False for the usual spellings of the variable name, default when it is unset, empty or unknown """
+    value = os.environ.get(name, '').strip().lower()
+    if value in TRUE:
+        return True
+    if value in FALSE:
+        return False
+    return default
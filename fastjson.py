@@ -0,0 +1,74 @@
+"""
+Fast JSON encoding of the callback responses and layouts.
+
+Dash encodes every response with plotly.utils.PlotlyJSONEncoder, which copies every figure (to_dict deep-copies
+the traces), walks the NumPy arrays and dates in Python, then decodes and encodes the result again to turn NaN into
+null. FastJSONEncoder encodes in one pass with orjson, NumPy arrays and dates natively, figures without the copy.
+Anything orjson cannot encode falls back to the plotly encoder, so the output is the same JSON.
+
+install() swaps the encoder in plotly.utils, where Dash looks it up on every call. orjson is optional: without it
+the plotly encoder is kept.
+"""
+import datetime
+import decimal
+import numpy as np
+import pandas as pd
+import plotly.utils
+from plotly.basedatatypes import BaseFigure
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PlotlyJSONEncoder = plotly.utils.PlotlyJSONEncoder
+
+if orjson is not None:
+    OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    # called by orjson on the objects it does not encode natively
+    if isinstance(obj, BaseFigure):
+        # the validated properties as is: to_plotly_json() would deep-copy them
+        result = {'data': obj._data, 'layout': obj._layout}
+        frames = [frame._props for frame in obj._frame_objs]
+        if frames:
+            result['frames'] = frames
+        return result
+    if hasattr(obj, 'to_plotly_json'):
+        return obj.to_plotly_json()
+    if isinstance(obj, np.ndarray):
+        if obj.dtype != object and not obj.flags.c_contiguous:
+            return np.ascontiguousarray(obj)
+        return obj.tolist()
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return obj.to_numpy()
+    if obj is pd.NaT:
+        return None
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    raise TypeError
+
+
+class FastJSONEncoder(PlotlyJSONEncoder):
+    def encode(self, o):
+        # formatted output is left to the plotly encoder
+        if orjson is not None and self.indent is None and not self.sort_keys:
+            try:
+                return orjson.dumps(o, default=_default, option=OPTIONS).decode()
+            except TypeError:
+                pass
+        return super(FastJSONEncoder, self).encode(o)
+
+
+def install():
+    """ encode the Dash responses with FastJSONEncoder, True when installed """
+    if orjson is None:
+        return False
+    plotly.utils.PlotlyJSONEncoder = FastJSONEncoder
+    return True
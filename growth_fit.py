@@ -0,0 +1,177 @@
+"""
+Logistic and exponential growth models fitted to the progression curves.
+
+The initial estimates of all the curves are computed at once, then the curves are fitted in batches by a pool of
+FIT_WORKERS processes (curve_fit holds the GIL for most of its time, so threads would not fit them any faster).
+The pool is created on first use by each process, so that the gunicorn workers do not inherit the pool of a
+preloading master, and its processes are forked from a forkserver rather than from the threads of the server.
+Fewer than FIT_POOL_MIN curves are fitted in the calling process, and the fitted parameters are cached per curve.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from cache import LRUCache
+
+# days projected beyond the last data point
+PROJECTION_DAYS = 14
+# curves with fewer points are not fitted
+MIN_POINTS = 5
+# 0 fits every curve in the calling process
+FIT_WORKERS = int(os.environ.get('FIT_WORKERS', min(4, os.cpu_count() or 1)))
+# fewer curves to fit are not worth the round trip to the pool
+FIT_POOL_MIN = int(os.environ.get('FIT_POOL_MIN', 8))
+
+# fitted parameters per (dataset version, area, data column, x column, model), None when the fit failed
+fit_cache = LRUCache(maxsize=4096)
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def logistic(t, k, r, t0):
+    return k / (1 + np.exp(-r * (t - t0)))
+
+
+def exponential(t, a, r):
+    return a * np.exp(r * t)
+
+
+MODELS = {'logistic': logistic, 'exponential': exponential}
+
+
+def initial_estimates(curves):
+    """
+    starting parameters of both models for all the (t, y) curves at once.
+    the curves are stacked into nan-padded matrices and a log-linear regression is run on every row
+    """
+    n = max(len(t) for t, _ in curves)
+    tt = np.full((len(curves), n), np.nan)
+    yy = np.full((len(curves), n), np.nan)
+    for i, (t, y) in enumerate(curves):
+        tt[i, :len(t)] = t
+        yy[i, :len(y)] = y
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        valid = (yy > 0) & np.isfinite(tt)
+        count = np.maximum(valid.sum(axis=1), 1)
+        log_y = np.where(valid, np.log(np.where(valid, yy, 1)), 0)
+        t_v = np.where(valid, tt, 0)
+        t_mean = t_v.sum(axis=1) / count
+        l_mean = log_y.sum(axis=1) / count
+        cov = (np.where(valid, (t_v - t_mean[:, None]) * (log_y - l_mean[:, None]), 0)).sum(axis=1)
+        var = (np.where(valid, (t_v - t_mean[:, None]) ** 2, 0)).sum(axis=1)
+        r = np.where(var > 0, cov / var, 0)
+    a = np.exp(l_mean - r * t_mean)
+    y_max = np.nanmax(np.where(np.isfinite(yy), yy, 0), axis=1)
+    t_last = np.nanmax(np.where(np.isfinite(tt), tt, -np.inf), axis=1)
+
+    # the logistic starts as if the curve was at its inflection point today
+    return {'exponential': np.column_stack([a, r]),
+            'logistic': np.column_stack([2 * np.maximum(y_max, 1e-9), np.maximum(r, 0.05), t_last])}
+
+
+def fit_one(model, t, y, p0):
+    from scipy.optimize import curve_fit
+
+    mask = np.isfinite(t) & np.isfinite(y)
+    t, y = t[mask], y[mask]
+    if len(t) < MIN_POINTS or y.max() <= 0:
+        return None
+    if model == 'logistic':
+        y_max = y.max()
+        bounds = ([y_max, 0, -np.inf], [np.inf, 5, np.inf])
+        p0 = [max(p0[0], y_max * 1.01), min(max(p0[1], 1e-3), 4.9), p0[2]]
+    else:
+        bounds = ([0, -5], [np.inf, 5])
+        p0 = [max(p0[0], 1e-12), min(max(p0[1], -4.9), 4.9)]
+    try:
+        params, _ = curve_fit(MODELS[model], t, y, p0=p0, bounds=bounds, max_nfev=2000)
+    except (RuntimeError, ValueError):
+        return None
+    return params
+
+
+def fit_batch(model, batch):
+    """ fitted parameters of the (t, y, p0) curves of batch, run by the processes of the pool """
+    return [fit_one(model, t, y, p0) for t, y, p0 in batch]
+
+
+def get_pool():
+    """ process pool of this process, None when the fits run in the calling process """
+    global _pool, _pool_pid
+    if FIT_WORKERS < 1:
+        return None
+    with _pool_lock:
+        # a pool inherited across a fork has no processes in this one
+        if _pool is None or _pool_pid != os.getpid():
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                # imported once by the forkserver rather than by every process of the pool
+                context.set_forkserver_preload(['__main__', 'growth_fit', 'scipy.optimize'])
+            else:
+                context = multiprocessing.get_context('spawn')
+            _pool = ProcessPoolExecutor(max_workers=FIT_WORKERS, mp_context=context)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _reset_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def fit_curves(model, curves, keys):
+    """
+    fitted parameters of the model for every (t, y) curve, None where the fit failed.
+    cached curves are returned as is, the others get vectorized initial estimates and are fitted in parallel batches
+    """
+    params = [fit_cache.get(key, False) for key in keys]
+    missing = [i for i, p in enumerate(params) if p is False]
+    if missing:
+        p0 = initial_estimates([curves[i] for i in missing])[model]
+        todo = [(curves[i][0], curves[i][1], p0[j]) for j, i in enumerate(missing)]
+        pool = get_pool() if len(missing) >= FIT_POOL_MIN else None
+        if pool is None:
+            fitted = fit_batch(model, todo)
+        else:
+            # one batch per process, every n-th curve so that the long and short curves are spread over the batches
+            n = min(FIT_WORKERS, len(todo))
+            futures = [pool.submit(fit_batch, model, todo[k::n]) for k in range(n)]
+            try:
+                batches = [future.result() for future in futures]
+            except BrokenProcessPool:
+                # a process of the pool died: a new pool next time, these curves fitted here
+                _reset_pool(pool)
+                batches = [fit_batch(model, todo[k::n]) for k in range(n)]
+            fitted = [None] * len(todo)
+            for k, batch in enumerate(batches):
+                fitted[k::n] = batch
+        for i, p in zip(missing, fitted):
+            params[i] = p
+            fit_cache.put(keys[i], p)
+    return params
+
+
+def describe(model, params):
+    """ hover text of the fitted parameters """
+    if model == 'logistic':
+        k, r, t0 = params
+        return 'Plateau : {}<br>Growth : {:.1%} / day<br>Inflection : day {:.0f}'.format(_si(k), r, t0)
+    a, r = params
+    doubling = 'Doubling : {:.1f} days'.format(np.log(2) / r) if r > 0 else 'No growth'
+    return 'Growth : {:.1%} / day<br>{}'.format(r, doubling)
+
+
+def _si(value):
+    for suffix in ['', 'k', 'M', 'G']:
+        if abs(value) < 1000:
+            return '{:.3g}{}'.format(value, suffix)
+        value /= 1000.0
+    return '{:.3g}T'.format(value)
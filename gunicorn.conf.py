@@ -0,0 +1,41 @@
+"""
+gunicorn settings, read from the working directory (see Procfile).
+
+With PRELOAD=1 (the default) the master process imports the app, loads the default dataset, its indexes and the
+layout, and makes the data read-only before forking the workers, which then share these pages copy-on-write
+instead of each loading its own copy. The garbage collector is off in the master and its objects are frozen
+before the fork, so that the collections in the workers do not write to the shared pages.
+
+PRELOAD=0 imports the app in every worker. The number of workers is set by WEB_CONCURRENCY as usual.
+bench/worker_memory.py compares the memory of the workers in both modes.
+"""
+import gc
+import os
+import sys
+
+# the modules of the app, also when gunicorn is started from another directory with --chdir
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from env import env_flag  # noqa: E402
+
+preload_app = env_flag('PRELOAD', True)
+
+if preload_app:
+    # no collection while the master loads, leaving no freed holes in the pages shared with the workers
+    gc.disable()
+
+
+def when_ready(server):
+    # called after the app is preloaded, before the workers are forked
+    if not preload_app:
+        return
+    import app
+    app.preload()
+    gc.collect()
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+    server.log.info('Preloaded dataset %s, forking the workers', app.registry.default)
+
+
+def post_fork(server, worker):
+    if preload_app:
+        gc.enable()
@@ -0,0 +1,229 @@
+"""
+Background jobs for the long-running callbacks.
+
+A callback submits its computation and waits for it up to JOB_INLINE_SECONDS: quick computations are answered in
+the same request as before, the others answer with a job id that the page polls with a dcc.Interval until the result
+is ready, so that no request runs into the router timeout nor holds a worker for the whole computation.
+
+Identical computations submitted while one is running share it. A newer job of the same kind from a session
+supersedes the previous one, which is cancelled once no session waits for it anymore: dropped when not started yet,
+otherwise stopped at its next checkpoint.
+
+Jobs live in the memory of the worker process running them. With a result directory (shared by the workers of a
+gunicorn server), the results of the polled jobs are also written there, named by the job id, a hash of the key of
+the computation: a poll reaching another worker reads the result from there, or submits the computation again when
+it is not finished yet, which the caller coalesces with the running one across the workers (see singleflight.py).
+"""
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+# computations finishing within this delay are answered inline
+JOB_INLINE_SECONDS = float(os.environ.get('JOB_INLINE_SECONDS', 2))
+# finished jobs are dropped after this delay
+JOB_TTL = 300
+# shared result files older than JOB_TTL are removed at most this often
+CLEANUP_SECONDS = 60
+JOB_ID = re.compile(r'[0-9a-f]{40}')
+
+_local = threading.local()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def checkpoint(progress=None, message=None):
+    """ report the progress (fraction in [0, 1]) of the job running in this thread, and stop it if cancelled """
+    job = getattr(_local, 'job', None)
+    if job is None:
+        return
+    if job.cancelled:
+        raise JobCancelled(job.id)
+    if progress is not None:
+        job.progress = progress
+    if message is not None:
+        job.message = message
+
+
+def key_id(key):
+    # the same in every worker
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+class Job:
+    def __init__(self, key, kind, job_id=None):
+        self.id = job_id or key_id(key)
+        self.key = key
+        self.kind = kind
+        # sessions waiting for the result
+        self.sessions = set()
+        self.progress = 0.0
+        self.message = 'Queued'
+        self.cancelled = False
+        self.result = None
+        self.error = None
+        self.finished_at = None
+        self.future = None
+        # polled, its result is shared with the other workers
+        self.detached = False
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """ True when the job is finished, waiting up to timeout seconds for it """
+        return self._done.wait(timeout)
+
+
+class JobManager:
+    def __init__(self, workers=JOB_WORKERS, result_dir=None):
+        self.workers = workers
+        self.result_dir = result_dir
+        if result_dir:
+            os.makedirs(result_dir, exist_ok=True)
+        self._cleaned = 0
+        self._pool = None
+        self._lock = threading.Lock()
+        self._jobs = {}
+        # unfinished job per key, latest job id per (session, kind)
+        self._running = {}
+        self._latest = {}
+        # number of submissions served by a running job, number of cancelled jobs, number of results read from the
+        # result directory
+        self.shared = 0
+        self.cancelled = 0
+        self.loaded = 0
+
+    def _get_pool(self):
+        # created on first use, so that it is not inherited by forked workers
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+        return self._pool
+
+    def get(self, job_id):
+        """ the job, or a finished job read from the result directory when it ran on another worker, or None """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.result_dir and isinstance(job_id, str) and JOB_ID.fullmatch(job_id):
+            job = self._load(job_id)
+        return job
+
+    def detach(self, job):
+        """ the job is answered later, to polls that may reach other workers: share its result once finished """
+        with self._lock:
+            job.detached = True
+            finished = job.finished_at is not None
+        if finished:
+            self._save(job)
+
+    def submit(self, key, kind, session, fn):
+        """ job computing fn(), shared with the running job of the same key if any """
+        with self._lock:
+            self._purge()
+            job = self._running.get(key)
+            if job is not None:
+                self.shared += 1
+            else:
+                job = Job(key, kind)
+                self._jobs[job.id] = job
+                self._running[key] = job
+                job.future = self._get_pool().submit(self._run, job, fn)
+
+            if session is not None:
+                previous = self._jobs.get(self._latest.get((session, kind)))
+                if previous is not None and previous is not job:
+                    previous.sessions.discard(session)
+                    if not previous.sessions and not previous.done:
+                        self._cancel(previous)
+                job.sessions.add(session)
+                self._latest[(session, kind)] = job.id
+        return job
+
+    def _cancel(self, job):
+        job.cancelled = True
+        self.cancelled += 1
+        if self._running.get(job.key) is job:
+            del self._running[job.key]
+        if job.future.cancel():
+            # not started: finished right away
+            job.error = JobCancelled(job.id)
+            job.finished_at = time.time()
+            job._done.set()
+
+    def _run(self, job, fn):
+        _local.job = job
+        job.message = 'Running'
+        try:
+            checkpoint()
+            job.result = fn()
+        except Exception as e:
+            job.error = e
+        finally:
+            _local.job = None
+            with self._lock:
+                if self._running.get(job.key) is job:
+                    del self._running[job.key]
+                job.finished_at = time.time()
+                detached = job.detached
+            # shared before it is seen finished
+            if detached:
+                self._save(job)
+            job.progress = 1.0
+            job._done.set()
+
+    def _path(self, job_id):
+        return os.path.join(self.result_dir, job_id + '.job')
+
+    def _save(self, job):
+        if not self.result_dir or job.error is not None:
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.result_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(job.result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(job.id))
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _load(self, job_id):
+        path = self._path(job_id)
+        try:
+            finished_at = os.path.getmtime(path)
+            if finished_at < time.time() - JOB_TTL:
+                return None
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        job = Job(None, None, job_id)
+        job.result, job.finished_at, job.progress = result, finished_at, 1.0
+        job._done.set()
+        with self._lock:
+            self.loaded += 1
+        return job
+
+    def _purge(self):
+        limit = time.time() - JOB_TTL
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished_at and job.finished_at < limit]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if expired:
+            self._latest = {k: job_id for k, job_id in self._latest.items() if job_id in self._jobs}
+        if self.result_dir and time.time() - self._cleaned > CLEANUP_SECONDS:
+            self._cleaned = time.time()
+            for entry in os.scandir(self.result_dir):
+                try:
+                    if entry.name.endswith('.job') and entry.stat().st_mtime < limit:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
@@ -0,0 +1,15 @@
+import importlib
+import types
+
+
+class LazyModule(types.ModuleType):
+    """ stand-in for a module, importing the actual module on first attribute access """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self._module = None
+
+    def __getattr__(self, item):
+        if self._module is None:
+            self._module = importlib.import_module(self.__name__)
+        return getattr(self._module, item)
@@ -0,0 +1,194 @@
+"""
+Opt-in memory accounting of the callbacks, for long-lived workers.
+
+MEMORY_PROFILE=tracemalloc traces the Python allocations: every profiled call records its peak allocation, overall
+and per stage, and the RSS growth of the process across the call. MEMORY_PROFILE=rss only records the RSS growth,
+at a negligible cost.
+
+Every MEMORY_SNAPSHOT_SECONDS the memory of the process is sampled, and with tracemalloc diffed by source line
+with the previous snapshot. The process is flagged as growing when the memory went up over the last
+MEMORY_GROWTH_SNAPSHOTS snapshots.
+
+The peaks are those of the whole process: with concurrent calls in threads, they are upper bounds.
+"""
+import functools
+import os
+import threading
+import time
+import tracemalloc
+
+MEMORY_PROFILE = os.environ.get('MEMORY_PROFILE', '').lower()
+if MEMORY_PROFILE in ('1', 'true', 'yes'):
+    MEMORY_PROFILE = 'tracemalloc'
+MEMORY_SNAPSHOT_SECONDS = float(os.environ.get('MEMORY_SNAPSHOT_SECONDS', 300))
+MEMORY_GROWTH_SNAPSHOTS = int(os.environ.get('MEMORY_GROWTH_SNAPSHOTS', 3))
+# snapshots kept in the report, and lines of the top growth
+HISTORY = 48
+TOP_LINES = 15
+
+MB = 2 ** 20
+
+
+def rss_bytes():
+    """ resident set size of the process, None when not available """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _mb(value):
+    return round(value / MB, 2) if value is not None else None
+
+
+class _Stats:
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.peak_max = 0
+        self.peak_last = 0
+        self.rss_growth = 0
+        self.stages = {}
+
+    def to_dict(self):
+        return {'calls': self.calls, 'seconds': round(self.seconds, 3),
+                'peak_mb_max': _mb(self.peak_max), 'peak_mb_last': _mb(self.peak_last),
+                'rss_growth_mb': _mb(self.rss_growth),
+                'stages_peak_mb_max': {name: _mb(peak) for name, peak in self.stages.items()}}
+
+
+class MemoryProfiler:
+    def __init__(self, mode=MEMORY_PROFILE, snapshot_seconds=MEMORY_SNAPSHOT_SECONDS):
+        self.mode = mode if mode in ('tracemalloc', 'rss') else None
+        self.snapshot_seconds = snapshot_seconds
+        self.snapshots = []
+        self.top_growth = []
+        self._stats = {}
+        self._previous = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def enabled(self):
+        return self.mode is not None
+
+    @property
+    def tracing(self):
+        return self.mode == 'tracemalloc'
+
+    def _start(self):
+        # started by the first profiled call, so after the fork of the workers
+        with self._lock:
+            if self._thread is not None:
+                return
+            if self.tracing and not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self._thread = threading.Thread(target=self._snapshot_loop, name='memprofile', daemon=True)
+            self._thread.start()
+
+    def profile(self, name):
+        """ decorator recording the memory of the calls of func under name, func itself when disabled """
+        def decorator(func):
+            if not self.enabled:
+                return func
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if getattr(self._local, 'call', None) is not None:
+                    # nested in another profiled call, accounted there
+                    return func(*args, **kwargs)
+                self._start()
+                call = {'stage': None, 'peak': 0, 'stages': {},
+                        'base': tracemalloc.get_traced_memory()[0] if self.tracing else 0}
+                self._reset_peak()
+                self._local.call = call
+                rss = rss_bytes()
+                t = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self._close_stage(call)
+                    self._local.call = None
+                    rss_end = rss_bytes()
+                    with self._lock:
+                        stats = self._stats.setdefault(name, _Stats())
+                        stats.calls += 1
+                        stats.seconds += time.perf_counter() - t
+                        stats.peak_last = call['peak']
+                        stats.peak_max = max(stats.peak_max, call['peak'])
+                        if rss is not None and rss_end is not None:
+                            stats.rss_growth += rss_end - rss
+                        for stage, peak in call['stages'].items():
+                            stats.stages[stage] = max(stats.stages.get(stage, 0), peak)
+            return wrapper
+        return decorator
+
+    def stage(self, name):
+        """ start the stage name of the profiled call running in this thread, ending the previous one """
+        call = getattr(self._local, 'call', None)
+        if call is None or not self.tracing:
+            return
+        self._close_stage(call)
+        call['stage'] = name
+
+    def _close_stage(self, call):
+        if not self.tracing:
+            return
+        peak = max(0, tracemalloc.get_traced_memory()[1] - call['base'])
+        call['peak'] = max(call['peak'], peak)
+        if call['stage'] is not None:
+            call['stages'][call['stage']] = max(call['stages'].get(call['stage'], 0), peak)
+        self._reset_peak()
+
+    def _reset_peak(self):
+        # not available before python 3.9: the peaks of the stages are then cumulative
+        if self.tracing and hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+
+    def _snapshot_loop(self):
+        while True:
+            time.sleep(self.snapshot_seconds)
+            self.take_snapshot()
+
+    def take_snapshot(self):
+        entry = {'time': round(time.time()), 'rss_mb': _mb(rss_bytes())}
+        top_growth = None
+        if self.tracing and tracemalloc.is_tracing():
+            entry['traced_mb'] = _mb(tracemalloc.get_traced_memory()[0])
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>')])
+            if self._previous is not None:
+                top_growth = [{'line': str(stat.traceback[0]), 'size_diff_kb': round(stat.size_diff / 1024, 1),
+                               'count_diff': stat.count_diff}
+                              for stat in snapshot.compare_to(self._previous, 'lineno')[:TOP_LINES]
+                              if stat.size_diff > 0]
+            self._previous = snapshot
+        with self._lock:
+            self.snapshots = (self.snapshots + [entry])[-HISTORY:]
+            if top_growth is not None:
+                self.top_growth = top_growth
+        return entry
+
+    def growing(self):
+        """ True when the memory went up over each of the last MEMORY_GROWTH_SNAPSHOTS snapshots """
+        key = 'traced_mb' if self.tracing else 'rss_mb'
+        values = [s.get(key) for s in self.snapshots[-(MEMORY_GROWTH_SNAPSHOTS + 1):]]
+        if len(values) <= MEMORY_GROWTH_SNAPSHOTS or None in values:
+            return False
+        return all(b > a for a, b in zip(values, values[1:]))
+
+    def report(self):
+        with self._lock:
+            callbacks = {name: stats.to_dict() for name, stats in self._stats.items()}
+            snapshots = list(self.snapshots)
+            top_growth = list(self.top_growth)
+        return {'mode': self.mode,
+                'rss_mb': _mb(rss_bytes()),
+                'traced_mb': _mb(tracemalloc.get_traced_memory()[0]) if tracemalloc.is_tracing() else None,
+                'growing': self.growing(),
+                'callbacks': callbacks,
+                'snapshots': snapshots,
+                'top_growth': top_growth}
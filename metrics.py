@@ -0,0 +1,147 @@
+"""
+Rolling metrics of the cumulative series: 7-day moving average of the daily increments, log-linear growth rate
+and doubling time.
+
+All the areas are computed at once: the rows are sorted by area and date, and every window sum is the difference
+of two cumulative sums, the windows being clipped at the first row of each area.
+update() computes the metrics of the latest days of the areas from their last WINDOW rows only.
+"""
+import warnings
+import numpy as np
+import pandas as pd
+
+WINDOW = 7
+BASE_COLS = ['confirmed_cases', 'deaths', 'recovered']
+# minimum number of positive points in a window to estimate a growth rate
+MIN_GROWTH_POINTS = 3
+# minimum number of areas with a value at an x position to show the distribution there
+MIN_BAND_GROUPS = 5
+
+
+def metric_columns(cols=BASE_COLS):
+    return [c + suffix for c in cols for suffix in ['_ma7', '_growth', '_doubling']]
+
+
+def group_starts(codes):
+    """ position of the first row of the group of each row, codes being sorted """
+    n = len(codes)
+    first = np.ones(n, dtype=bool)
+    first[1:] = codes[1:] != codes[:-1]
+    return np.maximum.accumulate(np.where(first, np.arange(n), 0))
+
+
+def window_sum(values, starts, window=WINDOW):
+    """ sum of values over the last window rows of the same group, for each row """
+    cs = np.concatenate([[0.0], np.cumsum(values, dtype=float)])
+    i = np.arange(len(values))
+    lo = np.maximum(i - window + 1, starts)
+    return cs[i + 1] - cs[lo]
+
+
+def increments(values, starts):
+    """ daily increments within each group, 0 on the first row of a group """
+    inc = np.zeros(len(values), dtype=float)
+    inc[1:] = np.diff(values.astype(float))
+    inc[starts == np.arange(len(values))] = 0
+    return inc
+
+
+def rolling_mean(values, starts, window=WINDOW):
+    count = np.minimum(np.arange(len(values)) - starts + 1, window)
+    return window_sum(values, starts, window) / count
+
+
+def log_growth(values, days, starts, window=WINDOW):
+    """ slope of the least-squares line of log(values) against days over the window, nan when undefined """
+    valid = values > 0
+    y = np.where(valid, np.log(np.where(valid, values, 1.0)), 0.0)
+    # days relative to the group start keep the sums small
+    x = np.where(valid, days - days[starts], 0.0)
+    n = window_sum(valid.astype(float), starts, window)
+    sx = window_sum(x, starts, window)
+    sy = window_sum(y, starts, window)
+    sxy = window_sum(x * y, starts, window)
+    sxx = window_sum(x * x, starts, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        den = n * sxx - sx * sx
+        slope = (n * sxy - sx * sy) / den
+        # flat series: the cumulative sums leave a rounding residue
+        slope[np.abs(slope) < 1e-9] = 0
+        slope[(n < MIN_GROWTH_POINTS) | ~(np.abs(den) > 1e-9)] = np.nan
+    return slope
+
+
+def sorted_groups(frame, key='country_area'):
+    """
+    order of the rows of frame by key and date, the sorted group codes, the group starts and the inverse order
+    """
+    codes = pd.factorize(frame[key])[0]
+    days = (frame['date'] - frame['date'].min()).dt.days.to_numpy(dtype=float)
+    order = np.lexsort((days, codes))
+    codes = codes[order]
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(len(order))
+    return order, codes, group_starts(codes), inverse
+
+
+def compute(frame, key='country_area', cols=BASE_COLS):
+    """ metric columns of every row of frame (same index), for the cumulative cols, per key """
+    order, _, starts, inverse = sorted_groups(frame, key)
+    days = (frame['date'] - frame['date'].min()).dt.days.to_numpy(dtype=float)[order]
+
+    result = {}
+    for col in cols:
+        values = frame[col].to_numpy(dtype=float)[order]
+        growth = log_growth(values, days, starts)
+        result[col + '_ma7'] = rolling_mean(increments(values, starts), starts)
+        result[col + '_growth'] = growth
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result[col + '_doubling'] = np.where(growth > 0, np.log(2) / growth, np.nan)
+
+    out = pd.DataFrame(index=frame.index)
+    for name, values in result.items():
+        out[name] = values[inverse]
+    return out
+
+
+def update(frame, rows, key='country_area', cols=BASE_COLS):
+    """
+    metric columns of the rows of frame selected by the boolean mask rows (same index), the latest days of their
+    areas (e.g. an ingested daily extract). Only the last WINDOW rows of each area before them are needed as
+    history, the metrics of the other rows are unchanged
+    """
+    new = frame.loc[rows, [key, 'date'] + cols]
+    previous = frame.loc[~rows & frame[key].isin(new[key].unique()), [key, 'date'] + cols]
+    history = previous.sort_values([key, 'date']).groupby(key).tail(WINDOW)
+    return compute(pd.concat([history, new]), key, cols).iloc[len(history):]
+
+
+def smooth_increments(frame, inc_cols, key=None):
+    """ replace the daily increments columns of frame, sorted by key and date, by their 7-day moving average """
+    codes = pd.factorize(frame[key])[0] if key else np.zeros(len(frame), dtype=np.int64)
+    starts = group_starts(codes)
+    for col in inc_cols:
+        frame[col] = rolling_mean(frame[col].to_numpy(dtype=float), starts)
+    return frame
+
+
+def quantile_band(frame, col, x, key='country_area', q=(25, 50, 75), min_groups=MIN_BAND_GROUPS):
+    """
+    percentiles q of col across the key groups at every value of x, with the number of groups.
+    the rows are laid out in an (x value, group) matrix and the percentiles taken along the groups at once
+    """
+    xs, x_codes = np.unique(frame[x].to_numpy(), return_inverse=True)
+    codes = pd.factorize(frame[key])[0]
+    values = frame[col].to_numpy(dtype=float)
+    matrix = np.full((len(xs), codes.max() + 1 if len(codes) else 0), np.nan)
+    matrix[x_codes, codes] = np.where(np.isfinite(values), values, np.nan)
+
+    count = np.isfinite(matrix).sum(axis=1)
+    keep = count >= min_groups
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        percentiles = np.nanpercentile(matrix[keep], q, axis=1)
+    band = pd.DataFrame({x: xs[keep], 'count': count[keep]})
+    for p, values in zip(q, percentiles):
+        band['p{}'.format(p)] = values
+    return band
@@ -0,0 +1,58 @@
+import re
+from collections import defaultdict
+import numpy as np
+
+# longer query tokens are matched on this prefix, then checked against the full token
+MAX_PREFIX = 8
+
+_token_re = re.compile(r'[^\W_]+')
+
+
+def tokenize(name):
+    return _token_re.findall(str(name).lower())
+
+
+class NameIndex:
+    """
+    Prefix index over the tokens of a list of names, e.g. 'US - New York' is found by 'new', 'yo' or 'us ne'.
+    Names are ranked by weight (descending), and the postings are kept in rank order so that the top-N
+    matches of a query are the N first entries of the intersection of its token postings.
+    """
+
+    def __init__(self, names, weights):
+        ranked = sorted(zip(names, weights), key=lambda x: (-x[1], x[0]))
+        self.names = [name for name, _ in ranked]
+        self.tokens = [tokenize(name) for name in self.names]
+        self.postings = defaultdict(list)
+        for rank, tokens in enumerate(self.tokens):
+            prefixes = {token[:i] for token in tokens for i in range(1, min(len(token), MAX_PREFIX) + 1)}
+            for prefix in prefixes:
+                self.postings[prefix].append(rank)
+        # one array per prefix rather than a list of ints
+        self.postings = {prefix: np.array(ranks, dtype=np.int32) for prefix, ranks in self.postings.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, query, limit=20):
+        """ names matching every token of the query, by decreasing weight """
+        query_tokens = tokenize(query or '')
+        if not query_tokens:
+            return self.names[:limit]
+        ranks = None
+        for token in sorted(query_tokens, key=len, reverse=True):
+            matches = self.postings.get(token[:MAX_PREFIX])
+            if matches is None:
+                return []
+            # postings are sorted by rank
+            ranks = matches if ranks is None else np.intersect1d(ranks, matches, assume_unique=True)
+            if not len(ranks):
+                return []
+        long_tokens = [token for token in query_tokens if len(token) > MAX_PREFIX]
+        result = []
+        for rank in ranks:
+            if all(any(t.startswith(token) for t in self.tokens[rank]) for token in long_tokens):
+                result.append(self.names[rank])
+                if len(result) == limit:
+                    break
+        return result
@@ -0,0 +1,81 @@
+"""
+Precomputed responses of the Dash routes whose body only changes with the data served: the layout and the
+callback dependencies.
+
+Each body is serialized once per key (the version of the default dataset), kept as is and gzipped, and served with
+a strong ETag and "Cache-Control: no-cache": the browser keeps the response and revalidates it on every page load,
+which is answered 304 without a body while the ETag matches. Clients accepting gzip get the stored compressed bytes.
+"""
+import gzip
+import hashlib
+import flask
+from cache import LRUCache
+
+# bodies smaller than this are not worth compressing
+MIN_GZIP_BYTES = 1024
+
+
+class PrecomputedBody:
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        # compressed once, so at the highest level
+        self.gzipped = gzip.compress(body, 9, mtime=0) if len(body) >= MIN_GZIP_BYTES else None
+        self.etag = hashlib.sha1(body).hexdigest()[:24]
+
+    def response(self, request):
+        """ response to request, 304 when its If-None-Match has the ETag of the encoding it accepts """
+        gzipped = self.gzipped is not None and request.accept_encodings['gzip'] > 0
+        response = flask.Response(self.gzipped if gzipped else self.body, mimetype=self.mimetype)
+        if gzipped:
+            response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = 'no-cache'
+        # each encoding is a representation of its own
+        response.set_etag(self.etag + ('-gzip' if gzipped else ''))
+        return response.make_conditional(request)
+
+
+class PrecomputedRoutes:
+    """ serves the GET routes of a Flask app from bodies precomputed per key, by replacing their view functions """
+
+    def __init__(self, server, key, maxsize=4):
+        self.server = server
+        self.key = key
+        self._bodies = LRUCache(maxsize=maxsize)
+        self._views = {}
+        # bodies built, and responses served from them with or without a body
+        self.builds = 0
+        self.hits = 0
+        self.not_modified = 0
+
+    def add(self, endpoint):
+        """ precompute the responses of the view function of endpoint """
+        self._views[endpoint] = self.server.view_functions[endpoint]
+
+        def view(*args, **kwargs):
+            response = self.body(endpoint).response(flask.request)
+            if response.status_code == 304:
+                self.not_modified += 1
+            else:
+                self.hits += 1
+            return response
+        self.server.view_functions[endpoint] = view
+
+    def body(self, endpoint):
+        """ body of endpoint for the current key, built with the original view function on a miss """
+        def build():
+            response = self._views[endpoint]()
+            self.builds += 1
+            return PrecomputedBody(response.get_data(), response.mimetype)
+        return self._bodies.get_or_compute((endpoint, self.key()), build)
+
+    def warm(self):
+        """ build the bodies of every route for the current key, outside of a request """
+        with self.server.test_request_context():
+            for endpoint in self._views:
+                self.body(endpoint)
+
+    def stats(self):
+        return {'builds': self.builds, 'hits': self.hits, 'not_modified': self.not_modified,
+                'cached': len(self._bodies)}
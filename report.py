@@ -0,0 +1,187 @@
+"""
+Batch rendering of briefing reports: the timeline and progression figures of a list of selections, without a browser.
+
+    python report.py reports.json [--out reports] [--format html|json|both] [--workers 4]
+    python report.py --each country [--dataset covid] [--out reports] ...
+
+reports.json is a list of reports, each a selection of the dashboard (every key is optional):
+
+    {"name": "western-europe", "dataset": "covid",
+     "region": [], "subregion": ["Western Europe"], "country": [], "area": [],
+     "split": "country", "top_limit": 10, "increments": false, "smooth": false,
+     "metrics": ["confirmed_cases", "deaths"],
+     "progression": {"scale": true, "logscale": true, "devtime": true, "top_limit": 12, "percent": false,
+                     "fit": [], "band": false},
+     "views": ["stack", "bars", "details", "progression"]}
+
+--each renders one report per region, subregion, country or area of the dataset instead, split by the next level.
+
+The dataset is loaded once, and the timeline aggregates of the distinct selections are computed before the
+reports are fanned out to a pool of processes, which share them copy-on-write where processes are forked
+(Linux, macOS with --start-method fork). Each report is written as <out>/<name>.html (the figures on one page)
+and/or <out>/<name>.json (the figures as plotly json).
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+# the layout is not needed
+os.environ.setdefault('LAZY_START', '1')
+# the reports are rendered in parallel already, by daemonic processes which cannot start a pool of fits
+os.environ.setdefault('FIT_WORKERS', '0')
+
+import plotly.io
+import plotly.utils
+import app
+
+VIEWS = ['stack', 'bars', 'details', 'progression']
+# the defaults of the progression section
+PROGRESSION = {'scale': True, 'logscale': True, 'devtime': True, 'top_limit': 12, 'percent': False, 'fit': [],
+               'band': False}
+# --each level: filter of the report, split of its timeline
+EACH = {'region': ('region', 'subregion'), 'subregion': ('subregion', 'country'),
+        'country': ('country', 'country_area'), 'area': ('area', None)}
+
+
+def slug(name):
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+
+def each_reports(dataset, level, top_limit):
+    """ one report per name of level, by decreasing confirmed cases """
+    filter_key, split = EACH[level]
+    names = app.get_name_indexes(app.registry.get(dataset))[level].names
+    return [{'name': '{}-{}'.format(level, slug(name)), 'dataset': dataset, filter_key: [name], 'split': split,
+             'top_limit': top_limit} for name in names]
+
+
+def selection_of(report):
+    return app.timeline_selection(report.get('dataset') or app.registry.default, report.get('region'),
+                                  report.get('subregion'), report.get('country'), report.get('area'),
+                                  report.get('split'), report.get('top_limit'))
+
+
+def render(report):
+    """ {figure name: figure} of report """
+    selection = selection_of(report)
+    views = report.get('views') or VIEWS
+    figures = {}
+    if 'stack' in views:
+        figures.update(zip(['stack_cumulative', 'stack_increments'], app.timeline_stack(selection)))
+    if 'bars' in views and selection['split']:
+        bars = app.timeline_bars(selection, report.get('increments'), report.get('smooth'))
+        figures.update(zip(['bars_cases', 'bars_deaths', 'bars_recovered'], bars))
+    if 'details' in views and selection['split']:
+        figures.update(zip(['current_cases', 'current_deaths', 'current_recovered'], app.timeline_details(selection)))
+    if 'progression' in views:
+        options = dict(PROGRESSION, **report.get('progression', {}))
+        for metric in report.get('metrics') or ['confirmed_cases']:
+            fig, reference = app.progression_figures(
+                selection['dataset'], metric, options['scale'], selection['region'], selection['subregion'],
+                selection['country'], selection['area'], options['logscale'], options['devtime'],
+                options['top_limit'], options['percent'], options['fit'], options['band'])
+            figures['progression_' + metric] = fig
+            if options['devtime']:
+                figures['progression_{}_reference'.format(metric)] = reference
+    return figures
+
+
+def write_html(path, title, figures):
+    parts = []
+    for i, (name, fig) in enumerate(figures.items()):
+        # plotly.js is loaded once, by the first figure
+        parts.append(plotly.io.to_html(fig, include_plotlyjs='cdn' if i == 0 else False, full_html=False,
+                                       default_height='480px'))
+    with open(path, 'w') as f:
+        f.write('<!DOCTYPE html>\n<html>\n<head><meta charset="utf-8"><title>{0}</title></head>\n<body>\n'
+                '<h1>{0}</h1>\n{1}\n</body>\n</html>\n'.format(title, '\n'.join(parts)))
+
+
+def run(task):
+    """ render and write one report, (name, files, seconds, error) """
+    report, out, formats = task
+    t = time.perf_counter()
+    name = report['name']
+    try:
+        figures = render(report)
+        files = []
+        if 'json' in formats:
+            files.append(os.path.join(out, name + '.json'))
+            with open(files[-1], 'w') as f:
+                f.write(json.dumps({'name': name, 'report': report, 'figures': figures},
+                                   cls=plotly.utils.PlotlyJSONEncoder))
+        if 'html' in formats:
+            files.append(os.path.join(out, name + '.html'))
+            write_html(files[-1], name, figures)
+        return name, files, time.perf_counter() - t, None
+    except Exception as e:
+        return name, [], time.perf_counter() - t, '{}: {}'.format(type(e).__name__, e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('reports', nargs='?', help='json file of the reports')
+    parser.add_argument('--each', choices=list(EACH), help='one report per name of this level')
+    parser.add_argument('--dataset', help='dataset of --each, the default one otherwise')
+    parser.add_argument('--top-limit', type=int, default=10, help='top limit of the splits of --each')
+    parser.add_argument('--limit', type=int, help='only the first reports')
+    parser.add_argument('--out', default='reports')
+    parser.add_argument('--format', choices=['html', 'json', 'both'], default='html')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--start-method', choices=multiprocessing.get_all_start_methods(),
+                        default='fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+    args = parser.parse_args()
+    if bool(args.reports) == bool(args.each):
+        parser.error('give either a reports file or --each')
+
+    t = time.perf_counter()
+    if args.each:
+        reports = each_reports(args.dataset or app.registry.default, args.each, args.top_limit)
+    else:
+        with open(args.reports) as f:
+            reports = json.load(f)
+        for i, report in enumerate(reports):
+            report.setdefault('name', 'report-{}'.format(i + 1))
+    reports = reports[:args.limit]
+    if len({report['name'] for report in reports}) < len(reports):
+        sys.exit('the names of the reports are not unique')
+    os.makedirs(args.out, exist_ok=True)
+    formats = ['html', 'json'] if args.format == 'both' else [args.format]
+
+    # the aggregates of the distinct selections, computed once for all the processes
+    selections = {json.dumps(selection_of(r), sort_keys=True): selection_of(r) for r in reports}
+    app.timeline_cache.maxsize = max(app.timeline_cache.maxsize, len(selections))
+    for selection in selections.values():
+        app.timeline_aggregate(selection)
+    loaded = time.perf_counter() - t
+
+    # the reports of a selection next to each other, so that a process renders them from the same aggregate
+    tasks = [(r, args.out, formats) for r in sorted(reports, key=lambda r: json.dumps(selection_of(r), sort_keys=True))]
+    t = time.perf_counter()
+    if args.workers > 1 and len(tasks) > 1:
+        context = multiprocessing.get_context(args.start_method)
+        chunksize = max(1, math.ceil(len(tasks) / (args.workers * 4)))
+        with context.Pool(args.workers) as pool:
+            results = list(pool.imap_unordered(run, tasks, chunksize))
+    else:
+        results = [run(task) for task in tasks]
+    rendered = time.perf_counter() - t
+
+    failed = [(name, error) for name, _, _, error in results if error]
+    for name, error in failed:
+        print('{}: {}'.format(name, error))
+    files = sum(len(r[1]) for r in results)
+    print('{} reports ({} files in {}) rendered in {:.1f}s by {} process(es), dataset and {} aggregate(s) in {:.1f}s'
+          .format(len(results) - len(failed), files, args.out, rendered, max(1, min(args.workers, len(tasks))),
+                  len(selections), loaded))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
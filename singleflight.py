@@ -0,0 +1,140 @@
+"""
+Coalescing of concurrent identical computations: the first caller of a key computes, the callers arriving
+while it runs wait for its result instead of computing it again.
+
+Within a process the callers are threads waiting on an event. With a lock directory, the workers of a
+gunicorn server are coordinated as well: the leader holds an exclusive flock on one of LOCK_STRIPES lock files,
+picked by the hash of the key, while computing. A worker finding it locked leaves a wait file for the key and
+blocks on the flock; the leader pickles its result next to the lock files only when a wait file asks for it, and
+the waiting workers read it. Keys sharing a stripe are computed one at a time across the workers.
+
+The errors of the leader are raised to its followers too, except those given as retry (e.g. the cancellation of
+the job of the leader, which is not the computation failing): the followers then call again, one of them leading.
+"""
+import contextlib
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # not available on windows, the cross-process mode is then disabled
+    fcntl = None
+
+# number of lock files, shared by the keys with the same hash modulo
+LOCK_STRIPES = 64
+# result and wait files older than this are removed, at most every CLEANUP_SECONDS
+RESULT_TTL = 60
+CLEANUP_SECONDS = 30
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, lock_dir=None, retry=()):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.retry = retry
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._cleaned = 0
+        # number of calls served from the result of another caller, by process and by lock file
+        self.shared = 0
+
+    def do(self, key, fn):
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+            if leader:
+                break
+            call.event.wait()
+            if isinstance(call.error, self.retry):
+                continue
+            with self._lock:
+                self.shared += 1
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(key, fn)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    def _run(self, key, fn):
+        if not self.lock_dir:
+            return fn()
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        lock_path = os.path.join(self.lock_dir, 'stripe-{}.lock'.format(int(digest, 16) % LOCK_STRIPES))
+        wait_path = os.path.join(self.lock_dir, digest + '.wait')
+        result_path = os.path.join(self.lock_dir, digest + '.result')
+        start = time.time()
+        with open(lock_path, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                # another worker is computing this key or another key of the stripe: ask for its result, wait for
+                # it, then use the result if it was written for this key after we arrived
+                open(wait_path, 'a').close()
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    if os.path.getmtime(result_path) >= start:
+                        with open(result_path, 'rb') as f:
+                            result = pickle.load(f)
+                        with self._lock:
+                            self.shared += 1
+                        return result
+                except (OSError, EOFError, pickle.UnpicklingError):
+                    pass
+            try:
+                result = fn()
+                if os.path.exists(wait_path):
+                    self._write_result(result_path, result)
+                    with contextlib.suppress(OSError):
+                        os.remove(wait_path)
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                self._cleanup()
+
+    def _write_result(self, path, result):
+        fd, tmp = tempfile.mkstemp(dir=self.lock_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _cleanup(self):
+        now = time.time()
+        with self._lock:
+            if now - self._cleaned < CLEANUP_SECONDS:
+                return
+            self._cleaned = now
+        limit = now - RESULT_TTL
+        for entry in os.scandir(self.lock_dir):
+            try:
+                if entry.name.endswith(('.result', '.wait', '.tmp')) and entry.stat().st_mtime < limit:
+                    os.remove(entry.path)
+            except OSError:
+                pass
@@ -0,0 +1,85 @@
+import numpy as np
+
+# level z of the grid uses square cells of 360 / 2**z degrees
+MAX_LEVEL = 12
+# cells are drawn roughly 64px wide: 512px tiles cover 360 / 2**zoom degrees
+ZOOM_TO_LEVEL = 3
+
+
+class GridIndex:
+    """
+    Spatial grid over the distinct lat / long locations of the dataset.
+    Every row of the frame is mapped to a location id, and every location to one cell per zoom level,
+    so that clustering a subset of rows is a couple of array lookups and a bincount.
+    """
+
+    def __init__(self, lat, lon, max_level=MAX_LEVEL):
+        coords = np.column_stack([np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)])
+        locations, self.row_location = np.unique(coords, axis=0, return_inverse=True)
+        self.row_location = self.row_location.ravel()
+        self.lat = locations[:, 0]
+        self.lon = locations[:, 1]
+        self.max_level = max_level
+        self.cells = []
+        for level in range(max_level + 1):
+            size = 360.0 / 2 ** level
+            row = np.floor((self.lat + 90) / size).astype(np.int64)
+            col = np.floor((self.lon + 180) / size).astype(np.int64)
+            self.cells.append(row * (2 ** level + 1) + col)
+
+    def level_for_zoom(self, zoom):
+        return int(min(self.max_level, max(0, np.floor(zoom) + ZOOM_TO_LEVEL)))
+
+    def in_view(self, rows, bounds):
+        """ boolean mask over rows, True for the rows located within bounds = (west, south, east, north) """
+        loc = self.row_location[rows]
+        west, south, east, north = bounds
+        lat = self.lat[loc]
+        lon = self.lon[loc]
+        mask = (lat >= south) & (lat <= north)
+        if east - west < 360:
+            # bounds may cross the antimeridian
+            west = (west + 180) % 360 - 180
+            east = (east + 180) % 360 - 180
+            if west <= east:
+                mask &= (lon >= west) & (lon <= east)
+            else:
+                mask &= (lon >= west) | (lon <= east)
+        return mask
+
+    def cluster(self, rows, level, weights):
+        """
+        aggregate rows onto the cells of the given level.
+        returns the index of the cell of each row, plus per cell: the row count, the mean lat / long and the
+        sums of each of the weights arrays
+        """
+        cell = self.cells[level][self.row_location[rows]]
+        keys, inverse = np.unique(cell, return_inverse=True)
+        inverse = inverse.ravel()
+        count = np.bincount(inverse, minlength=len(keys))
+        loc = self.row_location[rows]
+        lat = np.bincount(inverse, weights=self.lat[loc], minlength=len(keys)) / count
+        lon = np.bincount(inverse, weights=self.lon[loc], minlength=len(keys)) / count
+        sums = [np.bincount(inverse, weights=w, minlength=len(keys)) for w in weights]
+        return inverse, count, lat, lon, sums
+
+
+def viewport(relayout_data, margin=0.1):
+    """
+    extract (zoom, bounds) from the relayoutData of a mapbox graph.
+    bounds is None when the map has not been moved yet or the payload does not carry them
+    """
+    if not relayout_data:
+        return None, None
+    zoom = relayout_data.get('mapbox.zoom')
+    derived = relayout_data.get('mapbox._derived') or {}
+    coords = derived.get('coordinates')
+    if zoom is None or not coords:
+        return zoom, None
+    lons = [c[0] for c in coords]
+    lats = [c[1] for c in coords]
+    west, east = min(lons), max(lons)
+    south, north = min(lats), max(lats)
+    pad_lon = (east - west) * margin
+    pad_lat = (north - south) * margin
+    return zoom, (west - pad_lon, max(-90, south - pad_lat), east + pad_lon, min(90, north + pad_lat))
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import anomalies
+
+
+def series(**areas):
+    """ frame of the recovered series of each area, the other columns growing steadily """
+    rows = []
+    for area, values in areas.items():
+        for day, value in enumerate(values):
+            rows.append({'country_area': area, 'date': pd.Timestamp('2020-03-01') + pd.Timedelta(days=day),
+                         'confirmed_cases': 10 * (day + 1), 'deaths': day, 'recovered': value})
+    # shuffled, like an unsorted extract
+    return pd.DataFrame(rows).sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def detected(frame, area, col='recovered'):
+    out = pd.concat([frame, anomalies.detect(frame)], axis=1)
+    out = out[out['country_area'] == area].sort_values('date')
+    return out[col + '_corrected'].tolist(), out[col + '_anomaly'].tolist()
+
+
+def test_drop_to_zero_is_a_glitch():
+    # Canada - ON: the last value is not a revision of the previous ones
+    corrected, flags = detected(series(ON=[5, 5, 6, 0]), 'ON')
+    assert corrected == [5, 5, 6, 6]
+    assert flags == [0, 0, 0, anomalies.DROP | anomalies.GLITCH]
+    corrected, flags = detected(series(ON=[5, 5, 6, 0, 0, 7]), 'ON')
+    assert corrected == [5, 5, 6, 7, 7, 7]
+    assert [bool(f & anomalies.GLITCH) for f in flags] == [False] * 3 + [True] * 2 + [False]
+
+
+def test_short_low_run_is_a_glitch():
+    corrected, flags = detected(series(A=[100, 110, 120, 30, 125, 130]), 'A')
+    assert corrected == [100, 110, 120, 125, 125, 130]
+    assert flags[3] == anomalies.DROP | anomalies.GLITCH and not any(flags[:3]) and flags[4] == 0
+    # a lasting lower level is a revision
+    corrected, flags = detected(series(A=[100, 110, 120, 30, 31, 32, 33]), 'A')
+    assert corrected == [30, 30, 30, 30, 31, 32, 33]
+    assert flags[:3] == [anomalies.REVISED] * 3 and flags[3] == anomalies.DROP
+
+
+def test_revision_lowers_the_previous_values():
+    corrected, flags = detected(series(A=[5, 5, 600, 6, 7, 8, 9]), 'A')
+    assert corrected == [5, 5, 6, 6, 7, 8, 9]
+    assert flags[2] == anomalies.REVISED and flags[3] == anomalies.DROP
+
+
+def test_spike_spread_over_the_previous_days():
+    values = np.cumsum([10] * 10 + [500] + [10] * 10)
+    corrected, flags = detected(series(A=values), 'A')
+    assert [i for i, f in enumerate(flags) if f] == [10]
+    assert flags[10] == anomalies.SPIKE
+    # the last value is unchanged, the excess moved before the spike
+    assert corrected[-1] == values[-1] and corrected[0] == values[0]
+    assert np.all(np.diff(corrected) >= 0) and max(np.diff(corrected)) < 100
+
+
+def test_areas_are_independent():
+    frame = series(A=[1000, 2000, 3000, 4000], B=[5, 5, 6, 0], C=[0, 1, 2, 3])
+    assert detected(frame, 'A')[0] == [1000, 2000, 3000, 4000]
+    assert detected(frame, 'B')[0] == [5, 5, 6, 6]
+    assert detected(frame, 'C') == ([0, 1, 2, 3], [0, 0, 0, 0])
+
+
+def test_correct_updates_active_and_rates():
+    frame = series(ON=[5, 5, 6, 0])
+    frame['active'] = frame['confirmed_cases'] - frame['deaths'] - frame['recovered']
+    frame['population'] = 14.5
+    for col in ['confirmed_cases', 'deaths', 'recovered', 'active']:
+        frame[col + '_rate'] = 0.0
+    frame = anomalies.correct(pd.concat([frame, anomalies.detect(frame)], axis=1)).sort_values('date')
+    last = frame.iloc[-1]
+    assert last['recovered'] == 6 and last['active'] == 40 - 3 - 6
+    assert last['recovered_rate'] == 6 / 40
+    # the unchanged rows keep their published rates
+    assert frame['recovered_rate'].iloc[0] == 0.0
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backends import PandasBackend, SqliteBackend
+
+
+@pytest.fixture(scope='module')
+def frame():
+    rows = []
+    areas = [('Europe', 'Western Europe', 'France', 'France', 67.0),
+             ('Europe', 'Southern Europe', 'Italy', 'Italy', 60.4),
+             ('Northern America', 'Northern America', 'US', 'US - New York', 19.5),
+             ('Northern America', 'Northern America', 'US', 'US - Texas', 29.0)]
+    for i, (region, subregion, country, area, population) in enumerate(areas):
+        for day in range(6):
+            cases = (i + 1) * day * 10
+            rows.append({'region': region, 'subregion': subregion, 'country': country, 'country_area': area,
+                         'date': pd.Timestamp('2020-03-01') + pd.Timedelta(days=day), 'confirmed_cases': cases,
+                         'deaths': cases // 10, 'population': population, 'pop_flag': int(population > 20),
+                         'confirmed_cases_rate': cases / population})
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture(scope='module')
+def backends(frame, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('sqlite') / 'rows.sqlite')
+    SqliteBackend.build(path, frame)
+    return PandasBackend(frame), SqliteBackend(path)
+
+
+QUERIES = [
+    ('rows', (), {}),
+    ('rows', (), {'filters': {'country': ['US']}, 'columns': ['country_area', 'confirmed_cases']}),
+    ('rows', (), {'filters': {'region': ['Europe'], 'country_area': ['US - Texas']}, 'date': pd.Timestamp('2020-03-03')}),
+    ('rows', (), {'date': (pd.Timestamp('2020-03-02'), pd.Timestamp('2020-03-04')),
+                  'conditions': [('pop_flag', '=', 1), ('confirmed_cases', '>', 20)]}),
+    ('rows', (), {'conditions': [('country_area', 'in', ['Italy', 'US - Texas'])], 'columns': ['date', 'deaths']}),
+    ('aggregate', (['date'], ['confirmed_cases', 'deaths']), {'filters': {'country': ['US']}}),
+    ('aggregate', (['region', 'date'], ['confirmed_cases', 'confirmed_cases_rate']), {}),
+    ('aggregate', (['country'], ['confirmed_cases']), {'conditions': [('country', '=', 'Nowhere')]}),
+]
+
+
+@pytest.mark.parametrize('method, args, kwargs', QUERIES)
+def test_parity(backends, method, args, kwargs):
+    pandas_backend, sqlite_backend = backends
+    expected = getattr(pandas_backend, method)(*args, **kwargs).reset_index(drop=method == 'aggregate')
+    result = getattr(sqlite_backend, method)(*args, **kwargs).reset_index(drop=method == 'aggregate')
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_index_type=False)
+    assert [str(t) for t in result.dtypes] == [str(t) for t in expected.dtypes]
+
+
+def test_top_and_maximum(backends):
+    pandas_backend, sqlite_backend = backends
+    last = pd.Timestamp('2020-03-06')
+    for backend in backends:
+        assert backend.top('country_area', 'confirmed_cases', last, 2) == ['US - Texas', 'US - New York']
+        assert backend.top('country', 'confirmed_cases', last, 5, {'region': ['Europe']}) == ['Italy', 'France']
+    assert sqlite_backend.maximum('confirmed_cases_rate', [('pop_flag', '=', 1)]) == \
+        pandas_backend.maximum('confirmed_cases_rate', [('pop_flag', '=', 1)])
+    assert np.isnan(sqlite_backend.maximum('deaths', [('country', '=', 'Nowhere')]))
+    assert len(sqlite_backend) == len(pandas_backend)
+    assert sqlite_backend.date_range() == pandas_backend.date_range()
+
+
+@pytest.mark.parametrize('query', [
+    lambda b: b.rows(columns=['country_area', 'nope']),
+    lambda b: b.rows(conditions=[('1=1; --', '=', 1)]),
+    lambda b: b.aggregate(['date'], ['confirmed_cases" FROM rows; --']),
+    lambda b: b.top('country_area', 'deaths_x', pd.Timestamp('2020-03-06'), 3),
+    lambda b: b.maximum('population) FROM rows --'),
+])
+def test_unknown_columns(backends, query):
+    for backend in backends:
+        with pytest.raises(ValueError):
+            query(backend)
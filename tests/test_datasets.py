@@ -0,0 +1,111 @@
+import json
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+import anomalies
+import datasets
+from backends import PandasBackend
+from datasets import Dataset, DatasetRegistry
+
+DAYS = 30
+
+
+def dataset(fingerprint=''):
+    frame = pd.DataFrame({'date': pd.date_range('2020-03-01', periods=3), 'confirmed_cases': [1, 2, 3]})
+    return Dataset('test', 'Test', PandasBackend(frame), fingerprint)
+
+
+def test_version_follows_the_file():
+    assert dataset('aaa').version != dataset('bbb').version
+    assert dataset('aaa').version == dataset('aaa').version
+
+
+def test_derived_built_once_per_key_without_blocking_the_others():
+    ds = dataset()
+    assert ds.derived('small', lambda d: [1]) == [1]
+    started, release = threading.Event(), threading.Event()
+    builds = []
+
+    def slow(d):
+        builds.append(1)
+        started.set()
+        release.wait(5)
+        return 'slow'
+
+    threads = [threading.Thread(target=ds.derived, args=('slow', slow)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    assert started.wait(5)
+    # built indexes and other new ones are served while the slow one builds
+    assert ds.derived('small', lambda d: [2]) == [1]
+    assert ds.derived('other', lambda d: 'other') == 'other'
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert ds.derived('slow', slow) == 'slow' and len(builds) == 1
+
+
+def write_extract(path, days=DAYS):
+    """ daily rows of a few areas over days, the day after DAYS being a different kind of day in each area """
+    rng = np.random.RandomState(0)
+    steady = np.cumsum(rng.randint(5, 50, DAYS))
+    series = {'Steady': np.cumsum(rng.randint(5, 50, DAYS + 1)),
+              # revises the previous days down, or is a glitch
+              'Revised': np.r_[steady, steady[-4]],
+              'Glitch': np.r_[steady, 0],
+              # makes a spike of the day before, the last one of its baseline
+              'Spike': np.cumsum(np.r_[rng.randint(5, 10, DAYS - 1), 5000, 7]),
+              # reported from that day on
+              'New': np.r_[np.zeros(DAYS, int), 7]}
+    rows = []
+    for day in range(days):
+        for area, cases in series.items():
+            if area == 'New' and day < DAYS:
+                continue
+            value = int(cases[day])
+            rows.append({'region': 'R', 'subregion': 'S', 'country': area, 'area': '', 'country_area': area,
+                         'date': (pd.Timestamp('2020-03-01') + pd.Timedelta(days=day)).strftime('%d/%m/%Y'),
+                         'confirmed_cases': value, 'deaths': value // 20, 'recovered': value // 3, 'population': 2.5,
+                         'active': value - value // 20 - value // 3, 'confirmed_cases_rate': value / 2.5,
+                         'deaths_rate': 0.05, 'recovered_rate': 0.33, 'active_rate': 0.62})
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+@pytest.mark.parametrize('corrected', [False, True])
+def test_ingested_day_matches_full_recomputation(tmp_path, corrected):
+    path = tmp_path / 'cases.csv'
+    write_extract(path, DAYS)
+    frame = datasets.load_frame(path, corrected)
+    write_extract(path, DAYS + 1)
+    raw = datasets.read_frame(path)
+    new_rows = raw.iloc[len(frame):].reset_index(drop=True)
+    out = datasets.ingest_frame(frame, new_rows, corrected, raw.iloc[:len(frame)] if corrected else None)
+    full = datasets.load_frame(path, corrected)
+    pd.testing.assert_frame_equal(out, full, check_exact=False)
+    # the areas where the new day is an anomaly or changes the previous days are derived again in full
+    flags = full.set_index(['country_area', full['date'].rank(method='dense').astype(int)])['confirmed_cases_anomaly']
+    assert flags['Steady'].max() == 0 and flags['Revised', DAYS] & anomalies.REVISED
+    assert flags['Glitch', DAYS + 1] & anomalies.GLITCH and flags['Spike', DAYS] == anomalies.SPIKE
+    with pytest.raises(ValueError):
+        datasets.ingest_frame(frame, raw.iloc[:1], corrected)
+
+
+@pytest.mark.parametrize('backend', ['pandas', 'sqlite'])
+def test_registry_ingests_the_appended_days(tmp_path, backend):
+    write_extract(tmp_path / 'cases.csv', DAYS)
+    (tmp_path / 'datasets.json').write_text(json.dumps({'cases': {'file': 'cases.csv', 'backend': backend}}))
+    registry = DatasetRegistry(str(tmp_path), refresh_seconds=0)
+    ds = registry.get()
+    fingerprint = registry.fingerprint
+    assert registry.get() is ds
+    write_extract(tmp_path / 'cases.csv', DAYS + 1)
+    ingested = registry.get()
+    assert (registry.loads, registry.ingests) == (1, 1)
+    assert ingested.end_date > ds.end_date and registry.fingerprint != fingerprint
+    pd.testing.assert_frame_equal(ingested.backend.rows(), datasets.load_frame(tmp_path / 'cases.csv'),
+                                  check_exact=False, check_dtype=False)
+    # any other change reads the file again
+    write_extract(tmp_path / 'cases.csv', DAYS - 1)
+    assert registry.get().end_date < ds.end_date
+    assert (registry.loads, registry.ingests) == (2, 1)
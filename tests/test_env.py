@@ -0,0 +1,14 @@
+import pytest
+from env import env_flag
+
+
+@pytest.mark.parametrize('value, default, expected', [
+    (None, False, False), (None, True, True), ('', True, True), ('1', False, True), ('Yes', False, True),
+    (' true ', False, True), ('0', True, False), ('FALSE', True, False), ('no', True, False), ('maybe', True, True),
+])
+def test_env_flag(monkeypatch, value, default, expected):
+    if value is None:
+        monkeypatch.delenv('TEST_FLAG', raising=False)
+    else:
+        monkeypatch.setenv('TEST_FLAG', value)
+    assert env_flag('TEST_FLAG', default) is expected
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+import growth_fit
+
+
+def test_initial_estimates_of_exponentials():
+    t = np.arange(10, dtype=float)
+    curves = [(t, 3 * np.exp(0.2 * t)), (t[:6], 50 * np.exp(0.1 * t[:6]))]
+    p0 = growth_fit.initial_estimates(curves)
+    np.testing.assert_allclose(p0['exponential'], [[3, 0.2], [50, 0.1]])
+    # the logistic starts at twice the last value, inflecting today
+    np.testing.assert_allclose(p0['logistic'][:, 0], [2 * 3 * np.exp(1.8), 2 * 50 * np.exp(0.5)])
+    np.testing.assert_allclose(p0['logistic'][:, 2], [9, 5])
+
+
+@pytest.mark.parametrize('model, params', [('logistic', (1000, 0.3, 20)), ('exponential', (5, 0.15))])
+def test_fit_curves(model, params):
+    t = np.arange(40, dtype=float)
+    y = growth_fit.MODELS[model](t, *params)
+    keys = [('test', model, 1), ('test', model, 2)]
+    fitted = growth_fit.fit_curves(model, [(t, y), (t[:3], y[:3])], keys)
+    np.testing.assert_allclose(fitted[0], params, rtol=1e-3)
+    # too short to be fitted
+    assert fitted[1] is None
+    # cached
+    assert growth_fit.fit_cache.get(keys[0]) is fitted[0]
+    assert growth_fit.fit_curves(model, [(t, y * 2), (t, y)], keys)[0] is fitted[0]
+
+
+def test_nan_points_ignored():
+    t = np.arange(30, dtype=float)
+    y = growth_fit.exponential(t, 2, 0.1)
+    y[[3, 17]] = np.nan
+    params = growth_fit.fit_one('exponential', t, y, [1, 0.05])
+    np.testing.assert_allclose(params, [2, 0.1], rtol=1e-3)
+    assert growth_fit.fit_one('exponential', t, np.zeros(30), [1, 0.05]) is None
+
+
+def test_describe():
+    assert growth_fit.describe('exponential', (1, np.log(2) / 3)) == 'Growth : 23.1% / day<br>Doubling : 3.0 days'
+    assert growth_fit.describe('logistic', (12345, 0.1, 42)) == \
+        'Plateau : 12.3k<br>Growth : 10.0% / day<br>Inflection : day 42'
+
+
+def test_fit_in_the_pool(monkeypatch):
+    monkeypatch.setattr(growth_fit, 'FIT_WORKERS', 2)
+    monkeypatch.setattr(growth_fit, 'FIT_POOL_MIN', 2)
+    t = np.arange(30, dtype=float)
+    curves = [(t, growth_fit.exponential(t, a, 0.05 * a)) for a in range(1, 6)] + [(t[:2], t[:2])]
+    keys = [('pool', i) for i in range(len(curves))]
+    fitted = growth_fit.fit_curves('exponential', curves, keys)
+    assert growth_fit._pool is not None and fitted[-1] is None
+    for (a, r), params in zip([(a, 0.05 * a) for a in range(1, 6)], fitted):
+        np.testing.assert_allclose(params, [a, r], rtol=1e-3)
+
+
+def test_pool_not_inherited(monkeypatch):
+    monkeypatch.setattr(growth_fit, 'FIT_WORKERS', 1)
+    pool = growth_fit.get_pool()
+    assert growth_fit.get_pool() is pool
+    # as in a worker forked from the process that created the pool
+    monkeypatch.setattr(growth_fit, '_pool_pid', -1)
+    assert growth_fit.get_pool() is not pool
+    monkeypatch.setattr(growth_fit, 'FIT_WORKERS', 0)
+    assert growth_fit.get_pool() is None
@@ -0,0 +1,62 @@
+import threading
+import time
+from jobs import JobCancelled, JobManager, checkpoint
+from singleflight import SingleFlight
+
+
+def test_result_shared_with_other_workers(tmp_path):
+    # two managers over the same result directory, like two gunicorn workers
+    first, second = JobManager(1, str(tmp_path)), JobManager(1, str(tmp_path))
+    release = threading.Event()
+    job = first.submit(('key', 1), 'kind', 'session', lambda: release.wait(5) and ('figure',))
+    assert not job.wait(0.05)
+    first.detach(job)
+    assert second.get(job.id) is None
+    release.set()
+    assert job.wait(5)
+    polled = second.get(job.id)
+    assert polled.done and polled.error is None and polled.result == ('figure',)
+    assert second.loaded == 1
+
+
+def test_inline_results_not_written(tmp_path):
+    manager = JobManager(1, str(tmp_path))
+    job = manager.submit(('key', 2), 'kind', None, lambda: 42)
+    assert job.wait(5) and job.result == 42
+    assert list(tmp_path.iterdir()) == []
+    assert JobManager(1, str(tmp_path)).get(job.id) is None
+
+
+def test_same_key_same_id():
+    manager = JobManager(1)
+    assert manager.submit(('key', 3), 'kind', None, lambda: 1).id == JobManager(1).submit(('key', 3), 'kind', None,
+                                                                                           lambda: 1).id
+    assert manager.get('../../etc/passwd') is None
+
+
+def test_superseded_job_does_not_cancel_its_followers():
+    manager, flight = JobManager(3), SingleFlight(retry=(JobCancelled,))
+    started, calls = threading.Event(), []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        for _ in range(20):
+            time.sleep(0.01)
+            checkpoint()
+        return 'figure'
+
+    def submit(key, session):
+        return manager.submit(key, 'kind', session, lambda: flight.do(key, compute))
+
+    first = submit('K', 's1')
+    assert started.wait(5)
+    # s1 moves on, its running job is cancelled at its next checkpoint, while s2 asks for the same key
+    submit('K2', 's1')
+    second = submit('K', 's2')
+    assert second is not first and first.cancelled
+    assert first.wait(5) and isinstance(first.error, JobCancelled)
+    assert second.wait(5) and second.error is None and second.result == 'figure'
+    # K computed again after the cancellation, K2 once
+    assert len(calls) == 3
+    assert manager.get(second.id) is second
@@ -0,0 +1,82 @@
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+import metrics
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.RandomState(0)
+    rows = []
+    for area, days in [('A', 20), ('B', 1), ('C', 12)]:
+        cases = np.cumsum(rng.randint(0, 50, days))
+        cases[:3] = 0
+        for day in range(days):
+            rows.append({'country_area': area, 'date': pd.Timestamp('2020-03-01') + pd.Timedelta(days=day),
+                         'confirmed_cases': cases[day], 'deaths': cases[day] // 20, 'recovered': cases[day] // 3})
+    # the areas interleaved and the dates shuffled, like an unsorted extract
+    return pd.DataFrame(rows).sample(frac=1, random_state=1).reset_index(drop=True)
+
+
+def expected_metrics(frame, col):
+    """ the metrics of col recomputed area by area with pandas """
+    out = []
+    for _, group in frame.sort_values('date').groupby('country_area'):
+        ma7 = group[col].diff().fillna(0).rolling(metrics.WINDOW, min_periods=1).mean()
+        growth = []
+        for end in range(len(group)):
+            window = group.iloc[max(0, end - metrics.WINDOW + 1):end + 1]
+            window = window[window[col] > 0]
+            days = (window['date'] - group['date'].iloc[0]).dt.days.to_numpy(dtype=float)
+            if len(window) < metrics.MIN_GROWTH_POINTS:
+                growth.append(np.nan)
+            else:
+                growth.append(np.polyfit(days, np.log(window[col].to_numpy(dtype=float)), 1)[0])
+        out.append(pd.DataFrame({col + '_ma7': ma7, col + '_growth': growth}, index=group.index))
+    return pd.concat(out).reindex(frame.index)
+
+
+@pytest.mark.parametrize('col', metrics.BASE_COLS)
+def test_compute_matches_per_area_recomputation(frame, col):
+    result = metrics.compute(frame)
+    assert list(result.columns) == metrics.metric_columns()
+    expected = expected_metrics(frame, col)
+    np.testing.assert_allclose(result[col + '_ma7'], expected[col + '_ma7'])
+    np.testing.assert_allclose(result[col + '_growth'], expected[col + '_growth'], atol=1e-9)
+    growth = result[col + '_growth']
+    np.testing.assert_allclose(result[col + '_doubling'], np.where(growth > 0, np.log(2) / growth, np.nan))
+
+
+def test_window_clipped_at_group_start():
+    codes = np.array([0, 0, 0, 1, 1])
+    starts = metrics.group_starts(codes)
+    np.testing.assert_array_equal(starts, [0, 0, 0, 3, 3])
+    values = np.array([1.0, 2, 3, 10, 20])
+    np.testing.assert_array_equal(metrics.window_sum(values, starts, 2), [1, 3, 5, 10, 30])
+    np.testing.assert_array_equal(metrics.increments(values, starts), [0, 1, 1, 0, 10])
+
+
+def test_smooth_increments():
+    frame = pd.DataFrame({'split': ['a'] * 3 + ['b'] * 2, 'inc': [7.0, 0, 14, 2, 4]})
+    metrics.smooth_increments(frame, ['inc'], 'split')
+    np.testing.assert_allclose(frame['inc'], [7, 3.5, 7, 2, 3])
+
+
+def test_quantile_band():
+    frame = pd.DataFrame({'country_area': np.repeat(list('abcdef'), 2), 'x': [0, 1] * 6,
+                          'y': [1, 10, 2, 20, 3, 30, 4, 40, 5, np.nan, 6, 60]})
+    band = metrics.quantile_band(frame, 'y', 'x', min_groups=5)
+    np.testing.assert_array_equal(band['x'], [0, 1])
+    np.testing.assert_array_equal(band['count'], [6, 5])
+    np.testing.assert_allclose(band['p50'], [3.5, 30])
+    assert metrics.quantile_band(frame, 'y', 'x', min_groups=6)['x'].tolist() == [0]
+
+
+def test_growth_of_empty_windows_without_warnings():
+    values = np.array([0.0, 0, 1, 2, 4, 8])
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        growth = metrics.log_growth(values, np.arange(6.0), np.zeros(6, dtype=np.int64))
+    assert np.isnan(growth[:4]).all()
+    np.testing.assert_allclose(growth[4:], np.log(2))
@@ -0,0 +1,46 @@
+import name_index
+from name_index import NameIndex
+
+NAMES = {'US - New York': 300, 'US - New Jersey': 200, 'New Zealand': 50, 'Yemen': 5, 'Canada - Newfoundland': 10,
+         'Saint Vincent and the Grenadines': 1, 'Côte d\'Ivoire': 20}
+
+
+def index():
+    return NameIndex(list(NAMES), list(NAMES.values()))
+
+
+def test_tokenize():
+    assert name_index.tokenize('US - New York') == ['us', 'new', 'york']
+    assert name_index.tokenize('Côte d\'Ivoire') == ['côte', 'd', 'ivoire']
+    assert name_index.tokenize(None) == ['none']
+
+
+def test_empty_query_lists_by_weight():
+    assert index().search('') == sorted(NAMES, key=lambda name: -NAMES[name])
+    assert index().search(None, limit=2) == ['US - New York', 'US - New Jersey']
+    assert len(index()) == len(NAMES)
+
+
+def test_prefixes_of_every_token():
+    assert index().search('new') == ['US - New York', 'US - New Jersey', 'New Zealand', 'Canada - Newfoundland']
+    assert index().search('yo') == ['US - New York']
+    assert index().search('us ne') == ['US - New York', 'US - New Jersey']
+    assert index().search('NE  us,') == ['US - New York', 'US - New Jersey']
+    assert index().search('y') == ['US - New York', 'Yemen']
+    assert index().search('new', limit=1) == ['US - New York']
+    assert index().search('côte') == ['Côte d\'Ivoire']
+    assert index().search('new mexico') == []
+    assert index().search('zz') == []
+
+
+def test_tokens_longer_than_the_prefix():
+    assert name_index.MAX_PREFIX < len('grenadines')
+    assert index().search('grenadines') == ['Saint Vincent and the Grenadines']
+    # same first MAX_PREFIX letters, another token
+    assert index().search('grenadinex') == []
+    assert index().search('newfoundland') == ['Canada - Newfoundland']
+    assert index().search('newfoundlanders') == []
+
+
+def test_ties_ranked_by_name():
+    assert NameIndex(['b', 'a', 'c'], [1, 1, 2]).search('') == ['c', 'a', 'b']
@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+import threading
+import time
+import pytest
+import singleflight
+from singleflight import SingleFlight
+
+fork = pytest.mark.skipif(singleflight.fcntl is None or 'fork' not in multiprocessing.get_all_start_methods(),
+                          reason='needs flock and fork')
+
+
+def test_threads_share_the_result():
+    flight = SingleFlight()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return len(calls)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('key', compute))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [1] * 4 and len(calls) == 1 and flight.shared == 3
+
+
+def _lead(lock_dir, started, counter):
+    def compute():
+        started.set()
+        time.sleep(0.5)
+        with counter.get_lock():
+            counter.value += 1
+        return 'computed'
+    SingleFlight(lock_dir).do(('view', 1), compute)
+
+
+@fork
+def test_workers_share_the_result(tmp_path):
+    context = multiprocessing.get_context('fork')
+    started, counter = context.Event(), context.Value('i', 0)
+    leader = context.Process(target=_lead, args=(str(tmp_path), started, counter))
+    leader.start()
+    assert started.wait(5)
+    follower = SingleFlight(str(tmp_path))
+    assert follower.do(('view', 1), lambda: 'computed again') == 'computed'
+    leader.join(5)
+    assert counter.value == 1 and follower.shared == 1
+
+
+@fork
+def test_no_file_per_key(tmp_path):
+    flight = SingleFlight(str(tmp_path))
+    for i in range(200):
+        assert flight.do(('map', i), lambda: i) == i
+    names = os.listdir(str(tmp_path))
+    # only the lock stripes, no result was waited for
+    assert names and all(name.startswith('stripe-') and name.endswith('.lock') for name in names)
+    assert len(names) <= singleflight.LOCK_STRIPES
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+import spatial
+from spatial import GridIndex
+
+# (lat, long) of the rows, the first location twice
+POINTS = [(0.0, 0.0), (0.0, 0.0), (45.0, 90.0), (-45.0, -90.0), (90.0, 180.0), (-90.0, -180.0), (10.0, 179.5),
+          (10.0, -179.5), (44.999, 89.999)]
+
+
+@pytest.fixture
+def index():
+    lat, lon = zip(*POINTS)
+    return GridIndex(lat, lon, max_level=4)
+
+
+def test_rows_share_locations(index):
+    assert len(index.lat) == len(POINTS) - 1
+    assert index.row_location[0] == index.row_location[1]
+    np.testing.assert_array_equal(index.lat[index.row_location], [p[0] for p in POINTS])
+
+
+def test_cells_at_edges(index):
+    cells = index.cells[2][index.row_location]
+    # 90 degree cells: a point on an edge belongs to the cell above / east of it, just below stays in the previous one
+    size, width = 90.0, 2 ** 2 + 1
+    for (lat, lon), cell in zip(POINTS, cells):
+        assert cell == np.floor((lat + 90) / size) * width + np.floor((lon + 180) / size)
+    assert cells[2] == 1 * width + 3 and cells[8] == 1 * width + 2 == cells[0]
+    # the last column and row of the grid do not wrap onto the next row
+    assert cells[4] == 2 * width + 4 and cells[5] == 0
+    assert len(set(cells[[4, 5, 6, 7]])) == 4
+    # level 0 holds everything in at most 2 x 2 cells
+    assert len(np.unique(index.cells[0])) <= 4
+
+
+def test_level_for_zoom(index):
+    assert index.level_for_zoom(-2) == 1
+    assert index.level_for_zoom(0.9) == spatial.ZOOM_TO_LEVEL
+    assert index.level_for_zoom(20) == index.max_level
+
+
+def test_in_view_includes_edges(index):
+    rows = np.arange(len(POINTS))
+    mask = index.in_view(rows, (-90, -45, 90, 45))
+    assert mask.tolist() == [True, True, True, True, False, False, False, False, True]
+    # just outside
+    assert not index.in_view(rows, (90.001, -45, 120, 45)).any()
+
+
+def test_in_view_across_the_antimeridian(index):
+    rows = np.arange(len(POINTS))
+    # east of 170, then west of -170
+    mask = index.in_view(rows, (170, 0, 190, 20))
+    assert np.flatnonzero(mask).tolist() == [6, 7]
+    # the whole world
+    assert index.in_view(rows, (-200, -90, 200, 90)).all()
+
+
+def test_cluster(index):
+    rows = np.array([0, 1, 2, 8, 3])
+    inverse, count, lat, lon, (sums,) = index.cluster(rows, 2, [np.array([1.0, 2.0, 3.0, 4.0, 5.0])])
+    # (44.999, 89.999) falls with (0, 0), just before the edge of the cell of (45, 90)
+    assert count.tolist() == [1, 3, 1]
+    assert inverse.tolist() == [1, 1, 2, 1, 0]
+    np.testing.assert_allclose(sums, [5, 7, 3])
+    np.testing.assert_allclose(lat, [-45, 44.999 / 3, 45])
+    np.testing.assert_allclose(lon, [-90, 89.999 / 3, 90])
+
+
+def test_viewport():
+    assert spatial.viewport(None) == (None, None)
+    assert spatial.viewport({'mapbox.zoom': 3}) == (3, None)
+    coords = [[-10, 80], [10, 80], [10, -85], [-10, -85]]
+    zoom, bounds = spatial.viewport({'mapbox.zoom': 2.5, 'mapbox._derived': {'coordinates': coords}})
+    assert zoom == 2.5
+    # padded by a tenth, clamped to the poles
+    np.testing.assert_allclose(bounds, (-12, -90, 12, 90))